@@ -1,16 +1,50 @@
-from google.cloud import firestore
-from google.oauth2 import service_account
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime
 from pathlib import Path
+from profiling import peak_rss_mb, stage
 
 PROJECT_ID = "fittslaw-6568d"
 KEY_PATH = str(Path(__file__).parent.parent / "config" / "key.json")
 OUT_DIR = Path(__file__).parent.parent / "data" / "raw"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-creds = service_account.Credentials.from_service_account_file(KEY_PATH)
-client = firestore.Client(project=PROJECT_ID, credentials=creds)
+# Incremental mode: new documents land in DELTA_DIR until they are compacted
+# into a regular snapshot (the one 1_flatten_data.py picks up)
+DELTA_DIR = OUT_DIR / "deltas"
+WATERMARK_FILE = OUT_DIR / "_watermarks.json"
+
+DOC_ID_FIELD = "__name__"
+
+# collection -> (file prefix, watermark field). Participants are updated in place
+# (completed / endedAt) so they are always re-fetched as a full snapshot.
+# The watermark is uploadedAt, the serverTimestamp() firebase.js writes, not the
+# browser's timestamp: a late upload or a client clock running behind would put a
+# trial below the watermark and it would never be fetched.
+COLLECTIONS = {
+    "participants": ("participants", None),
+    "fitts_trials": ("trials", "uploadedAt"),
+    "fitts_pre_trials": ("pre_trials", "uploadedAt"),
+}
+
+
+def get_client():
+    from google.cloud import firestore
+
+    # The client talks to a local emulator when FIRESTORE_EMULATOR_HOST is set
+    if os.environ.get("FIRESTORE_EMULATOR_HOST"):
+        return firestore.Client(project=PROJECT_ID)
+
+    from google.oauth2 import service_account
+    creds = service_account.Credentials.from_service_account_file(KEY_PATH)
+    return firestore.Client(project=PROJECT_ID, credentials=creds)
 
 def fetch_collection(client, name):
     docs = client.collection(name).stream()
@@ -21,16 +55,365 @@ def fetch_collection(client, name):
         rows.append(doc)
     return pd.DataFrame(rows)
 
-def main():
-    df_participants = fetch_collection(client, "participants")
-    df_trials = fetch_collection(client, "fitts_trials")
-    df_pre_trials = fetch_collection(client, "fitts_pre_trials")
+def _with_retry(fn, label, retries=3, backoff=0.5):
+    """Call fn(), retrying with exponential backoff and jitter on any error."""
+    for attempt in range(1, retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** (attempt - 1) * (1 + random.random())
+            print(f"{label}: attempt {attempt} failed ({e}); retrying in {delay:.2f}s")
+            time.sleep(delay)
+
+def _fetch_page(make_query, label, retries, backoff):
+    """Run one query to completion (with retries) and log how long it took."""
+    def run():
+        rows = []
+        for d in make_query().stream():
+            doc = d.to_dict()
+            doc["__doc_id"] = d.id
+            rows.append(doc)
+        return rows
+
+    start = time.perf_counter()
+    rows = _with_retry(run, label, retries, backoff)
+    print(f"{label}: {len(rows)} docs in {time.perf_counter() - start:.2f}s")
+    return rows
+
+def _count(make_query, label, retries, backoff):
+    """Number of documents matching a query (count aggregation, with retries)."""
+    return _with_retry(lambda: make_query().count().get(), label, retries, backoff)[0][0].value
+
+def participant_ranges(participant_ids, per_page):
+    """
+    Split the participantId key space into [lo, hi) ranges of per_page known ids.
+    The first and last ranges are open, so trials of participants missing from the
+    participants collection are still fetched. Trials whose participantId is null or
+    missing match no range (see fetch_parallel).
+    """
+    pids = sorted(set(participant_ids))
+    bounds = pids[per_page::per_page]
+    edges = [None] + bounds + [None]
+    return list(zip(edges[:-1], edges[1:]))
+
+def _trials_range_query(client, lo, hi):
+    query = client.collection("fitts_trials")
+    if lo is not None:
+        query = query.where("participantId", ">=", lo)
+    if hi is not None:
+        query = query.where("participantId", "<", hi)
+    return query
+
+def fetch_parallel(client, workers=4, pids_per_page=10, retries=3, backoff=0.5):
+    """
+    Fetch the three collections concurrently on a thread pool, with fitts_trials
+    further split into participantId ranges. Rows are re-sorted by doc id so the
+    frames match the serial fetch_collection output.
+
+    Bounded range queries skip trials without a participantId: those with a null
+    one are fetched by an extra `== None` page, while a trial missing the field
+    entirely cannot be queried at all. fitts_trials is counted before the pages
+    start; if they return fewer documents than that, fitts_trials is fetched again
+    as one unfiltered query. With a single (None, None) range (pids_per_page
+    participants or fewer) that unfiltered query is the only page.
+
+    Returns:
+    --------
+    (DataFrame, DataFrame, DataFrame)
+        participants, trials, pre-trials
+    """
+    def collection_query(name):
+        return lambda: client.collection(name)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        fut_participants = pool.submit(_fetch_page, collection_query("participants"), "participants", retries, backoff)
+        fut_pre_trials = pool.submit(_fetch_page, collection_query("fitts_pre_trials"), "fitts_pre_trials", retries, backoff)
+
+        fut_count = pool.submit(_count, collection_query("fitts_trials"), "fitts_trials count", retries, backoff)
+
+        participants = fut_participants.result()
+        # Counted before any range runs: trials uploaded meanwhile can only add to the pages
+        expected = fut_count.result()
+        ranges = participant_ranges([r["__doc_id"] for r in participants], pids_per_page)
+        fut_trials = [
+            pool.submit(_fetch_page,
+                        lambda lo=lo, hi=hi: _trials_range_query(client, lo, hi),
+                        f"fitts_trials[{lo or ''}..{hi or ''})", retries, backoff)
+            for lo, hi in ranges
+        ]
+        # A single open range has no filter and already returns the null/missing ones
+        split = ranges != [(None, None)]
+        if split:
+            fut_trials.append(pool.submit(_fetch_page,
+                                          lambda: client.collection("fitts_trials").where("participantId", "==", None),
+                                          "fitts_trials[participantId null]", retries, backoff))
+        trials = [row for f in fut_trials for row in f.result()]
+        pre_trials = fut_pre_trials.result()
+
+    if split and len(trials) < expected:
+        print(f"fitts_trials: the participantId ranges returned {len(trials)} of {expected} documents "
+              "(trials without a participantId field); fetching the whole collection in one query")
+        trials = _fetch_page(collection_query("fitts_trials"), "fitts_trials", retries, backoff)
+
+    for rows in (participants, trials, pre_trials):
+        rows.sort(key=lambda r: r["__doc_id"])
+    return pd.DataFrame(participants), pd.DataFrame(trials), pd.DataFrame(pre_trials)
+
+def iter_collection_pages(client, name, batch_size):
+    """
+    Yield the documents of a collection in pages of batch_size, ordered by doc id.
+    Each page is a fresh query resumed after the last snapshot of the previous one,
+    so only one page of documents is held at a time.
+    """
+    query = client.collection(name).order_by(DOC_ID_FIELD).limit(batch_size)
+    last = None
+    while True:
+        page = query.start_after(last) if last is not None else query
+        docs = list(page.stream())
+        if not docs:
+            return
+        yield docs
+        if len(docs) < batch_size:
+            return
+        last = docs[-1]
+
+def _conform(table, schema):
+    """table with the fields of schema, in its order and types; the fields it lacks are null."""
+    columns = [table.column(f.name).cast(f.type) if f.name in table.column_names else pa.nulls(len(table), f.type)
+               for f in schema]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+def _page_table(rows):
+    """Arrow table of a page of documents. The columns are the fields of all of them
+    (Table.from_pylist would only take the first document's)."""
+    names = list(dict.fromkeys(k for r in rows for k in r))
+    return pa.table({k: [r.get(k) for r in rows] for k in names})
+
+def _widen_schema(name, schema, page_schema):
+    """Schema holding both: new fields are appended, null/int types promoted (list<null> -> list<struct>, int -> double)."""
+    try:
+        return pa.unify_schemas([schema, page_schema], promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise ValueError(f"{name}: a page has a field of another type than the previous pages ({e})") from e
 
+def export_collection(client, name, path, batch_size=500):
+    """
+    Stream a collection into a Parquet file one record batch per page.
+
+    Each page's schema is inferred and unified with the previous ones. When a page
+    brings a new field (e.g. cursorTrace of the packed trials) or a wider type (a
+    list that was empty so far), the row groups written so far are rewritten with
+    the wider schema one at a time, so memory stays bounded by a page and no field
+    is dropped. Returns the number of documents.
+    """
+    path = Path(path)
+    writer = None
+    schema = None
+    n_docs = 0
+    try:
+        for docs in iter_collection_pages(client, name, batch_size):
+            rows = []
+            for d in docs:
+                doc = d.to_dict()
+                doc["__doc_id"] = d.id
+                rows.append(doc)
+            table = _page_table(rows)
+            if writer is None:
+                schema = table.schema
+                writer = pq.ParquetWriter(path, schema)
+            else:
+                wider = _widen_schema(name, schema, table.schema)
+                if not wider.equals(schema):
+                    writer.close()
+                    previous = path.with_suffix(".narrow.tmp")
+                    os.replace(path, previous)
+                    writer = pq.ParquetWriter(path, wider)
+                    with pq.ParquetFile(previous) as written:
+                        for i in range(written.num_row_groups):
+                            writer.write_table(_conform(written.read_row_group(i), wider))
+                    previous.unlink()
+                    schema = wider
+            writer.write_table(_conform(table, schema))
+            n_docs += len(rows)
+            del rows, table, docs
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        pq.write_table(pa.table({"__doc_id": pa.array([], pa.string())}), path)
+    return n_docs
+
+def load_watermarks():
+    if WATERMARK_FILE.exists():
+        with open(WATERMARK_FILE) as f:
+            return json.load(f)
+    return {}
+
+def save_watermarks(watermarks):
+    with open(WATERMARK_FILE, "w") as f:
+        json.dump(watermarks, f, indent=2)
+
+def watermark_from_frame(df, field, previous=None):
+    """
+    Highest value of field in a fetched frame and the doc ids that have it, or
+    previous if the frame has none. The ids at the previous value are kept when
+    the highest value did not move.
+    """
+    if df.empty or field not in df.columns:
+        return previous
+    values = pd.to_datetime(df[field], utc=True)
+    if values.isna().all():
+        return previous
+    top = values.max()
+    doc_ids = sorted(df.loc[values == top, "__doc_id"])
+    if previous is not None and pd.Timestamp(previous["value"]) == top:
+        doc_ids = sorted(set(doc_ids) | set(previous["doc_ids"]))
+    return {"field": field, "value": top.isoformat(), "doc_ids": doc_ids}
+
+def fetch_new_documents(client, name, watermark):
+    """
+    Stream the documents whose watermark field is at or after the watermark,
+    minus the ones already fetched at exactly that value. Several documents can
+    share a server timestamp (one batch, or the same microsecond), so ties are
+    re-read instead of being cut by doc id.
+    """
+    field = watermark["field"]
+    since = pd.Timestamp(watermark["value"]).to_pydatetime()
+    seen = set(watermark["doc_ids"])
+    query = client.collection(name).where(field, ">=", since).order_by(field)
+    rows = []
+    for d in query.stream():
+        if d.id in seen:
+            continue
+        doc = d.to_dict()
+        doc["__doc_id"] = d.id
+        rows.append(doc)
+    return pd.DataFrame(rows)
+
+def fetch_incremental(client, ts):
+    """
+    Fetch every collection, writing only new documents as Parquet delta files.
+    Collections without a watermark yet get a full snapshot that seeds it.
+    """
+    DELTA_DIR.mkdir(parents=True, exist_ok=True)
+    watermarks = load_watermarks()
+
+    for name, (prefix, field) in COLLECTIONS.items():
+        # A watermark on another field (the former browser timestamp) is re-seeded
+        if field is None or watermarks.get(name, {}).get("field") != field:
+            df = fetch_collection(client, name)
+            df.to_parquet(OUT_DIR / f"{prefix}_{ts}.parquet", index=False)
+            print(f"{name}: full snapshot, {len(df)} docs")
+            if field is not None:
+                wm = watermark_from_frame(df, field)
+                if wm is not None:
+                    watermarks[name] = wm
+            continue
+
+        df = fetch_new_documents(client, name, watermarks[name])
+        if df.empty:
+            print(f"{name}: no new docs")
+            continue
+        df.to_parquet(DELTA_DIR / f"{prefix}_delta_{ts}.parquet", index=False)
+        watermarks[name] = watermark_from_frame(df, field, watermarks[name])
+        print(f"{name}: {len(df)} new docs -> delta")
+
+    # Watermarks are only advanced once every delta is safely on disk
+    save_watermarks(watermarks)
+
+def compact(ts):
+    """
+    Merge the latest snapshot and all pending deltas of each collection into a new
+    snapshot, then delete the merged deltas. Later copies of a doc id win.
+    """
+    for name, (prefix, field) in COLLECTIONS.items():
+        deltas = sorted(DELTA_DIR.glob(f"{prefix}_delta_*.parquet"))
+        if not deltas:
+            continue
+        snapshots = sorted(OUT_DIR.glob(f"{prefix}_*.parquet"))
+        parts = [pd.read_parquet(snapshots[-1])] if snapshots else []
+        parts += [pd.read_parquet(p) for p in deltas]
+        df = pd.concat(parts, ignore_index=True).drop_duplicates("__doc_id", keep="last")
+        df.to_parquet(OUT_DIR / f"{prefix}_{ts}.parquet", index=False)
+        for p in deltas:
+            p.unlink()
+        print(f"{name}: compacted {len(deltas)} deltas -> {len(df)} docs")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the Firestore collections to data/raw")
+    parser.add_argument("command", nargs="?", choices=["fetch", "compact"], default="fetch")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only fetch documents newer than the stored watermark (written as deltas)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Page through each collection and write Parquet record batches as they arrive")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="Documents per page in --stream mode; bounds peak memory (default: 500)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Fetch collections and participant ranges of fitts_trials on N threads (default: 1, serial)")
+    parser.add_argument("--pids-per-page", type=int, default=10,
+                        help="Participants per fitts_trials page with --workers > 1 (default: 10)")
+    parser.add_argument("--retries", type=int, default=3,
+                        help="Attempts per page with --workers > 1 before giving up (default: 3)")
+    parser.add_argument("--backoff", type=float, default=0.5, metavar="SECONDS",
+                        help="Base delay before retrying a page, doubled on every attempt (default: 0.5)")
+    parser.add_argument("--fake", type=int, default=None, metavar="N",
+                        help="Use an in-memory fake client with N synthetic participants (offline runs)")
+    parser.add_argument("--fake-latency", type=float, default=0.0, metavar="SECONDS",
+                        help="Simulated round trip per query of the fake client")
+    parser.add_argument("--fake-doc-latency", type=float, default=0.0, metavar="SECONDS",
+                        help="Simulated transfer time per document of the fake client")
+    parser.add_argument("--fake-packed", type=float, default=0.0, metavar="FRACTION",
+                        help="Fraction of the fake client's trials uploaded with a packed cursorTrace")
+    args = parser.parse_args(argv)
 
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-    df_participants.to_parquet(OUT_DIR / f"participants_{ts}.parquet", index=False)
-    df_trials.to_parquet(OUT_DIR / f"trials_{ts}.parquet", index=False)
-    df_pre_trials.to_parquet(OUT_DIR / f"pre_trials_{ts}.parquet", index=False)
+
+    if args.command == "compact":
+        compact(ts)
+        return
+
+    if args.fake is not None:
+        from fake_firestore import make_fake_client
+        client = make_fake_client(n_participants=args.fake, latency=args.fake_latency,
+                                  doc_latency=args.fake_doc_latency, packed_fraction=args.fake_packed)
+    else:
+        client = get_client()
+
+    if args.incremental:
+        with stage("fetch incremental"):
+            fetch_incremental(client, ts)
+        return
+
+    if args.stream:
+        for name, (prefix, _) in COLLECTIONS.items():
+            with stage(f"export {name}") as st:
+                n_docs = export_collection(client, name, OUT_DIR / f"{prefix}_{ts}.parquet", args.batch_size)
+                st.rows = n_docs
+            print(f"{name}: {n_docs} docs")
+        rss = peak_rss_mb()
+        if rss is not None:
+            print(f"Peak RSS: {rss:.1f} MB (batch size {args.batch_size})")
+        return
+
+    start = time.perf_counter()
+    with stage("fetch") as st:
+        if args.workers > 1:
+            df_participants, df_trials, df_pre_trials = fetch_parallel(
+                client, workers=args.workers, pids_per_page=args.pids_per_page, retries=args.retries,
+                backoff=args.backoff)
+        else:
+            df_participants = fetch_collection(client, "participants")
+            df_trials = fetch_collection(client, "fitts_trials")
+            df_pre_trials = fetch_collection(client, "fitts_pre_trials")
+        st.rows = len(df_participants) + len(df_trials) + len(df_pre_trials)
+    print(f"Fetched {len(df_trials)} trials in {time.perf_counter() - start:.2f}s ({args.workers} workers)")
+
+    with stage("write raw", rows=len(df_participants) + len(df_trials) + len(df_pre_trials)):
+        df_participants.to_parquet(OUT_DIR / f"participants_{ts}.parquet", index=False)
+        df_trials.to_parquet(OUT_DIR / f"trials_{ts}.parquet", index=False)
+        df_pre_trials.to_parquet(OUT_DIR / f"pre_trials_{ts}.parquet", index=False)
 
     # Si guardaste posiciones dentro de trials como arrays largos, puedes
     # reventarlas luego en 01_flatten_trials.py para una tabla positions
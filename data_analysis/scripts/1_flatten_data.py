@@ -1,17 +1,20 @@
+import argparse
 import pandas as pd
 from pathlib import Path
 import utils_paths as up
+from profiling import stage
+from trace_codec import decode_traces, trace_positions
+from positions_store import POSITION_COLUMNS, join_positions, split_positions, write_positions
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
 PROC = Path(up.PROCESSED_DATA)
 RAW = Path(up.RAW_DATA)
 
 PROC.mkdir(parents=True, exist_ok=True)
 
-TRIALS = Path(up.TRIALS_FILE)
-POSITIONS = Path(up.POSITIONS_FILE)
-
-
 TRIALS = Path(up.TRIALS_FILE)
 POSITIONS = Path(up.POSITIONS_FILE)
 ERROR_RATES_FILE_CSV = Path(up.ERROR_RATES_FILE_CSV)
@@ -20,146 +23,314 @@ TRIALS_CSV = Path(up.TRIALS_FILE_CSV)
 POSITIONS_CSV = Path(up.POSITIONS_FILE_CSV)
 ERROR_RATES_CSV = Path(up.ERROR_RATES_FILE_CSV)
 
-trials_path = sorted(RAW.glob("trials_*.parquet"))[-1]
-df_trials = pd.read_parquet(trials_path)
+OUT_DIR = Path(up.PROCESSED_CSV_DATA)
 
-pretrials_path = sorted(RAW.glob("pre_trials_*.parquet"))[-1]
-df_pre_trials = pd.read_parquet(pretrials_path)
 
+def _distance_to_target(event, r):
+    """Euclidean distance between an {x, y} event and the trial target."""
+    return np.sqrt((event.get("x", 0) - r.get("targetPosition", {}).get("x", 0))**2 + (event.get("y", 0) - r.get("targetPosition", {}).get("y", 0))**2)
 
-OUT_DIR = Path(up.PROCESSED_CSV_DATA)
-OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-# explode cursorPositionsInterval -> positions table
-pos_rows = []
+def _cursor_positions(r):
+    """cursorPositions of a raw trial, decoded from cursorTrace if it was uploaded packed (trace_codec.js)."""
+    trace = r.get("cursorTrace")
+    if isinstance(trace, str):
+        return trace_positions(trace)
+    positions = r.get("cursorPositions")
+    return positions if positions is not None else []
 
-summarized_trials = []
 
-success_rates = dict() 
+def summarize_trials(df_trials):
+    """
+    One summary row per trial plus success / error rates per participant and condition.
 
-print(f"Processing trials: {len(df_trials)}")
+    Returns:
+    --------
+    (DataFrame, DataFrame)
+        Summarized trials and error rates
+    """
+    summarized_trials = []
+    success_rates = dict()
 
-for _, r in df_trials.iterrows():
-    key = f"{r.get('participantId')}-{r.get('buffer')}-{r.get('indication')}-{r.get('feedbackMode')}-{r.get('W')}-{r.get('A')}"
-    if not key in success_rates:
-        success_rates[key] = {"success": 0, "total": 0, "Wrong_Indication": 0}
-    if r.get("success"):
-        success_rates[key]["success"] += 1
-    success_rates[key]["total"] += 1
-    success_rates[key]["Wrong_Indication"] += len(r.get("wrongIndications", []))
+    for _, r in df_trials.iterrows():
+        key = f"{r.get('participantId')}-{r.get('buffer')}-{r.get('indication')}-{r.get('feedbackMode')}-{r.get('W')}-{r.get('A')}"
+        if not key in success_rates:
+            success_rates[key] = {"success": 0, "total": 0, "Wrong_Indication": 0}
+        if r.get("success"):
+            success_rates[key]["success"] += 1
+        success_rates[key]["total"] += 1
+        success_rates[key]["Wrong_Indication"] += len(r.get("wrongIndications", []))
 
+        indicationDown = r.get("indicationsDown", [])
+        indicationUp = r.get("indicationsUp", [])
+        reachingTimes = r.get("reachingTimes", [])
+        outTimes = r.get("outTimes", [])
+        bufferReachinTimes = r.get("bufferReachingTimes", [])
+        bufferOutTimes = r.get("bufferOutTimes", [])
+        cursorPositions = _cursor_positions(r)
+
+        summarized_trials.append({
+            "trialDocId": r["__doc_id"],
+            "participantId": r.get("participantId"),
+            "buffer": r.get("buffer"),
+            "indication": r.get("indication"),
+            "feedbackMode": r.get("feedbackMode"),
+            "W": r.get("W"),
+            "A": r.get("A"),
+            "Target_position_x": r.get("targetPosition", {}).get("x"),
+            "Target_position_y": r.get("targetPosition", {}).get("y"),
+            "Previous_target_position_x": r.get("previousTargetPosition", {}).get("x"),
+            "Previous_target_position_y": r.get("previousTargetPosition", {}).get("y"),
+            "Indication_down_x": indicationDown[-1].get("x") if len(indicationDown) > 0 else None,
+            "Indication_down_y": indicationDown[-1].get("y") if len(indicationDown) > 0 else None,
+            "Indication_down_t": indicationDown[-1].get("time") if len(indicationDown) > 0 else None,
+            "Indication_down_in_target": indicationDown[-1].get("inTarget") if len(indicationDown) > 0 else None,
+            "Indication_up_x": indicationUp[-1].get("x") if len(indicationUp) > 0 else None,
+            "Indication_up_y": indicationUp[-1].get("y") if len(indicationUp) > 0 else None,
+            "Indication_up_t": indicationUp[-1].get("time") if len(indicationUp) > 0 else None,
+            "Indication_up_in_target": indicationUp[-1].get("inTarget") if len(indicationUp) > 0 else None,
+            "Reaching_pos_x": reachingTimes[-1].get("x") if len(reachingTimes) > 0 else None,
+            "Reaching_pos_y": reachingTimes[-1].get("y") if len(reachingTimes) > 0 else None,
+            "Reaching_time": reachingTimes[-1].get("time") if len(reachingTimes) > 0 else None,
+            "Buffer_reaching_time": bufferReachinTimes[-1].get("time") if len(bufferReachinTimes) > 0 else None,
+            "Number_reaching_time": len(reachingTimes),
+            "Number_out_time": len(outTimes),
+            "Number_buffer_reaching_time": len(bufferReachinTimes),
+            "Number_buffer_out_time": len(bufferOutTimes),
+            "Start_position_x": cursorPositions[0].get("x") if len(cursorPositions) > 0 else None,
+            "Start_position_y": cursorPositions[0].get("y") if len(cursorPositions) > 0 else None,
+            "Distance_to_target_indication_down": _distance_to_target(indicationDown[-1], r) if len(indicationDown) > 0 else None,
+            "Distance_to_target_indication_up": _distance_to_target(indicationUp[-1], r) if len(indicationUp) > 0 else None,
+            "success": r.get("success", False),
+            "wrongIndications": len(r.get("wrongIndications", [])),
+            "Reaching_times": reachingTimes,
+            "Out_times": outTimes,
+            "Buffer_reaching_times": bufferReachinTimes,
+            "Buffer_out_times": bufferOutTimes
+        })
+
+    sucess_rates_summary = []
+    for pid  in success_rates.keys():
+        rates = success_rates[pid]
+        total = rates["total"]
+        success = rates["success"]
+        wrongIndications = rates["Wrong_Indication"]
+        rate = success / total if total > 0 else 0
+        pid_split = pid.split("-")
+        sucess_rates_summary.append({
+            "participantId": pid_split[0],
+            "buffer": pid_split[1],
+            "indication": pid_split[2],
+            "feedback": pid_split[3],
+            "W": pid_split[4],
+            "A": pid_split[5],
+            "success": success,
+            "total": total,
+            "success_rate": rate,
+            "Wrong_Indication": wrongIndications
+        })
+        #print(f"Participant {pid}: Success Rate = {rate:.2%} ({success}/{total})")
+
+    return pd.DataFrame(summarized_trials), pd.DataFrame(sucess_rates_summary)
+
+
+def _trial_position_attrs(r, src_field="cursorPositions"):
+    """Trial-level attributes repeated on every cursor sample of the positions table."""
     indicationDown = r.get("indicationsDown", [])
     indicationUp = r.get("indicationsUp", [])
-    reachingTimes = r.get("reachingTimes", [])
-    outTimes = r.get("outTimes", [])
-    bufferReachinTimes = r.get("bufferReachingTimes", [])
-    bufferOutTimes = r.get("bufferOutTimes", [])
-
-    summarized_trials.append({
-        "trialDocId": r["__doc_id"],
-        "participantId": r.get("participantId"),
-        "buffer": r.get("buffer"),
-        "indication": r.get("indication"),
-        "feedbackMode": r.get("feedbackMode"),
-        "W": r.get("W"),
-        "A": r.get("A"),
+    return {
+        "trialDocId": r["__doc_id"], # Not sure I need this, but it can be useful to link back to trial info
+        "participantId": r.get("participantId"), # This should be linked to one of the registers in demotrphics in folder of prolific
         "Target_position_x": r.get("targetPosition", {}).get("x"),
         "Target_position_y": r.get("targetPosition", {}).get("y"),
-        "Previous_target_position_x": r.get("previousTargetPosition", {}).get("x"),
-        "Previous_target_position_y": r.get("previousTargetPosition", {}).get("y"),
+        "Distance_to_target_indication_down": _distance_to_target(indicationDown[-1], r) if len(indicationDown) > 0 else None,
+        "Distance_to_target_indication_up": _distance_to_target(indicationUp[-1], r) if len(indicationUp) > 0 else None,
         "Indication_down_x": indicationDown[-1].get("x") if len(indicationDown) > 0 else None,
         "Indication_down_y": indicationDown[-1].get("y") if len(indicationDown) > 0 else None,
-        "Indication_down_t": indicationDown[-1].get("time") if len(indicationDown) > 0 else None,
-        "Indication_down_in_target": indicationDown[-1].get("inTarget") if len(indicationDown) > 0 else None,
         "Indication_up_x": indicationUp[-1].get("x") if len(indicationUp) > 0 else None,
         "Indication_up_y": indicationUp[-1].get("y") if len(indicationUp) > 0 else None,
-        "Indication_up_t": indicationUp[-1].get("time") if len(indicationUp) > 0 else None,
-        "Indication_up_in_target": indicationUp[-1].get("inTarget") if len(indicationUp) > 0 else None,
-        "Reaching_pos_x": reachingTimes[-1].get("x") if len(reachingTimes) > 0 else None,
-        "Reaching_pos_y": reachingTimes[-1].get("y") if len(reachingTimes) > 0 else None,
-        "Reaching_time": reachingTimes[-1].get("time") if len(reachingTimes) > 0 else None,
-        "Buffer_reaching_time": bufferReachinTimes[-1].get("time") if len(bufferReachinTimes) > 0 else None,
-        "Number_reaching_time": len(reachingTimes),
-        "Number_out_time": len(outTimes),
-        "Number_buffer_reaching_time": len(bufferReachinTimes),
-        "Number_buffer_out_time": len(bufferOutTimes),
-        "Start_position_x": r.get("cursorPositions", [{}])[0].get("x") if len(r.get("cursorPositions", [])) > 0 else None,
-        "Start_position_y": r.get("cursorPositions", [{}])[0].get("y") if len(r.get("cursorPositions", [])) > 0 else None,
-        "Distance_to_target_indication_down": np.sqrt((indicationDown[-1].get("x", 0) - r.get("targetPosition", {}).get("x", 0))**2 + (indicationDown[-1].get("y", 0) - r.get("targetPosition", {}).get("y", 0))**2) if len(indicationDown) > 0 else None,
-        "Distance_to_target_indication_up": np.sqrt((indicationUp[-1].get("x", 0) - r.get("targetPosition", {}).get("x", 0))**2 + (indicationUp[-1].get("y", 0) - r.get("targetPosition", {}).get("y", 0))**2) if len(indicationUp) > 0 else None,
-        "success": r.get("success", False),
-        "wrongIndications": len(r.get("wrongIndications", [])),
-        "Reaching_times": reachingTimes,
-        "Out_times": outTimes,
-        "Buffer_reaching_times": bufferReachinTimes,
-        "Buffer_out_times": bufferOutTimes
-    })
-
-    for src_field in ["cursorPositions"]:
-        arr = r.get(src_field)
+        "W": r.get("W"),
+        "A": r.get("A"),
+        "ID": r.get("ID"), # in case positions have their own ID
+        "indication": r.get('indication'),
+        "feedbackMode": r.get('feedbackMode'),
+        "buffer": r.get('buffer'),
+        "source": src_field
+    }
+
+
+def flatten_positions_loop(df_trials):
+    """
+    Reference implementation: explode cursorPositions (or the decoded cursorTrace)
+    into one dict per sample. Kept to check the columnar engine (see --check-parity).
+    """
+    pos_rows = []
+    for _, r in df_trials.iterrows():
+        src_field = "cursorTrace" if isinstance(r.get("cursorTrace"), str) else "cursorPositions"
+        arr = _cursor_positions(r)
         if isinstance(arr, (list, np.ndarray)):
-            #print(f"Processing {src_field} - {type(arr)} for trial {r['__doc_id']}")
+            attrs = _trial_position_attrs(r, src_field)
             for p in arr:
-                pos_rows.append({
-                    "trialDocId": r["__doc_id"], # Not sure I need this, but it can be useful to link back to trial info
-                    "participantId": r.get("participantId"), # This should be linked to one of the registers in demotrphics in folder of prolific
-                    "t": p.get("time"),
-                    "x": p.get("x"),
-                    "y": p.get("y"),
-                    "Target_position_x": r.get("targetPosition", {}).get("x"),
-                    "Target_position_y": r.get("targetPosition", {}).get("y"),
-                    "Distance_to_target": np.sqrt((p.get("x") - r.get("targetPosition", {}).get("x", 0))**2 + (p.get("y") - r.get("targetPosition", {}).get("y", 0))**2),   
-                    "Distance_to_target_indication_down": np.sqrt((indicationDown[-1].get("x", 0) - r.get("targetPosition", {}).get("x", 0))**2 + (indicationDown[-1].get("y", 0) - r.get("targetPosition", {}).get("y", 0))**2) if len(indicationDown) > 0 else None,
-                    "Distance_to_target_indication_up": np.sqrt((indicationUp[-1].get("x", 0) - r.get("targetPosition", {}).get("x", 0))**2 + (indicationUp[-1].get("y", 0) - r.get("targetPosition", {}).get("y", 0))**2) if len(indicationUp) > 0 else None,
-                    "Indication_down_x": indicationDown[-1].get("x") if len(indicationDown) > 0 else None,
-                    "Indication_down_y": indicationDown[-1].get("y") if len(indicationDown) > 0 else None,
-                    "Indication_up_x": indicationUp[-1].get("x") if len(indicationUp) > 0 else None,
-                    "Indication_up_y": indicationUp[-1].get("y") if len(indicationUp) > 0 else None,
-                    "W": r.get("W"),
-                    "A": r.get("A"),
-                    "ID": r.get("ID"), # in case positions have their own ID
-                    "indication": r.get('indication'),
-                    "feedbackMode": r.get('feedbackMode'),
-                    "buffer": r.get('buffer'),
-                    "source": src_field
-                })
-
-sucess_rates_summary = []
-for pid  in success_rates.keys():
-    rates = success_rates[pid]
-    total = rates["total"]
-    success = rates["success"]
-    wrongIndications = rates["Wrong_Indication"]
-    rate = success / total if total > 0 else 0
-    pid_split = pid.split("-")
-    sucess_rates_summary.append({
-        "participantId": pid_split[0],
-        "buffer": pid_split[1],
-        "indication": pid_split[2],
-        "feedback": pid_split[3],
-        "W": pid_split[4],
-        "A": pid_split[5],
-        "success": success,
-        "total": total,
-        "success_rate": rate,
-        "Wrong_Indication": wrongIndications
-    })
-    #print(f"Participant {pid}: Success Rate = {rate:.2%} ({success}/{total})")  
-
-df_error_rates = pd.DataFrame(sucess_rates_summary)
-df_error_rates.to_csv(up.ERROR_RATES_FILE_CSV, index=False)
-
-
-df_positions = pd.DataFrame(pos_rows)
-
-# guardar tabulados
-df_trials = pd.DataFrame(summarized_trials)
-df_trials.to_parquet(TRIALS, index=False)
-df_trials.to_csv(TRIALS_CSV, index=False)
-
-df_pre_trials.to_parquet(Path(up.PRE_TRIALS_FILE), index=False)
-df_pre_trials.to_csv(Path(up.PRE_TRIALS_FILE_CSV), index=False)
-
-if not df_positions.empty:
-    df_positions.to_parquet(POSITIONS, index=False)
-    #df_positions.to_csv(POSITIONS_CSV, index=False)
+                row = dict(attrs)
+                row["t"] = p.get("time")
+                row["x"] = p.get("x")
+                row["y"] = p.get("y")
+                row["Distance_to_target"] = np.sqrt((p.get("x") - r.get("targetPosition", {}).get("x", 0))**2 + (p.get("y") - r.get("targetPosition", {}).get("y", 0))**2)
+                pos_rows.append(row)
+    df_positions = pd.DataFrame(pos_rows)
+    if df_positions.empty:
+        return df_positions
+    return df_positions[POSITION_COLUMNS]
+
+
+def flatten_samples_columnar(df_trials, cursor_positions, cursor_traces=None):
+    """
+    Explode cursorPositions using the Arrow list offsets instead of walking dicts.
+
+    Trial attributes are computed once per trial (the trial dimension table) and
+    t/x/y come straight from the flattened struct fields, with each sample keyed by
+    its trialDocId through np.repeat over the list lengths. Trials uploaded with a
+    packed cursorTrace are decoded by trace_codec.decode_traces into the same arrays.
+
+    Parameters:
+    -----------
+    df_trials : DataFrame
+        Raw trials (one row per Firestore document)
+    cursor_positions : pa.ChunkedArray or pa.Array or None
+        The cursorPositions column of the same table (list<struct<time, x, y>>),
+        None if no trial has one
+    cursor_traces : pa.ChunkedArray or pa.Array, optional
+        The cursorTrace column (base64 strings, null for unpacked trials)
+
+    Returns:
+    --------
+    (DataFrame, DataFrame)
+        Samples (SAMPLE_COLUMNS) and trials (TRIAL_COLUMNS, only trials with samples)
+    """
+    if cursor_positions is None:
+        cursor_positions = pa.nulls(len(df_trials), pa.list_(pa.struct([("time", pa.float64()), ("x", pa.float64()), ("y", pa.float64())])))
+    if isinstance(cursor_positions, pa.ChunkedArray):
+        cursor_positions = cursor_positions.combine_chunks()
+    if len(cursor_positions) != len(df_trials):
+        raise ValueError("cursor_positions must have one entry per trial")
+
+    packed = np.zeros(len(df_trials), dtype=bool)
+    if cursor_traces is not None:
+        packed = cursor_traces.is_valid().to_numpy(zero_copy_only=False)
+        if len(packed) != len(df_trials):
+            raise ValueError("cursor_traces must have one entry per trial")
+
+    # A packed trial takes its samples from the trace only
+    lengths = pc.fill_null(pc.list_value_length(cursor_positions), 0).to_numpy(zero_copy_only=False).copy()
+    lengths[packed] = 0
+    if packed.any():
+        trace_lengths, trace_t, trace_x, trace_y = decode_traces(cursor_traces.filter(pa.array(packed)).to_pylist())
+        lengths[packed] = trace_lengths
+    has_positions = lengths > 0
+    if not has_positions.any():
+        return pd.DataFrame(), pd.DataFrame()
+
+    # Trial-level attributes only for trials that contribute samples, so dtype inference
+    # sees exactly the same values as the per-sample loop
+    df_with_pos = df_trials[has_positions]
+    trials = pd.DataFrame([_trial_position_attrs(r, "cursorTrace" if is_packed else "cursorPositions")
+                           for (_, r), is_packed in zip(df_with_pos.iterrows(), packed[has_positions])])
+
+    samples = pd.DataFrame({"trialDocId": trials["trialDocId"].to_numpy().repeat(lengths[has_positions])})
+    flat = pc.list_flatten(cursor_positions.filter(pa.array(~packed)))
+    from_trace = np.repeat(packed[has_positions], lengths[has_positions])
+    decoded = {"time": trace_t, "x": trace_x, "y": trace_y} if packed.any() else {}
+    for col, field in [("t", "time"), ("x", "x"), ("y", "y")]:
+        values = flat.field(field).to_pandas()
+        if field in decoded:
+            merged = np.empty(len(from_trace), dtype=np.result_type(values.dtype, np.float64))
+            merged[~from_trace] = values.to_numpy()
+            merged[from_trace] = decoded[field]
+            values = merged
+        samples[col] = values
+    return samples, trials
+
+
+def flatten_positions_columnar(df_trials, cursor_positions, cursor_traces=None):
+    """
+    Wide positions table of the columnar engine (flatten_samples_columnar joined
+    back); same columns and dtypes as flatten_positions_loop.
+    """
+    samples, trials = flatten_samples_columnar(df_trials, cursor_positions, cursor_traces)
+    if samples.empty:
+        return samples
+    return join_positions(samples, trials)
+
+
+def _column(table, name):
+    """A column of the raw Arrow table, None if no document has that field."""
+    return table.column(name) if name in table.column_names else None
+
+
+def check_positions_parity(df_trials, cursor_positions, cursor_traces=None):
+    """Raise AssertionError if the columnar engine differs from the reference loop."""
+    expected = flatten_positions_loop(df_trials)
+    got = flatten_positions_columnar(df_trials, cursor_positions, cursor_traces)
+    pd.testing.assert_frame_equal(got, expected, check_exact=True)
+    print(f"Parity OK: {len(got)} position rows, {len(got.columns)} columns")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flatten raw Firestore trials into processed tables")
+    parser.add_argument("--engine", choices=["columnar", "loop"], default="columnar",
+                        help="How to explode cursorPositions (default: columnar)")
+    parser.add_argument("--check-parity", action="store_true",
+                        help="Compare the columnar engine against the reference loop and exit")
+    parser.add_argument("--no-wide", dest="wide", action="store_false",
+                        help="Skip the denormalized positions_latest.parquet (one row per sample with all trial "
+                             "attributes), written next to the samples / position_trials tables by default")
+    args = parser.parse_args(argv)
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+
+    with stage("load raw") as st:
+        trials_path = sorted(RAW.glob("trials_*.parquet"))[-1]
+        trials_table = pq.read_table(trials_path)
+        df_trials = trials_table.to_pandas()
+
+        pretrials_path = sorted(RAW.glob("pre_trials_*.parquet"))[-1]
+        df_pre_trials = pd.read_parquet(pretrials_path)
+        st.rows = len(df_trials) + len(df_pre_trials)
+
+    if args.check_parity:
+        check_positions_parity(df_trials, _column(trials_table, "cursorPositions"), _column(trials_table, "cursorTrace"))
+        return
+
+    print(f"Processing trials: {len(df_trials)}")
+
+    with stage("summarize trials", rows=len(df_trials)):
+        df_summary, df_error_rates = summarize_trials(df_trials)
+        df_error_rates.to_csv(up.ERROR_RATES_FILE_CSV, index=False)
+
+    # explode cursorPositions -> samples table + trial dimension table
+    with stage(f"flatten positions [{args.engine}]") as st:
+        if args.engine == "columnar":
+            df_samples, df_position_trials = flatten_samples_columnar(df_trials, _column(trials_table, "cursorPositions"),
+                                                                      _column(trials_table, "cursorTrace"))
+        else:
+            df_positions = flatten_positions_loop(df_trials)
+            df_samples, df_position_trials = split_positions(df_positions) if not df_positions.empty else (df_positions, df_positions)
+        st.rows = len(df_samples)
+
+    # guardar tabulados
+    with stage("write outputs", rows=len(df_summary) + len(df_pre_trials) + len(df_samples)):
+        df_summary.to_parquet(TRIALS, index=False)
+        df_summary.to_csv(TRIALS_CSV, index=False)
+
+        df_pre_trials.to_parquet(Path(up.PRE_TRIALS_FILE), index=False)
+        df_pre_trials.to_csv(Path(up.PRE_TRIALS_FILE_CSV), index=False)
+
+        if not df_samples.empty:
+            write_positions(df_samples, df_position_trials)
+            if args.wide:
+                join_positions(df_samples, df_position_trials).to_parquet(POSITIONS, index=False)
+            #df_positions.to_csv(POSITIONS_CSV, index=False)
+
+
+if __name__ == "__main__":
+    main()
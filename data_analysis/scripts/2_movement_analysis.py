@@ -1,69 +1,191 @@
 
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 import utils_paths as up
 from pathlib import Path
 import pandas as pd
-from submovements import analyze_trial_positions
-import matplotlib.pyplot as plt
+from submovements import analyze_trial_positions, analyze_trials_batch, ResampleCfg, Thresholds
+from submovement_cache import SubmovementCache, trial_key, DEFAULT_MAX_MB
+from profiling import stage
+from kinematics_store import write_kinematics
+from positions_store import read_samples, read_trials
 import  math
 
-def main():
-    
+def _prepare_trial(grp):
+    grp_sorted = grp[['t','x','y']].sort_values('t')
+    if grp_sorted['t'].iloc[0] > 0:
+        first_t = grp_sorted.iloc[[0]].copy()
+        first_t['t'] = 0
+        grp_sorted = pd.concat([first_t, grp_sorted], ignore_index=True)
+    return grp_sorted
+
+def _analyze_trial(trial_id, grp_sorted, tempo=None):
+    """Run the submovement analysis for one trial; None if no segments were found."""
+    #plot_trial_positions(grp_sorted)
+    #plot_trial_velocities(calculate_velocity(grp_sorted))
+    if tempo is None:
+        tempo = analyze_trial_positions(grp_sorted)
+    #print(f"Trial {trial_id} analyzed: {tempo.keys()}")
+    #plot_trial_velocities(tempo['uniform'], tempo['segments'])
+    #print(f'Segments: {len(tempo["segments"]) if tempo["segments"] is not None else 0} -- {tempo["segments"]}')
+    segs = tempo['segments'].copy()
+    kinems = tempo['uniform'].copy()
+
+    if segs is None or segs.empty:
+        return None
+    #print(segs)
+    segs.insert(0, "trialDocId", trial_id)
+    kinems.insert(0, "trialDocId", trial_id)
+    return segs, kinems
+
+def _analyze_chunk(chunk, batch_filter=False):
+    """
+    Worker entry point: analyze_trial_positions for a list of (trial_id, positions), in order.
+    With batch_filter the whole chunk goes through one batched low-pass filter.
+    """
+    if batch_filter:
+        return analyze_trials_batch([grp_sorted for _, grp_sorted in chunk])
+    return [analyze_trial_positions(grp_sorted) for _, grp_sorted in chunk]
+
+def analyze_trials(df, workers=1, chunksize=16, batch_filter=False, cache=None):
+    """
+    Analyze every trial of the positions table.
+
+    With workers > 1 the trials are sharded in chunks of `chunksize` over a
+    ProcessPoolExecutor. executor.map returns the chunks in submission order,
+    so the result is identical to the serial run. batch_filter low-pass filters
+    each chunk at once (the serial run is then a single chunk).
+
+    With a SubmovementCache, trials already analyzed with the same settings are
+    read from it and only the rest are computed (and then stored).
+
+    Returns:
+    --------
+    (list, list)
+        Per-trial segment and kinematic frames, in trialDocId order
+    """
+    trials = [(trial_id, _prepare_trial(grp)) for trial_id, grp in df.groupby("trialDocId")]
+    #trials = trials[56:65]
+
+    tempos = [None] * len(trials)
+    if cache is not None:
+        resample_cfg, thresholds = ResampleCfg(), Thresholds()
+        keys = [trial_key(grp_sorted, resample_cfg, thresholds) for _, grp_sorted in trials]
+        tempos = [cache.get(key) for key in keys]
+    todo = [i for i, tempo in enumerate(tempos) if tempo is None]
+    pending = [trials[i] for i in todo]
+
+    if not pending:
+        computed = []
+    elif workers > 1:
+        chunks = [pending[i:i + chunksize] for i in range(0, len(pending), chunksize)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            computed = [r for chunk_result in executor.map(partial(_analyze_chunk, batch_filter=batch_filter), chunks)
+                        for r in chunk_result]
+    else:
+        computed = _analyze_chunk(pending, batch_filter=batch_filter)
+
+    for i, tempo in zip(todo, computed):
+        tempos[i] = tempo
+        if cache is not None:
+            cache.put(keys[i], tempo)
+    if cache is not None:
+        cache.trim()
+
+    results = [_analyze_trial(trial_id, grp_sorted, tempo) for (trial_id, grp_sorted), tempo in zip(trials, tempos)]
+    seg_rows = [r[0] for r in results if r is not None]
+    kinematic_rows = [r[1] for r in results if r is not None]
+    return seg_rows, kinematic_rows
+
+def benchmark_workers(df, worker_counts=(1, 2, 4, 8), chunksize=16, batch_filter=False):
+    """Time analyze_trials for each worker count and print the speedup over 1 worker."""
+    n_trials = df['trialDocId'].nunique()
+    print(f"Benchmarking {n_trials} trials on {os.cpu_count()} CPUs")
+    base = None
+    for workers in worker_counts:
+        start = time.perf_counter()
+        analyze_trials(df, workers=workers, chunksize=chunksize, batch_filter=batch_filter)
+        elapsed = time.perf_counter() - start
+        base = base or elapsed
+        print(f"  workers={workers}: {elapsed:.2f}s ({base / elapsed:.2f}x)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Submovement analysis of the cursor positions")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Analyze trials on N processes (default: 1, serial)")
+    parser.add_argument("--chunksize", type=int, default=16,
+                        help="Trials per task submitted to the process pool (default: 16)")
+    parser.add_argument("--batch-filter", action="store_true",
+                        help="Low-pass filter each chunk of trials in one batched pass (same output)")
+    parser.add_argument("--bench", action="store_true",
+                        help="Time the analysis with 1/2/4/8 workers and exit without writing")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Recompute every trial instead of reusing cached results")
+    parser.add_argument("--partition-by-condition", action="store_true",
+                        help="Partition the segments dataset by participantId and feedbackMode (default: participantId)")
+    # Readers of the float64 kinematics.parquet/.csv (notebooks) ask for them with full or both
+    parser.add_argument("--kinematics-format", choices=["compact", "full", "both"], default="compact",
+                        help="compact: kinematics_compact.parquet (kinematics_store.py); full: the float64 "
+                             "kinematics.parquet/.csv; both: all of them (default: compact)")
+    parser.add_argument("--cache-max-mb", type=float, default=DEFAULT_MAX_MB,
+                        help=f"Size cap of the result cache, least recently used entries are evicted (default: {DEFAULT_MAX_MB})")
+    args = parser.parse_args(argv)
 
     outdir = Path(up.PROCESSED_DATA); outdir.mkdir(parents=True, exist_ok=True)
-    df = pd.read_parquet(up.POSITIONS_FILE)
+    with stage("load positions") as st:
+        df = read_samples(up.SAMPLES_FILE)
+        st.rows = len(df)
     #print(df.columns)
 
     # Expect at least trialDocId,t,x,y
     required = {"trialDocId","t","x","y"}
     if not required.issubset(df.columns):
-        raise ValueError(f"Positions parquet must include columns: {required}")
-
-    seg_rows = []
-    kinematic_rows = []
+        raise ValueError(f"Samples parquet must include columns: {required}")
 
-    for trial_id, grp in df.groupby("trialDocId"):
-    #for trial_id, grp in [next(iter(df.groupby("trialDocId")))]:
-    #for trial_id, grp in list(df.groupby("trialDocId"))[56:65]:
+    if args.bench:
+        benchmark_workers(df, chunksize=args.chunksize, batch_filter=args.batch_filter)
+        return
 
-        grp_sorted = grp[['t','x','y']].sort_values('t')
-        if grp_sorted['t'].iloc[0] > 0:
-            first_t = grp_sorted.iloc[[0]].copy()
-            first_t['t'] = 0
-            grp_sorted = pd.concat([first_t, grp_sorted], ignore_index=True)
-
-        #plot_trial_positions(grp_sorted)
-        #plot_trial_velocities(calculate_velocity(grp_sorted))
-        tempo = analyze_trial_positions(grp_sorted)
-        #print(f"Trial {trial_id} analyzed: {tempo.keys()}")
-        #plot_trial_velocities(tempo['uniform'], tempo['segments'])
-        #print(f'Segments: {len(tempo["segments"]) if tempo["segments"] is not None else 0} -- {tempo["segments"]}')
-        segs = tempo['segments'].copy()
-        kinems = tempo['uniform'].copy()
-
-        if segs is None or segs.empty:
-            continue
-        #print(segs)
-        segs.insert(0, "trialDocId", trial_id)
-        kinems.insert(0, "trialDocId", trial_id)
-        seg_rows.append(segs)
-        kinematic_rows.append(kinems)
+    cache = None if args.no_cache else SubmovementCache(max_mb=args.cache_max_mb)
+    with stage("analyze trials", rows=len(df)):
+        seg_rows, kinematic_rows = analyze_trials(df, workers=args.workers, chunksize=args.chunksize,
+                                                  batch_filter=args.batch_filter, cache=cache)
     #return
     if seg_rows:
-        seg_all = pd.concat(seg_rows, ignore_index=True)
-        seg_all.to_parquet(up.SEGMENTS_FILE, index=False)
-        seg_all.to_csv(up.SEGMENTS_FILE_CSV, index=False)
-        kins_all = pd.concat(kinematic_rows, ignore_index=True)
-        kins_all.to_parquet(up.KINEMATICS_FILE, index = False)
-        kins_all.to_csv(up.KINEMATICS_FILE_CSV, index=False)
+        with stage("write outputs") as st:
+            seg_all = pd.concat(seg_rows, ignore_index=True)
+            seg_all.to_parquet(up.SEGMENTS_FILE, index=False)
+            seg_all.to_csv(up.SEGMENTS_FILE_CSV, index=False)
+            kins_all = pd.concat(kinematic_rows, ignore_index=True)
+            if args.kinematics_format in ("compact", "both"):
+                write_kinematics(kins_all, up.KINEMATICS_COMPACT_FILE, dt_ms=ResampleCfg().dt_ms)
+            if args.kinematics_format in ("full", "both"):
+                kins_all.to_parquet(up.KINEMATICS_FILE, index = False)
+                kins_all.to_csv(up.KINEMATICS_FILE_CSV, index=False)
+
+            # Partitioned copy of the segments for the selections of 3_1_analysis.py,
+            # keyed by the participant (and condition) of each trial
+            partition_cols = up.CONDITION_PARTITION_COLS if args.partition_by_condition else up.PARTITION_COLS
+            trial_keys = read_trials(up.POSITION_TRIALS_FILE, columns=["trialDocId", *partition_cols]).set_index("trialDocId")
+            up.write_partitioned(seg_all.join(trial_keys, on="trialDocId"), up.SEGMENTS_DATASET, partition_cols)
+            st.rows = len(seg_all) + len(kins_all)
 
         #print(f"Saved segments -> {seg_path} ({len(seg_all)} rows)")
     else:
         print("No segments detected.")
 
+    if cache is not None:
+        print(cache.summary())
+
 def plot_trial_positions(df_trial: pd.DataFrame):
     """
     df_trial: columns ['t','x','y'] (ms, px)
     """
+    import matplotlib.pyplot as plt
+
     plt.figure(figsize=(8,4))
     plt.plot(df_trial['t'], df_trial['x'], label='x')
     plt.plot(df_trial['t'], df_trial['y'], label='y')
@@ -84,6 +206,7 @@ def plot_trial_velocities(df_trial: pd.DataFrame, segments: pd.DataFrame=None):
     """
     df_trial: columns ['t','x','y'] (ms, px)
     """
+    import matplotlib.pyplot as plt
 
     #print(f"Plotting velocities for trial with {len(df_trial)} points \n {df_trial} ")
 
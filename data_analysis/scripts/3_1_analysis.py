@@ -1,105 +1,195 @@
+import argparse
 import pandas as pd
 import numpy as np
-from utils_paths import TRIALS_FILE, SEGMENTS_FILE, ANALYSIS_FILE_1
-from collections import defaultdict
-from tqdm import tqdm
-
-# Cargar archivos
-df_trials = pd.read_parquet(TRIALS_FILE)
-df_segments = pd.read_parquet(SEGMENTS_FILE)
-
-print(df_trials.columns)
-print(df_segments.columns)
-
-# Asegurar que los campos de tiempo estén como float
-for col in ['Indication_down_t', 'Indication_up_t', 'Reaching_time']:
-    df_trials[col] = df_trials[col].apply(lambda x: np.array(x, dtype=float) if isinstance(x, list) else x)
-
-# Inicializar lista de resultados
-results = []
-
-for idx, trial in tqdm(df_trials.iterrows(), total=len(df_trials)):
-    trial_id = trial['trialDocId']
-    participant_id = trial['participantId']
-
-    reaching_times = trial['Reaching_times']
-    out_times = trial['Out_times']
-    
-
-
-    if not isinstance(trial['Reaching_times'], np.ndarray) or len(trial['Reaching_times']) == 0:
-        continue  # ignorar si no hay reaching
-
-    times = {
-        'reaching': trial['Reaching_time'],
-        'clickDown':  trial['Indication_down_t'],
-        'clickUp': trial['Indication_up_t']
-    }
-
-
-    # Obtener los segmentos de ese trial
-    segs = df_segments[(df_segments['trialDocId'] == trial_id) ]
-
-    #print(f"Trial {trial_id} - Reaching times: {reaching_times}, Out times: {out_times}, Segments: {len(segs)}")
-
-    def get_movement_type(t):
-        seg = segs[(segs['t_start'] <= t) & (segs['t_end'] >= t)]
-        if len(seg) == 0:
-            return 'pause'
-        return seg.iloc[0]['type']
-
-    movement_types = {
-        'reaching': get_movement_type(times['reaching']),
-        'clickDown': get_movement_type(times['clickDown']),
-        'clickUp': get_movement_type(times['clickUp'])
-    }
-
-
-    for time_type  in ['reaching', 'clickDown', 'clickUp']:
-        movement_type_sum = 'rapid' if 'rapid' in movement_types[time_type] else movement_types[time_type]
-        sucess_type = 'fail'
-        if len(out_times) < len(reaching_times):
-            sucess_type = 'success +1 reach'
-            if len(reaching_times) == 1:
-                sucess_type = 'success no outs'
-        results.append({
-            'participantId': participant_id,
-            'event': time_type,
-            'trialindex': trial_id,
-            #'ID': trial['ID'],
-            'A': trial['A'],
-            'W': trial['W'],
-            'feedbackMode': trial['feedbackMode'],
-            'buffer': trial['buffer'],
-            'reaching_count': len(reaching_times),
-            'outs_count': len(out_times),
-            'indication': trial['indication'],
-            'movement_type_reach': movement_types[time_type],
-            'movement_type_sum': movement_type_sum,
-            'sucess_type': sucess_type
-        })
-
-# Convertir a DataFrame
-df_results = pd.DataFrame(results)
-
-print(df_results.head(10))
-
-# Mostrar conteo agrupado por columnas clave
-grouped = df_results.groupby([
-    'event',
-    'movement_type_reach',
-    'movement_type_sum',
-    #'ID',
-    'A',
-    'W',
-    'feedbackMode',
-    'buffer',
-    'reaching_count',
-    'outs_count',
-    'indication',
-    'sucess_type'
-]).size().reset_index(name='count')
-
-# Guardar resultados
-grouped.to_csv(ANALYSIS_FILE_1, index=False)
-#print(grouped.head(40))
+import utils_paths as up
+from utils_paths import TRIALS_FILE, SEGMENTS_FILE, SEGMENTS_DATASET, ANALYSIS_FILE_1
+from profiling import stage
+
+EVENTS = {
+    'reaching': 'Reaching_time',
+    'clickDown': 'Indication_down_t',
+    'clickUp': 'Indication_up_t',
+}
+
+def _grouped_count(group_codes, values, q_codes, q_values, inclusive):
+    """
+    searchsorted of every query within its own group, done for all groups in one lexsort.
+
+    group_codes must be sorted. Returns the position in `values` after the last
+    value of the query's group that is < q_value (<= with inclusive). NaN
+    queries sort last and land at the end of their group.
+    """
+    n = len(values)
+    codes = np.concatenate([group_codes, q_codes])
+    vals = np.concatenate([values, q_values])
+    is_query = np.concatenate([np.zeros(n, dtype=bool), np.ones(len(q_values), dtype=bool)])
+    # On ties the values go first when inclusive (counted), otherwise the queries go first
+    tie = is_query if inclusive else ~is_query
+    order = np.lexsort((tie, vals, codes))
+    below = np.cumsum(~is_query[order])[is_query[order]]
+    out = np.empty(len(q_values), dtype=np.int64)
+    out[order[is_query[order]] - n] = below
+    return out
+
+def classify_events(df_segments, trial_ids, t):
+    """
+    Movement type of the first segment that contains each (trial_ids[i], t[i]), or 'pause'.
+
+    The segments are sorted by (trialDocId, t_start) once; "first" is in that
+    order, which is the order detect_submovements writes them in. Segments of a
+    trial can overlap (a rapid and a slow one) and one can even lie inside
+    another, so t_end is not sorted. Its running maximum per trial is: the first
+    segment whose running max reaches t is the first one that ends at or after t,
+    and it contains t when it is among the segments starting at or before t.
+    """
+    seg_trials = pd.Categorical(df_segments['trialDocId'])
+    codes = seg_trials.codes.astype(np.int64)
+    t_start = df_segments['t_start'].to_numpy(dtype=float)
+    t_end = df_segments['t_end'].to_numpy(dtype=float)
+    order = np.lexsort((np.arange(len(codes)), t_start, codes))
+    codes, t_start, t_end = codes[order], t_start[order], t_end[order]
+    types = df_segments['type'].to_numpy()[order]
+    # A segment without an end never contains t
+    end_max = pd.Series(np.where(np.isnan(t_end), -np.inf, t_end)).groupby(codes).cummax().to_numpy()
+
+    q_codes = seg_trials.categories.get_indexer(trial_ids).astype(np.int64)
+    t = np.asarray(t, dtype=float)
+    started = _grouped_count(codes, t_start, q_codes, t, inclusive=True)
+    ended = _grouped_count(codes, end_max, q_codes, t, inclusive=False)
+
+    movement = np.full(len(t), 'pause', dtype=object)
+    hit = (q_codes >= 0) & ~np.isnan(t) & (ended < started)
+    movement[hit] = types[ended[hit]]
+    return movement
+
+def event_movement_types(df_trials, df_segments):
+    """
+    One row per (trial with reaching, event) with the movement type the cursor
+    was in at that event, in the order trial -> reaching, clickDown, clickUp.
+    """
+    # Asegurar que los campos de tiempo estén como float
+    df_trials = df_trials.copy()
+    for col in ['Indication_down_t', 'Indication_up_t', 'Reaching_time']:
+        df_trials[col] = df_trials[col].apply(lambda x: np.array(x, dtype=float) if isinstance(x, list) else x)
+
+    # ignorar trials sin reaching
+    has_reaching = df_trials['Reaching_times'].map(lambda r: isinstance(r, np.ndarray) and len(r) > 0)
+    trials = df_trials[has_reaching].reset_index(drop=True)
+
+    reaching_count = trials['Reaching_times'].map(len)
+    outs_count = trials['Out_times'].map(len)
+    sucess_type = np.select(
+        [(outs_count < reaching_count) & (reaching_count == 1), outs_count < reaching_count],
+        ['success no outs', 'success +1 reach'],
+        default='fail',
+    )
+
+    # Clasificar los tres eventos de todos los trials en una sola pasada
+    n = len(trials)
+    event_names = list(EVENTS)
+    event_times = np.concatenate([trials[col].to_numpy(dtype=float) for col in EVENTS.values()])
+    with stage("classify events", rows=len(event_times)):
+        movement_types = classify_events(df_segments, np.tile(trials['trialDocId'].to_numpy(), len(EVENTS)), event_times)
+
+    # Una fila por (trial, evento), en el orden trial -> reaching, clickDown, clickUp
+    rows = np.tile(np.arange(n), len(EVENTS))
+    df_results = pd.DataFrame({
+        'participantId': trials['participantId'].to_numpy()[rows],
+        'event': np.repeat(event_names, n),
+        'trialindex': trials['trialDocId'].to_numpy()[rows],
+        #'ID': trials['ID'].to_numpy()[rows],
+        'A': trials['A'].to_numpy()[rows],
+        'W': trials['W'].to_numpy()[rows],
+        'feedbackMode': trials['feedbackMode'].to_numpy()[rows],
+        'buffer': trials['buffer'].to_numpy()[rows],
+        'reaching_count': reaching_count.to_numpy()[rows],
+        'outs_count': outs_count.to_numpy()[rows],
+        'indication': trials['indication'].to_numpy()[rows],
+        'movement_type_reach': movement_types,
+        'movement_type_sum': np.where(pd.Series(movement_types).str.contains('rapid', regex=False), 'rapid', movement_types),
+        'sucess_type': sucess_type[rows],
+    })
+    return df_results.iloc[np.argsort(rows, kind='stable')].reset_index(drop=True)
+
+def count_event_movement_types(df_results):
+    """Number of (trial, event) rows per event, movement type, condition and success type."""
+    return df_results.groupby([
+        'event',
+        'movement_type_reach',
+        'movement_type_sum',
+        #'ID',
+        'A',
+        'W',
+        'feedbackMode',
+        'buffer',
+        'reaching_count',
+        'outs_count',
+        'indication',
+        'sucess_type'
+    ]).size().reset_index(name='count')
+
+def load_trials_and_segments(participants=None, feedback_modes=None):
+    """
+    Trials of TRIALS_FILE and their submovement segments.
+
+    Without a selection both whole files are read. With participants and/or
+    feedback_modes only the matching trials are read, and their segments come
+    from the partitioned SEGMENTS_DATASET: the participantId (and feedbackMode,
+    when 2_movement_analysis.py ran with --partition-by-condition) filters skip
+    whole partitions, the trialDocId filter is pushed down to the row groups.
+
+    Returns:
+    --------
+    (DataFrame, DataFrame)
+        Trials and segments, the segments with the columns of SEGMENTS_FILE
+    """
+    if participants is None and feedback_modes is None:
+        return pd.read_parquet(TRIALS_FILE), pd.read_parquet(SEGMENTS_FILE)
+
+    filters = []
+    if participants is not None:
+        filters.append(("participantId", "in", list(participants)))
+    if feedback_modes is not None:
+        filters.append(("feedbackMode", "in", list(feedback_modes)))
+    df_trials = pd.read_parquet(TRIALS_FILE, filters=filters)
+
+    partition_cols = up.partition_names(SEGMENTS_DATASET)
+    seg_filters = [f for f in filters if f[0] in partition_cols]
+    seg_filters.append(("trialDocId", "in", df_trials["trialDocId"].tolist()))
+    df_segments = up.read_partitioned(SEGMENTS_DATASET, filters=seg_filters).drop(columns=partition_cols)
+    return df_trials, df_segments
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Movement type at the reaching and click events of every trial")
+    parser.add_argument("--participant", nargs="+", default=None, metavar="ID",
+                        help="Only these participants (reads only their partitions of the submovements dataset)")
+    parser.add_argument("--feedback-mode", nargs="+", default=None, metavar="MODE",
+                        help="Only these feedback modes")
+    parser.add_argument("--out", default=None,
+                        help="Output CSV (default: analysis_results.csv; a selection is only printed unless --out is given)")
+    args = parser.parse_args(argv)
+    selected = args.participant is not None or args.feedback_mode is not None
+    out = args.out if args.out is not None or selected else ANALYSIS_FILE_1
+
+    # Cargar archivos
+    with stage("load trials and segments") as st:
+        df_trials, df_segments = load_trials_and_segments(args.participant, args.feedback_mode)
+        st.rows = len(df_trials) + len(df_segments)
+
+    print(df_trials.columns)
+    print(df_segments.columns)
+
+    df_results = event_movement_types(df_trials, df_segments)
+    print(df_results.head(10))
+    # Mostrar conteo agrupado por columnas clave
+    grouped = count_event_movement_types(df_results)
+
+    # Guardar resultados
+    if out is not None:
+        grouped.to_csv(out, index=False)
+    else:
+        print(grouped.to_string(index=False))
+    #print(grouped.head(40))
+
+if __name__ == "__main__":
+    main()
@@ -13,16 +13,17 @@ Analysis is performed for three different time points:
 3. Indication up time (when user releases button/bar)
 """
 
+import argparse
+import hashlib
+import json
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from scipy import stats
-from scipy.stats import f_oneway
-import matplotlib.pyplot as plt
-from statsmodels.formula.api import ols
-from statsmodels.stats.anova import anova_lm
-from statsmodels.stats.multicomp import pairwise_tukeyhsd
 import utils_paths as up
+from profiling import stage
 
 
 def calculate_endpoint_projected_position(row):
@@ -87,6 +88,240 @@ def calculate_endpoint_projected_position(row):
     return pd.Series(results)
 
 
+ENDPOINT_COLUMNS = {
+    'dx_indication_down': ('Indication_down_x', 'Indication_down_y'),
+    'dx_indication_up': ('Indication_up_x', 'Indication_up_y'),
+    'dx_reaching': ('Reaching_pos_x', 'Reaching_pos_y'),
+}
+
+
+def calculate_endpoint_projections(df):
+    """
+    Column-wise calculate_endpoint_projected_position: projects the endpoints of
+    all trials onto their movement vectors at once.
+
+    dx is NaN for zero-length movements and for endpoints with a missing
+    coordinate, as in the per-row version.
+
+    Returns:
+    --------
+    DataFrame
+        dx_indication_down, dx_indication_up and dx_reaching, indexed like df
+    """
+    target = df[['Target_position_x', 'Target_position_y']].to_numpy(dtype=float)
+    movement = target - df[['Previous_target_position_x', 'Previous_target_position_y']].to_numpy(dtype=float)
+    # Stacked matmul gives the same per-row dot products as np.dot/np.linalg.norm in the reference
+    movement_norm = np.sqrt((movement[:, None, :] @ movement[:, :, None])[:, 0, 0])
+    # NaN norm for zero-length movements so every dx of those rows is NaN
+    movement_norm = np.where(movement_norm == 0, np.nan, movement_norm)
+
+    results = {}
+    for dx_col, (x_col, y_col) in ENDPOINT_COLUMNS.items():
+        endpoint = df[[x_col, y_col]].to_numpy(dtype=float) - target
+        # NaN coordinates propagate through the dot product
+        results[dx_col] = (movement[:, None, :] @ endpoint[:, :, None])[:, 0, 0] / movement_norm
+    return pd.DataFrame(results, index=df.index)
+
+
+# Experimental conditions the ISO 9241-9 metrics are aggregated over
+CONDITION_VARS = ['W', 'A', 'buffer', 'indication', 'feedbackMode']
+# Output of calculate_fitts_law_metrics, the input of the plots
+CONDITIONS_SUMMARY_FILE = Path(up.PROCESSED_CSV_DATA) / "fitts_conditions_summary.csv"
+
+# time_type -> (MT column, dx column)
+TIME_TYPES = {
+    'reaching': ('MT_reaching', 'dx_reaching'),
+    'indication_down': ('MT_indication_down', 'dx_indication_down'),
+    'indication_up': ('MT_indication_up', 'dx_indication_up'),
+}
+
+
+def aggregate_condition_metrics(df, grouping_vars=CONDITION_VARS):
+    """
+    Aggregate MT and dx per group for every time type in a single groupby.
+
+    grouping_vars must include 'A'. We, Ae, IDe and TP are then derived as
+    column expressions on the aggregated table:
+    - We = 4.133 * SD(dx)
+    - Ae = A + mean(dx)
+    - IDe = log2(1 + Ae/We)
+    - TP = IDe / MT_mean
+
+    Parameters:
+    -----------
+    df : DataFrame
+        Trials with the MT_* and dx_* columns of TIME_TYPES
+    grouping_vars : list
+        Columns defining a condition (e.g. CONDITION_VARS, or with 'participantId' added)
+
+    Returns:
+    --------
+    DataFrame
+        One row per (time_type, group), in the long format of fitts_conditions_summary.csv
+    """
+    named_aggs = {'n_trials': (grouping_vars[0], 'size')}
+    for time_type, (mt_col, dx_col) in TIME_TYPES.items():
+        named_aggs[f'{time_type}:MT_mean'] = (mt_col, 'mean')
+        named_aggs[f'{time_type}:MT_std'] = (mt_col, 'std')
+        named_aggs[f'{time_type}:dx_mean'] = (dx_col, 'mean')
+        named_aggs[f'{time_type}:dx_std'] = (dx_col, 'std')
+    grouped = df.groupby(grouping_vars).agg(**named_aggs).reset_index()
+    # float like the other metrics, as written to fitts_conditions_summary.csv so far
+    grouped['n_trials'] = grouped['n_trials'].astype(float)
+
+    metrics = ['MT_mean', 'MT_std', 'dx_mean', 'dx_std']
+    long = []
+    for time_type in TIME_TYPES:
+        block = grouped[grouping_vars + ['n_trials']].copy()
+        for metric in metrics:
+            block[metric] = grouped[f'{time_type}:{metric}']
+        block['time_type'] = time_type
+        long.append(block)
+    df_conditions = pd.concat(long, ignore_index=True)
+
+    df_conditions['We'] = 4.133 * df_conditions['dx_std']
+    df_conditions['Ae'] = df_conditions['A'] + df_conditions['dx_mean']
+    df_conditions['IDe'] = np.log2(1 + df_conditions['Ae'] / df_conditions['We'])
+    df_conditions['TP'] = df_conditions['IDe'] / df_conditions['MT_mean']
+
+    columns = grouping_vars + ['n_trials'] + metrics + ['We', 'Ae', 'IDe', 'TP', 'time_type']
+    return df_conditions[columns]
+
+
+# Resampled trials held in memory at once per group (replicates x trials)
+BOOTSTRAP_BLOCK_SIZE = 2_000_000
+BOOTSTRAP_METRICS = ['TP', 'We', 'IDe']
+
+
+def _nan_mean_std(x):
+    """Row-wise mean and SD (ddof=1) of a 2-D array, skipping NaN like Series.mean/std."""
+    valid = ~np.isnan(x)
+    count = valid.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.where(valid, x, 0.0).sum(axis=1) / count
+        sq = np.where(valid, (x - mean[:, None]) ** 2, 0.0).sum(axis=1)
+        std = np.sqrt(sq / (count - 1))
+    return mean, np.where(count > 1, std, np.nan)
+
+
+def _bootstrap_group(task):
+    """
+    Percentile CIs of TP, We and IDe for one group.
+
+    task = (A, mt, dx, seed, n_boot, ci) with mt/dx of shape (time types, trials).
+    Each replicate resamples the trials once (as a row of a 2-D index array) and
+    uses the same trials for every time type.
+
+    Returns an array of shape (metrics, 2, time types): low and high bound.
+    """
+    A, mt, dx, seed, n_boot, ci = task
+    rng = np.random.default_rng(seed)
+    n = mt.shape[1]
+    reps = {metric: np.empty((mt.shape[0], n_boot)) for metric in BOOTSTRAP_METRICS}
+
+    block = max(1, BOOTSTRAP_BLOCK_SIZE // n)
+    for b0 in range(0, n_boot, block):
+        idx = rng.integers(0, n, size=(min(block, n_boot - b0), n))
+        for k in range(mt.shape[0]):
+            mt_mean, _ = _nan_mean_std(mt[k][idx])
+            dx_mean, dx_std = _nan_mean_std(dx[k][idx])
+            We = 4.133 * dx_std
+            with np.errstate(invalid='ignore', divide='ignore'):
+                IDe = np.log2(1 + (A + dx_mean) / We)
+            reps['We'][k, b0:b0 + len(idx)] = We
+            reps['IDe'][k, b0:b0 + len(idx)] = IDe
+            reps['TP'][k, b0:b0 + len(idx)] = IDe / mt_mean
+
+    q = [50 * (1 - ci), 50 * (1 + ci)]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # all-NaN replicates (e.g. a single trial)
+        return np.stack([np.nanpercentile(reps[metric], q, axis=1) for metric in BOOTSTRAP_METRICS])
+
+
+def bootstrap_condition_metrics(df, grouping_vars=CONDITION_VARS, n_boot=10000, ci=0.95,
+                                seed=0, workers=1, chunksize=8):
+    """
+    Bootstrap confidence intervals of TP, We and IDe per group and time type.
+
+    The trials of each group are resampled n_boot times with replacement and the
+    metrics recomputed as in aggregate_condition_metrics. Every group draws from
+    its own child of SeedSequence(seed), so the result does not depend on
+    `workers`. With workers > 1 the groups are spread over a ProcessPoolExecutor.
+
+    Returns:
+    --------
+    DataFrame
+        grouping_vars, time_type and <metric>_ci_low / <metric>_ci_high columns,
+        one row per (time_type, group) like aggregate_condition_metrics
+    """
+    groups = df.groupby(grouping_vars).indices
+    keys = list(groups)
+    mt = df[[mt_col for mt_col, _ in TIME_TYPES.values()]].to_numpy(dtype=float).T
+    dx = df[[dx_col for _, dx_col in TIME_TYPES.values()]].to_numpy(dtype=float).T
+    a_pos = grouping_vars.index('A')
+    seeds = np.random.SeedSequence(seed).spawn(len(keys))
+    tasks = ((key[a_pos], mt[:, groups[key]], dx[:, groups[key]], seeds[i], n_boot, ci)
+             for i, key in enumerate(keys))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            bounds = list(executor.map(_bootstrap_group, tasks, chunksize=chunksize))
+    else:
+        bounds = [_bootstrap_group(task) for task in tasks]
+
+    # (groups, metrics, low/high, time types) -> one block of rows per time type
+    bounds = np.array(bounds).reshape(len(keys), len(BOOTSTRAP_METRICS), 2, len(TIME_TYPES))
+    key_frame = pd.DataFrame(keys, columns=grouping_vars)
+    blocks = []
+    for k, time_type in enumerate(TIME_TYPES):
+        block = key_frame.copy()
+        block['time_type'] = time_type
+        for m, metric in enumerate(BOOTSTRAP_METRICS):
+            block[f'{metric}_ci_low'] = bounds[:, m, 0, k]
+            block[f'{metric}_ci_high'] = bounds[:, m, 1, k]
+        blocks.append(block)
+    return pd.concat(blocks, ignore_index=True)
+
+
+def summarize_participant_throughput(df_participants, n_boot=10000, ci=0.95, seed=0):
+    """
+    ISO 9241-9 "mean of means" throughput: the mean over participants of the
+    per-participant TP of each condition and time type.
+
+    With n_boot > 0 the CI of the mean resamples participants, all replicates
+    of a condition at once.
+
+    Parameters:
+    -----------
+    df_participants : DataFrame
+        Output of aggregate_condition_metrics grouped by CONDITION_VARS + ['participantId']
+
+    Returns:
+    --------
+    DataFrame
+        CONDITION_VARS, time_type, n_participants, TP_mean_of_means, TP_sd
+        (and TP_ci_low / TP_ci_high)
+    """
+    keys = CONDITION_VARS + ['time_type']
+    summary = df_participants.groupby(keys, sort=False)['TP'].agg(
+        n_participants='count', TP_mean_of_means='mean', TP_sd='std').reset_index()
+    if n_boot <= 0:
+        return summary
+
+    rng = np.random.default_rng(seed)
+    q = [50 * (1 - ci), 50 * (1 + ci)]
+    bounds = []
+    for _, tp in df_participants.groupby(keys, sort=False)['TP']:
+        tp = tp.dropna().to_numpy()
+        if len(tp) == 0:
+            bounds.append((np.nan, np.nan))
+            continue
+        means = tp[rng.integers(0, len(tp), size=(n_boot, len(tp)))].mean(axis=1)
+        bounds.append(tuple(np.percentile(means, q)))
+    summary[['TP_ci_low', 'TP_ci_high']] = np.array(bounds).reshape(-1, 2)
+    return summary
+
+
 def filter_outliers_by_indication_up_time(df, n_std=3, verbose=True):
     """
     Filter out trials with indication_up time exceeding mean + n standard deviations.
@@ -139,28 +374,10 @@ def filter_outliers_by_indication_up_time(df, n_std=3, verbose=True):
     return df_filtered
 
 
-def calculate_fitts_law_metrics(save_results=True, verbose=True):
+def load_success_trials(verbose=True):
     """
-    Calculate Fitts law metrics aggregated by condition.
-    
-    According to ISO 9241-9, metrics are calculated per condition (not per trial):
-    - We = 4.133 * SD(dx) where dx are endpoint deviations
-    - Ae = A + mean(dx) where A is nominal amplitude
-    - MT = mean(MT) across all trials in condition
-    - IDe = log2(1 + Ae/We)
-    - TP = IDe / MT
-    
-    Parameters:
-    -----------
-    save_results : bool
-        If True, save results to CSV files
-    verbose : bool
-        If True, print detailed analysis summary
-        
-    Returns:
-    --------
-    DataFrame
-        Condition-level summary with Fitts law metrics
+    Successful trials of TRIALS_FILE_CSV without indication_up outliers, with the
+    MT_* columns (s) and the dx_* endpoint deviations (px) of every time type.
     """
     
     # Load trials data
@@ -193,16 +410,55 @@ def calculate_fitts_law_metrics(save_results=True, verbose=True):
         print("CALCULATING ENDPOINT DEVIATIONS (dx)")
         print("="*80)
     
-    df_success[['dx_indication_down', 'dx_indication_up', 'dx_reaching']] = df_success.apply(
-        calculate_endpoint_projected_position, axis=1
-    )
+    df_success[['dx_indication_down', 'dx_indication_up', 'dx_reaching']] = calculate_endpoint_projections(df_success)
 
     print("\nSample of calculated dx values:")
     print(df_success[['dx_indication_down', 'dx_indication_up', 'dx_reaching']].head())
 
-    # Group by experimental conditions
-    grouping_vars = [ 'W', 'A', 'buffer', 'indication', 'feedbackMode']
+    return df_success
+
+
+def calculate_fitts_law_metrics(save_results=True, verbose=True, per_participant=False,
+                                n_boot=0, ci=0.95, seed=0, workers=1, df_success=None):
+    """
+    Calculate Fitts law metrics aggregated by condition.
     
+    According to ISO 9241-9, metrics are calculated per condition (not per trial):
+    - We = 4.133 * SD(dx) where dx are endpoint deviations
+    - Ae = A + mean(dx) where A is nominal amplitude
+    - MT = mean(MT) across all trials in condition
+    - IDe = log2(1 + Ae/We)
+    - TP = IDe / MT
+    
+    Parameters:
+    -----------
+    save_results : bool
+        If True, save results to CSV files
+    verbose : bool
+        If True, print detailed analysis summary
+    per_participant : bool
+        If True, also compute the metrics per participant x condition and the
+        "mean of means" throughput (see summarize_participant_throughput)
+    n_boot : int
+        Bootstrap replicates for the CIs of TP, We and IDe (0: no CIs)
+    ci : float
+        Confidence level of the bootstrap intervals
+    seed : int
+        Seed of the bootstrap resampling
+    workers : int
+        Processes the bootstrap groups are spread over
+    df_success : DataFrame, optional
+        Output of load_success_trials, loaded here if not given
+        
+    Returns:
+    --------
+    DataFrame
+        Condition-level summary with Fitts law metrics
+    """
+    
+    if df_success is None:
+        df_success = load_success_trials(verbose=verbose)
+
     if verbose:
         print("\n" + "="*80)
         print("AGGREGATING METRICS BY CONDITION")
@@ -212,60 +468,49 @@ def calculate_fitts_law_metrics(save_results=True, verbose=True):
     # AGGREGATE BY CONDITION (ISO 9241-9)
     # ====================
     
-    condition_metrics = []
-    
-    for time_type, time_col in [('reaching', 'MT_reaching'), 
-                                 ('indication_down', 'MT_indication_down'), 
-                                 ('indication_up', 'MT_indication_up')]:
-        
-        dx_col = f'dx_{time_type}'
-        
-        # Group and calculate aggregated metrics
-        # Use apply with a function that has access to the whole group
-        def aggregate_condition(group):
-            # Extract A value (same for all trials in group)
-            A_val = group['A'].iloc[0]
-            
-            return pd.Series({
-                # Count trials
-                'n_trials': len(group),
-                
-                # Movement Time (mean across trials)
-                'MT_mean': group[time_col].mean(),
-                'MT_std': group[time_col].std(),
-                
-                # Endpoint deviations
-                'dx_mean': group[dx_col].mean(),
-                'dx_std': group[dx_col].std(),
-                
-                # Effective Width: We = 4.133 * SD(dx)
-                'We': 4.133 * group[dx_col].std(),
-                
-                # Effective Amplitude: Ae = A + mean(dx)
-                'Ae': A_val + group[dx_col].mean(),
-            })
-        
-        grouped = df_success.groupby(grouping_vars, group_keys=False).apply(aggregate_condition).reset_index()
-        
-        # Calculate IDe and Throughput
-        grouped['IDe'] = np.log2(1 + grouped['Ae'] / grouped['We'])
-        grouped['TP'] = grouped['IDe'] / grouped['MT_mean']
-        
-        # Add time type identifier
-        grouped['time_type'] = time_type
-        
-        condition_metrics.append(grouped)
-    
-    # Combine all time types
-    df_conditions = pd.concat(condition_metrics, ignore_index=True)
+    df_conditions = aggregate_condition_metrics(df_success, CONDITION_VARS)
+    if n_boot > 0:
+        df_ci = bootstrap_condition_metrics(df_success, CONDITION_VARS, n_boot=n_boot, ci=ci, seed=seed, workers=workers)
+        df_conditions = df_conditions.merge(df_ci, on=CONDITION_VARS + ['time_type'], how='left')
     
     # Save results
     if save_results:
-        output_file = Path(up.PROCESSED_DATA) / "csv" / "fitts_conditions_summary.csv"
+        output_file = CONDITIONS_SUMMARY_FILE
         output_file.parent.mkdir(parents=True, exist_ok=True)
         df_conditions.to_csv(output_file, index=False)
         if verbose:
             print(f"\nCondition-level metrics saved to: {output_file}")
+
+    # ====================
+    # PER-PARTICIPANT THROUGHPUT (mean of means)
+    # ====================
+
+    if per_participant:
+        participant_vars = CONDITION_VARS + ['participantId']
+        df_participants = aggregate_condition_metrics(df_success, participant_vars)
+        if n_boot > 0:
+            df_ci = bootstrap_condition_metrics(df_success, participant_vars, n_boot=n_boot, ci=ci, seed=seed, workers=workers)
+            df_participants = df_participants.merge(df_ci, on=participant_vars + ['time_type'], how='left')
+        df_throughput = summarize_participant_throughput(df_participants, n_boot=n_boot, ci=ci, seed=seed)
+
+        if save_results:
+            participants_file = Path(up.PROCESSED_DATA) / "csv" / "fitts_participant_conditions_summary.csv"
+            throughput_file = Path(up.PROCESSED_DATA) / "csv" / "fitts_throughput_mean_of_means.csv"
+            df_participants.to_csv(participants_file, index=False)
+            df_throughput.to_csv(throughput_file, index=False)
+            if verbose:
+                print(f"Participant x condition metrics saved to: {participants_file}")
+                print(f"Mean-of-means throughput saved to: {throughput_file}")
+
+        if verbose:
+            print("\n" + "="*80)
+            print("THROUGHPUT: MEAN OF PARTICIPANT MEANS")
+            print("="*80)
+            for time_type in TIME_TYPES:
+                subset = df_throughput[df_throughput['time_type'] == time_type]
+                print(f"\n{time_type.upper().replace('_', ' ')}: "
+                      f"TP {subset['TP_mean_of_means'].mean():.2f} bits/s over {len(subset)} conditions, "
+                      f"{subset['n_participants'].max()} participants max")
     
     # ====================
     # PRINT SUMMARY
@@ -295,7 +540,85 @@ def calculate_fitts_law_metrics(save_results=True, verbose=True):
     
 
 
-def perform_statistical_analysis(df_success, save_results=True, verbose=True):
+# OLS model of perform_statistical_analysis, with main effects and interactions up to 3-way:
+# feedbackMode*buffer_cat*indication (all interactions among these 3)
+# plus ID_cat and its interactions with the other factors
+ANOVA_FORMULA = ('{mt_col} ~ C(feedbackMode) + C(buffer_cat) + C(indication) + C(ID_cat) + '
+                 'C(feedbackMode):C(buffer_cat) + C(feedbackMode):C(indication) + C(buffer_cat):C(indication) + '
+                 'C(feedbackMode):C(ID_cat) + C(buffer_cat):C(ID_cat) + C(indication):C(ID_cat) + '
+                 'C(feedbackMode):C(buffer_cat):C(indication) + '
+                 'C(feedbackMode):C(buffer_cat):C(ID_cat) + C(feedbackMode):C(indication):C(ID_cat) + C(buffer_cat):C(indication):C(ID_cat)')
+
+# Tukey HSD post-hoc -> factors whose combinations are the groups, in run order
+POSTHOC_FACTORS = {
+    'feedback': ['feedbackMode'],
+    'buffer': ['buffer_cat'],
+    'indication': ['indication'],
+    'id': ['ID_cat'],
+    'feedback_buffer': ['feedbackMode', 'buffer_cat'],
+    'feedback_indication': ['feedbackMode', 'indication'],
+    'buffer_indication': ['buffer_cat', 'indication'],
+    'feedback_buffer_indication': ['feedbackMode', 'buffer_cat', 'indication'],
+}
+# post-hoc -> (section title, name in error messages)
+POSTHOC_LABELS = {
+    'feedback': ('Feedback Mode (Main Effect)', 'feedback'),
+    'buffer': ('Buffer (Main Effect)', 'buffer'),
+    'indication': ('Indication Mode (Main Effect)', 'indication'),
+    'id': ('Index of Difficulty (Main Effect)', 'ID'),
+    'feedback_buffer': ('Feedback × Buffer Interaction (Simple Effects)', 'feedback × buffer'),
+    'feedback_indication': ('Feedback × Indication Interaction (Simple Effects)', 'feedback × indication'),
+    'buffer_indication': ('Buffer × Indication Interaction (Simple Effects)', 'buffer × indication'),
+    'feedback_buffer_indication': ('Feedback × Buffer × Indication (3-way, Simple Effects)', '3-way interaction'),
+}
+# Too many comparisons to print in full: only the significant ones are shown
+POSTHOC_SIGNIFICANT_ONLY = {'id', 'feedback_buffer_indication'}
+
+STAT_TESTS = ['anova'] + list(POSTHOC_FACTORS)
+
+# Bump when a test changes in a way its formula/factors don't capture
+STATS_CACHE_VERSION = 1
+STATS_CACHE_MAX_MB = 256
+
+
+def _stats_cache_key(df_clean, mt_col, test):
+    """Hash of the data a test runs on, its MT column and its formula or factors."""
+    h = hashlib.sha256()
+    spec = ANOVA_FORMULA.format(mt_col=mt_col) if test == 'anova' else POSTHOC_FACTORS[test]
+    h.update(json.dumps({'version': STATS_CACHE_VERSION, 'mt_col': mt_col, 'test': test, 'spec': spec}).encode())
+    h.update(pd.util.hash_pandas_object(df_clean, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _run_stat_test(task):
+    """
+    Run one test of perform_statistical_analysis: task = (mt_col, test, df_clean).
+    Returns (result, None), or (None, error message) if it failed. The result of
+    'anova' is (anova table, fitted model), of a post-hoc its Tukey HSD result.
+    """
+    from statsmodels.formula.api import ols
+    from statsmodels.stats.anova import anova_lm
+    from statsmodels.stats.multicomp import pairwise_tukeyhsd
+
+    mt_col, test, df_clean = task
+    try:
+        if test == 'anova':
+            model = ols(ANOVA_FORMULA.format(mt_col=mt_col), data=df_clean).fit()
+            return (anova_lm(model, typ=2), model), None
+        factors = POSTHOC_FACTORS[test]
+        if len(factors) == 1:
+            groups = df_clean[factors[0]]
+        else:
+            groups = df_clean[factors[0]].astype(str)
+            for factor in factors[1:]:
+                groups = groups + '_' + df_clean[factor].astype(str)
+        return pairwise_tukeyhsd(endog=df_clean[mt_col], groups=groups, alpha=0.05), None
+    except Exception as e:
+        return None, str(e)
+
+
+def perform_statistical_analysis(df_success, save_results=True, verbose=True,
+                                 only=None, workers=1, use_cache=True, cache_max_mb=STATS_CACHE_MAX_MB):
     """
     Perform ANOVA and post-hoc tests to identify significant differences between conditions.
     
@@ -307,6 +630,14 @@ def perform_statistical_analysis(df_success, save_results=True, verbose=True):
         If True, save statistical results to files
     verbose : bool
         If True, print detailed statistical results
+    only : list, optional
+        Tests to run, from STAT_TESTS (default: all)
+    workers : int
+        Run the (MT column, test) pairs on N processes
+    use_cache : bool
+        Reuse results stored in STATS_CACHE_DIR for the same data and formula/factors
+    cache_max_mb : float
+        Size cap of STATS_CACHE_DIR, least recently used results are evicted
         
     Returns:
     --------
@@ -314,6 +645,7 @@ def perform_statistical_analysis(df_success, save_results=True, verbose=True):
         Dictionary with ANOVA and post-hoc results for each time type
     """
     
+    only = [test for test in STAT_TESTS if only is None or test in only]
     results = {}
     
     if verbose:
@@ -334,7 +666,46 @@ def perform_statistical_analysis(df_success, save_results=True, verbose=True):
         ('MT_indication_down', 'Indication Down'),
         ('MT_indication_up', 'Indication Up')
     ]
-    
+
+    # Remove NaN values
+    clean = {mt_col: df_analysis[[mt_col, 'feedbackMode', 'buffer_cat', 'indication', 'ID_cat']].dropna()
+             for mt_col, _ in time_types}
+
+    # ========== RUN TESTS (cached, optionally in parallel) ==========
+    from submovement_cache import ResultCache
+
+    cache = ResultCache(up.STATS_CACHE_DIR, max_mb=cache_max_mb) if use_cache else None
+    outcomes = {}
+    pending = []
+    for mt_col, _ in time_types:
+        for test in only:
+            key = _stats_cache_key(clean[mt_col], mt_col, test)
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                outcomes[(mt_col, test)] = (cached, None)
+            else:
+                pending.append((key, (mt_col, test, clean[mt_col])))
+
+    tasks = [task for _, task in pending]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            computed = list(executor.map(_run_stat_test, tasks))
+    else:
+        computed = [_run_stat_test(task) for task in tasks]
+
+    for (key, (mt_col, test, _)), (result, error) in zip(pending, computed):
+        outcomes[(mt_col, test)] = (result, error)
+        if cache is not None and error is None:
+            cache.put(key, result)
+    if cache is not None:
+        cache.trim()
+
+    if verbose:
+        n_cached = len(outcomes) - len(pending)
+        print(f"\n{len(outcomes)} tests: {n_cached} from cache, {len(pending)} computed "
+              f"({'serial' if workers <= 1 else f'{workers} workers'})"
+              + (f", {cache.evicted} old results evicted" if cache is not None and cache.evicted else ""))
+
     for mt_col, time_name in time_types:
         if verbose:
             print(f"\n{'='*80}")
@@ -342,210 +713,64 @@ def perform_statistical_analysis(df_success, save_results=True, verbose=True):
             print(f"{'='*80}")
         
         results[mt_col] = {}
-        
-        # Remove NaN values
-        df_clean = df_analysis[[mt_col, 'feedbackMode', 'buffer_cat', 'indication', 'ID_cat']].dropna()
-        
-        # ========== MULTI-FACTORIAL ANOVA ==========
-        if verbose:
-            print(f"\n--- Multi-Factorial ANOVA (with higher-order interactions) ---")
-        
-        try:
-            # Fit OLS model with main effects and interactions up to 3-way
-            # We include feedbackMode*buffer_cat*indication (all interactions among these 3)
-            # Plus ID_cat and its 2-way interactions with each of the other factors
-            formula = (f'{mt_col} ~ C(feedbackMode) + C(buffer_cat) + C(indication) + C(ID_cat) + '
-                      f'C(feedbackMode):C(buffer_cat) + C(feedbackMode):C(indication) + C(buffer_cat):C(indication) + '
-                      f'C(feedbackMode):C(ID_cat) + C(buffer_cat):C(ID_cat) + C(indication):C(ID_cat) + '
-                      f'C(feedbackMode):C(buffer_cat):C(indication) + '
-                      f'C(feedbackMode):C(buffer_cat):C(ID_cat) + C(feedbackMode):C(indication):C(ID_cat) + C(buffer_cat):C(indication):C(ID_cat)')
-            model = ols(formula, data=df_clean).fit()
-            anova_table = anova_lm(model, typ=2)
-            
-            results[mt_col]['anova'] = anova_table
-            results[mt_col]['model'] = model
-            
-            if verbose:
-                print(anova_table.to_string())
-                print(f"\nModel R²: {model.rsquared:.4f}")
-                print(f"Adjusted R²: {model.rsquared_adj:.4f}")
-                
-                # Identify significant interactions
-                sig_interactions = []
-                for idx in anova_table.index:
-                    if ':' in str(idx) and anova_table.loc[idx, 'PR(>F)'] < 0.05:
-                        sig_interactions.append(str(idx))
+        df_clean = clean[mt_col]
+
+        for test in only:
+            result, error = outcomes[(mt_col, test)]
+            if test == 'anova':
+                # ========== MULTI-FACTORIAL ANOVA ==========
+                if verbose:
+                    print(f"\n--- Multi-Factorial ANOVA (with higher-order interactions) ---")
+                if error is not None:
+                    if verbose:
+                        print(f"Error in ANOVA: {error}")
+                    results[mt_col]['anova'] = None
+                    results[mt_col]['model'] = None
+                    continue
+
+                anova_table, model = result
+                results[mt_col]['anova'] = anova_table
+                results[mt_col]['model'] = model
                 
-                if sig_interactions:
-                    print(f"\nSignificant interactions (p < 0.05): {', '.join(sig_interactions)}")
-            
-        except Exception as e:
-            if verbose:
-                print(f"Error in ANOVA: {e}")
-            results[mt_col]['anova'] = None
-            results[mt_col]['model'] = None
-        
-        # ========== POST-HOC TESTS: MAIN EFFECTS ==========
-        
-        # 1. Feedback Mode
-        if verbose:
-            print(f"\n--- Post-hoc: Feedback Mode (Main Effect) ---")
-        try:
-            tukey_feedback = pairwise_tukeyhsd(
-                endog=df_clean[mt_col],
-                groups=df_clean['feedbackMode'],
-                alpha=0.05
-            )
-            results[mt_col]['posthoc_feedback'] = tukey_feedback
-            if verbose:
-                print(tukey_feedback)
-        except Exception as e:
-            if verbose:
-                print(f"Error in post-hoc (feedback): {e}")
-            results[mt_col]['posthoc_feedback'] = None
-        
-        # 2. Buffer
-        if verbose:
-            print(f"\n--- Post-hoc: Buffer (Main Effect) ---")
-        try:
-            tukey_buffer = pairwise_tukeyhsd(
-                endog=df_clean[mt_col],
-                groups=df_clean['buffer_cat'],
-                alpha=0.05
-            )
-            results[mt_col]['posthoc_buffer'] = tukey_buffer
-            if verbose:
-                print(tukey_buffer)
-        except Exception as e:
-            if verbose:
-                print(f"Error in post-hoc (buffer): {e}")
-            results[mt_col]['posthoc_buffer'] = None
-        
-        # 3. Indication Mode
-        if verbose:
-            print(f"\n--- Post-hoc: Indication Mode (Main Effect) ---")
-        try:
-            tukey_indication = pairwise_tukeyhsd(
-                endog=df_clean[mt_col],
-                groups=df_clean['indication'],
-                alpha=0.05
-            )
-            results[mt_col]['posthoc_indication'] = tukey_indication
-            if verbose:
-                print(tukey_indication)
-        except Exception as e:
-            if verbose:
-                print(f"Error in post-hoc (indication): {e}")
-            results[mt_col]['posthoc_indication'] = None
-        
-        # 4. ID (Task Difficulty)
-        if verbose:
-            print(f"\n--- Post-hoc: Index of Difficulty (Main Effect) ---")
-        try:
-            tukey_id = pairwise_tukeyhsd(
-                endog=df_clean[mt_col],
-                groups=df_clean['ID_cat'],
-                alpha=0.05
-            )
-            results[mt_col]['posthoc_id'] = tukey_id
-            if verbose:
-                # Only show significant differences for ID (too many comparisons)
-                tukey_df = pd.DataFrame(data=tukey_id.summary().data[1:], 
-                                       columns=tukey_id.summary().data[0])
-                significant = tukey_df[tukey_df['reject'] == True]
-                if len(significant) > 0:
-                    print(f"Significant pairwise differences (out of {len(tukey_df)} comparisons):")
-                    print(significant.to_string(index=False))
-                else:
-                    print("No significant pairwise differences found.")
-        except Exception as e:
-            if verbose:
-                print(f"Error in post-hoc (ID): {e}")
-            results[mt_col]['posthoc_id'] = None
-        
-        # ========== POST-HOC TESTS: INTERACTION EFFECTS ==========
-        
-        # 5. Feedback × Buffer Interaction
-        if verbose:
-            print(f"\n--- Post-hoc: Feedback × Buffer Interaction (Simple Effects) ---")
-        try:
-            df_clean['feedback_buffer'] = df_clean['feedbackMode'].astype(str) + '_' + df_clean['buffer_cat'].astype(str)
-            tukey_fb = pairwise_tukeyhsd(
-                endog=df_clean[mt_col],
-                groups=df_clean['feedback_buffer'],
-                alpha=0.05
-            )
-            results[mt_col]['posthoc_feedback_buffer'] = tukey_fb
-            if verbose:
-                print(tukey_fb)
-        except Exception as e:
-            if verbose:
-                print(f"Error in post-hoc (feedback × buffer): {e}")
-            results[mt_col]['posthoc_feedback_buffer'] = None
-        
-        # 6. Feedback × Indication Interaction
-        if verbose:
-            print(f"\n--- Post-hoc: Feedback × Indication Interaction (Simple Effects) ---")
-        try:
-            df_clean['feedback_indication'] = df_clean['feedbackMode'].astype(str) + '_' + df_clean['indication'].astype(str)
-            tukey_fi = pairwise_tukeyhsd(
-                endog=df_clean[mt_col],
-                groups=df_clean['feedback_indication'],
-                alpha=0.05
-            )
-            results[mt_col]['posthoc_feedback_indication'] = tukey_fi
-            if verbose:
-                print(tukey_fi)
-        except Exception as e:
-            if verbose:
-                print(f"Error in post-hoc (feedback × indication): {e}")
-            results[mt_col]['posthoc_feedback_indication'] = None
-        
-        # 7. Buffer × Indication Interaction
-        if verbose:
-            print(f"\n--- Post-hoc: Buffer × Indication Interaction (Simple Effects) ---")
-        try:
-            df_clean['buffer_indication'] = df_clean['buffer_cat'].astype(str) + '_' + df_clean['indication'].astype(str)
-            tukey_bi = pairwise_tukeyhsd(
-                endog=df_clean[mt_col],
-                groups=df_clean['buffer_indication'],
-                alpha=0.05
-            )
-            results[mt_col]['posthoc_buffer_indication'] = tukey_bi
-            if verbose:
-                print(tukey_bi)
-        except Exception as e:
+                if verbose:
+                    print(anova_table.to_string())
+                    print(f"\nModel R²: {model.rsquared:.4f}")
+                    print(f"Adjusted R²: {model.rsquared_adj:.4f}")
+                    
+                    # Identify significant interactions
+                    sig_interactions = []
+                    for idx in anova_table.index:
+                        if ':' in str(idx) and anova_table.loc[idx, 'PR(>F)'] < 0.05:
+                            sig_interactions.append(str(idx))
+                    
+                    if sig_interactions:
+                        print(f"\nSignificant interactions (p < 0.05): {', '.join(sig_interactions)}")
+                continue
+
+            # ========== POST-HOC TESTS (Tukey HSD) ==========
+            title, error_label = POSTHOC_LABELS[test]
             if verbose:
-                print(f"Error in post-hoc (buffer × indication): {e}")
-            results[mt_col]['posthoc_buffer_indication'] = None
-        
-        # 8. Feedback × Buffer × Indication (3-way interaction)
-        if verbose:
-            print(f"\n--- Post-hoc: Feedback × Buffer × Indication (3-way, Simple Effects) ---")
-        try:
-            df_clean['fbi'] = (df_clean['feedbackMode'].astype(str) + '_' + 
-                               df_clean['buffer_cat'].astype(str) + '_' + 
-                               df_clean['indication'].astype(str))
-            tukey_fbi = pairwise_tukeyhsd(
-                endog=df_clean[mt_col],
-                groups=df_clean['fbi'],
-                alpha=0.05
-            )
-            results[mt_col]['posthoc_feedback_buffer_indication'] = tukey_fbi
+                print(f"\n--- Post-hoc: {title} ---")
+            if error is not None:
+                if verbose:
+                    print(f"Error in post-hoc ({error_label}): {error}")
+                results[mt_col][f'posthoc_{test}'] = None
+                continue
+
+            results[mt_col][f'posthoc_{test}'] = result
             if verbose:
-                # Show only significant comparisons
-                tukey_df = pd.DataFrame(data=tukey_fbi.summary().data[1:], 
-                                       columns=tukey_fbi.summary().data[0])
-                significant = tukey_df[tukey_df['reject'] == True]
-                if len(significant) > 0:
-                    print(f"Significant pairwise differences (out of {len(tukey_df)} comparisons):")
-                    print(significant.to_string(index=False))
+                if test in POSTHOC_SIGNIFICANT_ONLY:
+                    # Only show significant differences (too many comparisons)
+                    tukey_df = pd.DataFrame(data=result.summary().data[1:], 
+                                           columns=result.summary().data[0])
+                    significant = tukey_df[tukey_df['reject'] == True]
+                    if len(significant) > 0:
+                        print(f"Significant pairwise differences (out of {len(tukey_df)} comparisons):")
+                        print(significant.to_string(index=False))
+                    else:
+                        print("No significant pairwise differences found.")
                 else:
-                    print("No significant pairwise differences found.")
-        except Exception as e:
-            if verbose:
-                print(f"Error in post-hoc (3-way interaction): {e}")
-            results[mt_col]['posthoc_feedback_buffer_indication'] = None
+                    print(result)
         
         # ========== DESCRIPTIVE STATISTICS BY FACTOR ==========
         if verbose:
@@ -614,6 +839,166 @@ def perform_statistical_analysis(df_success, save_results=True, verbose=True):
     return results
 
 
+PLOT_DPI = 150
+PREVIEW_DPI = 60  # --preview: fast, low-resolution renders in fitts_plots/preview
+# Bump when the drawing code changes, so the manifest re-renders every plot
+PLOT_VERSION = 1
+PLOT_MANIFEST = "_manifest.json"
+
+CONDITION_TIME_CONFIGS = [
+    ('reaching', 'Reaching Time', 'o', '#1f77b4'),
+    ('indication_down', 'Indication Down', 's', '#ff7f0e'),
+    ('indication_up', 'Indication Up', '^', '#2ca02c')
+]
+
+PLOT_TIME_TYPES = [
+    ('reaching', 'Reaching Time'),
+    ('indication_down', 'Indication Down'),
+    ('indication_up', 'Indication Up')
+]
+
+
+def _condition_rows(df_conditions, feedback, buffer, indication):
+    mask = (
+        (df_conditions['feedbackMode'] == feedback) & 
+        (df_conditions['buffer'] == buffer) & 
+        (df_conditions['indication'] == indication)
+    )
+    return df_conditions[mask].copy()
+
+
+def _pyplot_subplots(figsize):
+    import matplotlib.pyplot as plt
+    return plt.subplots(figsize=figsize)
+
+
+def draw_condition_plot(data, feedback, buffer, indication, new_figure=_pyplot_subplots):
+    """
+    MT vs ID figure of one feedback/buffer/indication combination, one series per time type.
+    new_figure(figsize=...) returns (fig, ax), plt.subplots by default.
+    """
+    from scipy import stats
+
+    fig, ax = new_figure(figsize=(10, 7))
+    
+    for time_type, label, marker, color in CONDITION_TIME_CONFIGS:
+        subset = data[data['time_type'] == time_type].copy()
+        
+        if len(subset) == 0:
+            continue
+        
+        # Calculate nominal ID from W and A
+        # ID = log2(A/W + 1)
+        subset['ID_nominal'] = np.log2(subset['A'] / subset['W'] + 1)
+        
+        # Sort by ID for proper line plotting
+        subset = subset.sort_values('ID_nominal')
+        
+        # Plot points
+        ax.errorbar(subset['ID_nominal'], subset['MT_mean'], 
+                   yerr=subset['MT_std'] / np.sqrt(subset['n_trials']), 
+                   fmt=marker, markersize=8, capsize=5, capthick=2, 
+                   label=label, color=color, ecolor=color, alpha=0.8)
+        
+        # Fit line
+        if len(subset) > 1:
+            slope, intercept, r_value, _, _ = stats.linregress(
+                subset['ID_nominal'], subset['MT_mean']
+            )
+            x_line = np.array([subset['ID_nominal'].min(), subset['ID_nominal'].max()])
+            y_line = intercept + slope * x_line
+            ax.plot(x_line, y_line, '--', color=color, linewidth=2, 
+                   label=f'{label}: MT={intercept:.2f}+{slope:.2f}*ID (R²={r_value**2:.3f})')
+    
+    # Formatting
+    ax.set_xlabel('Index of Difficulty (ID)', fontsize=12, fontweight='bold')
+    ax.set_ylabel('Movement Time (s)', fontsize=12, fontweight='bold')
+    
+    title = f"Fitts' Law: {feedback.capitalize()} Feedback | Buffer={buffer}px | {indication.capitalize()}"
+    ax.set_title(title, fontsize=13, fontweight='bold', pad=15)
+    
+    ax.legend(loc='best', fontsize=9, framealpha=0.9)
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.set_axisbelow(True)
+    
+    fig.tight_layout()
+    return fig
+
+
+def draw_time_type_plot(time_data, conditions, time_type, title_name, new_figure=_pyplot_subplots):
+    """
+    MT vs ID figure of one time type, one series per condition of `conditions`
+    (the colors and markers follow its order). new_figure as in draw_condition_plot.
+    """
+    import matplotlib
+    from scipy import stats
+
+    # Define colors for different conditions
+    colors = matplotlib.colormaps['tab10'](np.linspace(0, 1, len(conditions)))
+    markers = ['o', 's', '^', 'D', 'v', '<', '>', 'p', '*', 'h']
+
+    fig, ax = new_figure(figsize=(12, 8))
+    
+    legend_entries = []
+    
+    # Calculate nominal ID
+    time_data = time_data.copy()
+    time_data['ID_nominal'] = np.log2(time_data['A'] / time_data['W'] + 1)
+    
+    for idx, (_, cond) in enumerate(conditions.iterrows()):
+        feedback = cond['feedbackMode']
+        buffer = cond['buffer']
+        indication = cond['indication']
+        
+        # Filter data for this condition
+        data = _condition_rows(time_data, feedback, buffer, indication)
+        
+        if len(data) == 0:
+            continue
+        
+        # Sort by ID
+        data = data.sort_values('ID_nominal')
+        
+        # Create label
+        label = f"{feedback.capitalize()}/Buf{buffer}/{indication.capitalize()}"
+        
+        # Plot with error bars
+        color = colors[idx % len(colors)]
+        marker = markers[idx % len(markers)]
+        
+        ax.errorbar(data['ID_nominal'], data['MT_mean'], 
+                   yerr=data['MT_std'] / np.sqrt(data['n_trials']), 
+                   fmt=marker, markersize=7, capsize=4, capthick=1.5, 
+                   label=label, color=color, ecolor=color, alpha=0.7, linewidth=1.5)
+        
+        # Fit line
+        if len(data) > 1:
+            slope, intercept, r_value, _, _ = stats.linregress(
+                data['ID_nominal'], data['MT_mean']
+            )
+            x_line = np.linspace(data['ID_nominal'].min(), data['ID_nominal'].max(), 100)
+            y_line = intercept + slope * x_line
+            ax.plot(x_line, y_line, '--', color=color, linewidth=1.5, alpha=0.5)
+            
+            legend_entries.append(f"{label}: MT={intercept:.2f}+{slope:.2f}*ID (R²={r_value**2:.2f})")
+    
+    # Formatting
+    ax.set_xlabel('Index of Difficulty (ID)', fontsize=13, fontweight='bold')
+    ax.set_ylabel('Movement Time (s)', fontsize=13, fontweight='bold')
+    
+    title = f"Fitts' Law - {title_name}: All Conditions"
+    ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
+    
+    # Legend with regression equations
+    ax.legend(legend_entries, loc='best', fontsize=8, framealpha=0.95, 
+             ncol=2 if len(legend_entries) > 4 else 1)
+    ax.grid(True, alpha=0.3, linestyle='--')
+    ax.set_axisbelow(True)
+    
+    fig.tight_layout()
+    return fig
+
+
 def plot_fitts_law_by_conditions(df_conditions, save_plots=True):
     """
     Create MT vs ID plots for each combination of feedback mode, buffer, and indication mode.
@@ -650,73 +1035,18 @@ def plot_fitts_law_by_conditions(df_conditions, save_plots=True):
         indication = cond['indication']
         
         # Filter data for this condition combination
-        mask = (
-            (df_conditions['feedbackMode'] == feedback) & 
-            (df_conditions['buffer'] == buffer) & 
-            (df_conditions['indication'] == indication)
-        )
-        data = df_conditions[mask].copy()
+        data = _condition_rows(df_conditions, feedback, buffer, indication)
         
         if len(data) == 0:
             continue
         
-        # Create figure
-        fig, ax = plt.subplots(figsize=(10, 7))
-        
-        # Plot each time type
-        time_configs = [
-            ('reaching', 'Reaching Time', 'o', '#1f77b4'),
-            ('indication_down', 'Indication Down', 's', '#ff7f0e'),
-            ('indication_up', 'Indication Up', '^', '#2ca02c')
-        ]
-        
-        for time_type, label, marker, color in time_configs:
-            subset = data[data['time_type'] == time_type].copy()
-            
-            if len(subset) == 0:
-                continue
-            
-            # Calculate nominal ID from W and A
-            # ID = log2(A/W + 1)
-            subset['ID_nominal'] = np.log2(subset['A'] / subset['W'] + 1)
-            
-            # Sort by ID for proper line plotting
-            subset = subset.sort_values('ID_nominal')
-            
-            # Plot points
-            ax.errorbar(subset['ID_nominal'], subset['MT_mean'], 
-                       yerr=subset['MT_std'] / np.sqrt(subset['n_trials']), 
-                       fmt=marker, markersize=8, capsize=5, capthick=2, 
-                       label=label, color=color, ecolor=color, alpha=0.8)
-            
-            # Fit line
-            if len(subset) > 1:
-                slope, intercept, r_value, _, _ = stats.linregress(
-                    subset['ID_nominal'], subset['MT_mean']
-                )
-                x_line = np.array([subset['ID_nominal'].min(), subset['ID_nominal'].max()])
-                y_line = intercept + slope * x_line
-                ax.plot(x_line, y_line, '--', color=color, linewidth=2, 
-                       label=f'{label}: MT={intercept:.2f}+{slope:.2f}*ID (R²={r_value**2:.3f})')
-        
-        # Formatting
-        ax.set_xlabel('Index of Difficulty (ID)', fontsize=12, fontweight='bold')
-        ax.set_ylabel('Movement Time (s)', fontsize=12, fontweight='bold')
-        
-        title = f"Fitts' Law: {feedback.capitalize()} Feedback | Buffer={buffer}px | {indication.capitalize()}"
-        ax.set_title(title, fontsize=13, fontweight='bold', pad=15)
-        
-        ax.legend(loc='best', fontsize=9, framealpha=0.9)
-        ax.grid(True, alpha=0.3, linestyle='--')
-        ax.set_axisbelow(True)
-        
-        plt.tight_layout()
+        fig = draw_condition_plot(data, feedback, buffer, indication)
         
         # Save plot
         if save_plots:
             filename = f"fitts_law_{feedback}_buffer{buffer}_{indication}.png"
             filepath = plot_dir / filename
-            plt.savefig(filepath, dpi=150, bbox_inches='tight')
+            fig.savefig(filepath, dpi=PLOT_DPI, bbox_inches='tight')
             print(f"Saved: {filename}")
         
         figures.append(fig)
@@ -752,96 +1082,22 @@ def plot_fitts_law_by_time_type(df_conditions, save_plots=True):
     # Get all unique condition combinations
     conditions = df_conditions[['feedbackMode', 'buffer', 'indication']].drop_duplicates()
     
-    # Define colors for different conditions
-    colors = plt.cm.tab10(np.linspace(0, 1, len(conditions)))
-    markers = ['o', 's', '^', 'D', 'v', '<', '>', 'p', '*', 'h']
-    
     figures = []
     
     print("\n" + "="*80)
     print("CREATING FITTS LAW PLOTS BY TIME TYPE (All Conditions)")
     print("="*80)
     
-    # Define the three time types to plot
-    time_types = [
-        ('reaching', 'Reaching Time'),
-        ('indication_down', 'Indication Down'),
-        ('indication_up', 'Indication Up')
-    ]
-    
-    for time_type, title_name in time_types:
-        fig, ax = plt.subplots(figsize=(12, 8))
-        
-        legend_entries = []
-        
+    for time_type, title_name in PLOT_TIME_TYPES:
         # Filter data for this time type
-        time_data = df_conditions[df_conditions['time_type'] == time_type].copy()
-        
-        # Calculate nominal ID
-        time_data['ID_nominal'] = np.log2(time_data['A'] / time_data['W'] + 1)
-        
-        for idx, (_, cond) in enumerate(conditions.iterrows()):
-            feedback = cond['feedbackMode']
-            buffer = cond['buffer']
-            indication = cond['indication']
-            
-            # Filter data for this condition
-            mask = (
-                (time_data['feedbackMode'] == feedback) & 
-                (time_data['buffer'] == buffer) & 
-                (time_data['indication'] == indication)
-            )
-            data = time_data[mask].copy()
-            
-            if len(data) == 0:
-                continue
-            
-            # Sort by ID
-            data = data.sort_values('ID_nominal')
-            
-            # Create label
-            label = f"{feedback.capitalize()}/Buf{buffer}/{indication.capitalize()}"
-            
-            # Plot with error bars
-            color = colors[idx % len(colors)]
-            marker = markers[idx % len(markers)]
-            
-            ax.errorbar(data['ID_nominal'], data['MT_mean'], 
-                       yerr=data['MT_std'] / np.sqrt(data['n_trials']), 
-                       fmt=marker, markersize=7, capsize=4, capthick=1.5, 
-                       label=label, color=color, ecolor=color, alpha=0.7, linewidth=1.5)
-            
-            # Fit line
-            if len(data) > 1:
-                slope, intercept, r_value, _, _ = stats.linregress(
-                    data['ID_nominal'], data['MT_mean']
-                )
-                x_line = np.linspace(data['ID_nominal'].min(), data['ID_nominal'].max(), 100)
-                y_line = intercept + slope * x_line
-                ax.plot(x_line, y_line, '--', color=color, linewidth=1.5, alpha=0.5)
-                
-                legend_entries.append(f"{label}: MT={intercept:.2f}+{slope:.2f}*ID (R²={r_value**2:.2f})")
-        
-        # Formatting
-        ax.set_xlabel('Index of Difficulty (ID)', fontsize=13, fontweight='bold')
-        ax.set_ylabel('Movement Time (s)', fontsize=13, fontweight='bold')
-        
-        title = f"Fitts' Law - {title_name}: All Conditions"
-        ax.set_title(title, fontsize=14, fontweight='bold', pad=20)
-        
-        # Legend with regression equations
-        ax.legend(legend_entries, loc='best', fontsize=8, framealpha=0.95, 
-                 ncol=2 if len(legend_entries) > 4 else 1)
-        ax.grid(True, alpha=0.3, linestyle='--')
-        ax.set_axisbelow(True)
-        
-        plt.tight_layout()
+        time_data = df_conditions[df_conditions['time_type'] == time_type]
+        fig = draw_time_type_plot(time_data, conditions, time_type, title_name)
         
         # Save plot
         if save_plots:
             filename = f"fitts_law_all_conditions_{time_type}.png"
             filepath = plot_dir / filename
-            plt.savefig(filepath, dpi=150, bbox_inches='tight')
+            fig.savefig(filepath, dpi=PLOT_DPI, bbox_inches='tight')
             print(f"Saved: {filename}")
         
         figures.append(fig)
@@ -853,19 +1109,198 @@ def plot_fitts_law_by_time_type(df_conditions, save_plots=True):
     return figures
 
 
-if __name__ == "__main__":
+def _agg_subplots(figsize):
+    """A figure drawn by the Agg canvas, outside pyplot: never shown, freed with its last reference."""
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=figsize)
+    FigureCanvasAgg(fig)
+    return fig, fig.subplots()
+
+
+def _plot_jobs(df_conditions):
+    """
+    (filename, draw function, draw args, input rows) of every plot of
+    plot_fitts_law_by_conditions and plot_fitts_law_by_time_type.
+    """
+    conditions = df_conditions[['feedbackMode', 'buffer', 'indication']].drop_duplicates()
+    jobs = []
+    for _, cond in conditions.iterrows():
+        feedback, buffer, indication = cond['feedbackMode'], cond['buffer'], cond['indication']
+        data = _condition_rows(df_conditions, feedback, buffer, indication)
+        if len(data) == 0:
+            continue
+        jobs.append((f"fitts_law_{feedback}_buffer{buffer}_{indication}.png", draw_condition_plot,
+                     (data, feedback, buffer, indication), data))
+    for time_type, title_name in PLOT_TIME_TYPES:
+        time_data = df_conditions[df_conditions['time_type'] == time_type]
+        # Colors follow the order of all the conditions, so they are part of the input
+        jobs.append((f"fitts_law_all_conditions_{time_type}.png", draw_time_type_plot,
+                     (time_data, conditions, time_type, title_name), (time_data, conditions)))
+    return jobs
+
+
+def _plot_hash(filename, rows, dpi):
+    h = hashlib.sha256()
+    h.update(json.dumps({'version': PLOT_VERSION, 'file': filename, 'dpi': dpi}).encode())
+    for frame in rows if isinstance(rows, tuple) else (rows,):
+        h.update(json.dumps(list(map(str, frame.columns))).encode())
+        h.update(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _render_plot(job):
+    """Worker: draw one plot on an Agg figure, save it and let the figure go."""
+    filepath, draw, args, dpi = job
+    fig = draw(*args, new_figure=_agg_subplots)
+    fig.savefig(filepath, dpi=dpi, bbox_inches='tight')
+    return filepath.name
+
+
+def render_fitts_plots(df_conditions, workers=1, preview=False, force=False):
+    """
+    Headless rendering of the plots of plot_fitts_law_by_conditions and
+    plot_fitts_law_by_time_type.
+
+    Every figure is drawn on its own Agg canvas (no pyplot, no GUI backend),
+    saved and released right away, in `workers` processes. A plot is skipped when
+    its input rows and dpi are the same as when its PNG was last written
+    (PLOT_MANIFEST in the plot directory), unless `force`. With `preview` the
+    plots are rendered at PREVIEW_DPI into fitts_plots/preview.
+
+    Returns:
+    --------
+    list
+        File names of the plots written in this run
+    """
+    plot_dir = Path(up.PROCESSED_DATA) / "fitts_plots"
+    dpi = PLOT_DPI
+    if preview:
+        plot_dir, dpi = plot_dir / "preview", PREVIEW_DPI
+    plot_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest_path = plot_dir / PLOT_MANIFEST
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+
+    jobs, hashes = [], {}
+    jobs_all = _plot_jobs(df_conditions)
+    for filename, draw, args, rows in jobs_all:
+        hashes[filename] = _plot_hash(filename, rows, dpi)
+        if not force and manifest.get(filename) == hashes[filename] and (plot_dir / filename).exists():
+            continue
+        jobs.append((plot_dir / filename, draw, args, dpi))
+
+    print("\n" + "="*80)
+    print(f"RENDERING FITTS LAW PLOTS ({'preview, ' if preview else ''}{dpi} dpi)")
+    print("="*80)
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            written = list(executor.map(_render_plot, jobs))
+    else:
+        written = [_render_plot(job) for job in jobs]
+
+    for filename in written:
+        manifest[filename] = hashes[filename]
+        print(f"Saved: {filename}")
+    tmp = manifest_path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(manifest, indent=1, sort_keys=True))
+    os.replace(tmp, manifest_path)
+
+    print(f"\n{len(written)} plots rendered, {len(jobs_all) - len(written)} unchanged")
+    print(f"Plots saved to: {plot_dir}")
+    print("="*80)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fitts law metrics (ISO 9241-9) per condition")
+    parser.add_argument("--per-participant", action="store_true",
+                        help="Also write the participant x condition metrics and the mean-of-means throughput")
+    parser.add_argument("--bootstrap", type=int, default=0, metavar="N",
+                        help="Bootstrap replicates for CIs of TP, We and IDe (default: 0, no CIs)")
+    parser.add_argument("--ci", type=float, default=0.95, help="Confidence level of the bootstrap CIs (default: 0.95)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the bootstrap resampling (default: 0)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Run the bootstrap and the statistical tests on N processes (default: 1, serial)")
+    parser.add_argument("--stats", action="store_true",
+                        help="Also run the ANOVA and post-hoc tests on the trial-level MT")
+    parser.add_argument("--only", nargs="+", choices=STAT_TESTS, default=None,
+                        help="With --stats, only run these tests (default: all)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="With --stats, refit every test instead of reusing cached results")
+    parser.add_argument("--stats-cache-max-mb", type=float, default=STATS_CACHE_MAX_MB,
+                        help=f"Size cap of the statistical test cache, least recently used results are evicted "
+                             f"(default: {STATS_CACHE_MAX_MB})")
+    parser.add_argument("--no-plots", action="store_true",
+                        help="Only write the metrics; the plots can be rendered later from them (fitts.py plot)")
+    parser.add_argument("--headless", action="store_true",
+                        help="Render the plots on Agg canvases in --workers processes, skipping unchanged ones")
+    parser.add_argument("--preview", action="store_true",
+                        help=f"With --headless, render at {PREVIEW_DPI} dpi into fitts_plots/preview")
+    parser.add_argument("--force-plots", action="store_true",
+                        help="With --headless, re-render every plot even if its data is unchanged")
+    args = parser.parse_args(argv)
+
+    with stage("load trials") as st:
+        df_success = load_success_trials(verbose=True)
+        st.rows = len(df_success)
+
     # Run Fitts law analysis - returns condition-level metrics
-    df_conditions = calculate_fitts_law_metrics(save_results=True, verbose=True)
+    with stage("condition metrics", rows=len(df_success)):
+        df_conditions = calculate_fitts_law_metrics(save_results=True, verbose=True,
+                                                    per_participant=args.per_participant, n_boot=args.bootstrap,
+                                                    ci=args.ci, seed=args.seed, workers=args.workers,
+                                                    df_success=df_success)
     
-    # Create plots by condition (one plot per condition combination)
-    figs1 = plot_fitts_law_by_conditions(df_conditions, save_plots=True)
-    
-    # Create plots by time type (one plot per time type with all conditions)
-    figs2 = plot_fitts_law_by_time_type(df_conditions, save_plots=True)
-    
-    # Perform statistical analysis (ANOVA and post-hoc tests)
-    # Note: This would need to be updated to work with condition-level data
-    # stats_results = perform_statistical_analysis(df_conditions, save_results=True, verbose=True)
+    if not args.no_plots:
+        with stage("plots", rows=len(df_conditions)):
+            if args.headless:
+                # Same plots, each figure saved and released as soon as it is drawn
+                render_fitts_plots(df_conditions, workers=args.workers, preview=args.preview, force=args.force_plots)
+            else:
+                import matplotlib.pyplot as plt
+
+                # Create plots by condition (one plot per condition combination)
+                figs1 = plot_fitts_law_by_conditions(df_conditions, save_plots=True)
+                
+                # Create plots by time type (one plot per time type with all conditions)
+                figs2 = plot_fitts_law_by_time_type(df_conditions, save_plots=True)
+
+                # Close all figures to free memory
+                plt.close('all')
     
-    # Close all figures to free memory
-    plt.close('all')
+    # Perform statistical analysis (ANOVA and post-hoc tests) on the trial-level data
+    if args.stats:
+        df_success['ID_nominal'] = np.log2(df_success['A'] / df_success['W'] + 1)
+        with stage("statistical analysis", rows=len(df_success)):
+            stats_results = perform_statistical_analysis(df_success, save_results=True, verbose=True, only=args.only,
+                                                         workers=args.workers, use_cache=not args.no_cache,
+                                                         cache_max_mb=args.stats_cache_max_mb)
+
+
+def plot_main(argv=None):
+    """Render the plots from the saved CONDITIONS_SUMMARY_FILE, without recomputing the metrics."""
+    parser = argparse.ArgumentParser(description="Fitts law plots from the saved condition metrics")
+    parser.add_argument("--workers", type=int, default=1, help="Render the plots on N processes (default: 1)")
+    parser.add_argument("--preview", action="store_true",
+                        help=f"Render at {PREVIEW_DPI} dpi into fitts_plots/preview")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-render every plot even if its data is unchanged")
+    args = parser.parse_args(argv)
+
+    if not CONDITIONS_SUMMARY_FILE.exists():
+        raise SystemExit(f"{CONDITIONS_SUMMARY_FILE} not found, run the Fitts analysis first")
+    with stage("load condition metrics") as st:
+        # round_trip: the exact floats that were written, so the plots (and their manifest hashes) match
+        df_conditions = pd.read_csv(CONDITIONS_SUMMARY_FILE, float_precision="round_trip")
+        st.rows = len(df_conditions)
+    with stage("plots", rows=len(df_conditions)):
+        render_fitts_plots(df_conditions, workers=args.workers, preview=args.preview, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Parity check and benchmark of the 3_2_fittsAnalysis.py hot paths.
+
+Every check in CASES runs the column-wise implementation and the per-row/per-group
+reference it replaced on all trials of trials_latest.csv, compares the outputs and reports the
+time of both. data_analysis/test/test_fitts.py runs the same comparisons on a small
+synthetic trials table.
+
+Usage: python bench_fitts.py [--only NAME ...]
+"""
+
+import argparse
+import importlib.util
+import sys
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import utils_paths as up
+
+_spec = importlib.util.spec_from_file_location("3_2_fittsAnalysis", Path(__file__).with_name("3_2_fittsAnalysis.py"))
+fitts = importlib.util.module_from_spec(_spec)
+sys.modules["3_2_fittsAnalysis"] = fitts  # so process-pool workers can unpickle its functions
+_spec.loader.exec_module(fitts)
+
+
+def prepare_trials(df):
+    """
+    Trials (columns of trials_latest) plus three edge cases, with the MT_* and dx_*
+    columns load_success_trials adds. Also the input of the parity tests in data_analysis/test.
+    """
+    # Edge cases the recorded data may not contain: a zero-length movement and missing endpoints
+    edge = df.iloc[:3].copy()
+    edge.iloc[0, edge.columns.get_loc('Previous_target_position_x')] = edge.iloc[0]['Target_position_x']
+    edge.iloc[0, edge.columns.get_loc('Previous_target_position_y')] = edge.iloc[0]['Target_position_y']
+    edge.iloc[1, edge.columns.get_loc('Indication_down_x')] = np.nan
+    edge.iloc[2, edge.columns.get_loc('Reaching_pos_y')] = np.nan
+    df = pd.concat([df, edge], ignore_index=True)
+
+    df['MT_reaching'] = df['Reaching_time'] / 1000.0
+    df['MT_indication_down'] = df['Indication_down_t'] / 1000.0
+    df['MT_indication_up'] = df['Indication_up_t'] / 1000.0
+    df[list(fitts.ENDPOINT_COLUMNS)] = fitts.calculate_endpoint_projections(df)
+    return df
+
+
+def load_trials():
+    return prepare_trials(pd.read_csv(up.TRIALS_FILE_CSV))
+
+
+def endpoint_projections_reference(df):
+    return df.apply(fitts.calculate_endpoint_projected_position, axis=1)[list(fitts.ENDPOINT_COLUMNS)]
+
+
+def condition_metrics_reference(df, grouping_vars=fitts.CONDITION_VARS):
+    """The per-group apply that aggregate_condition_metrics replaced, one pass per time type."""
+    condition_metrics = []
+    for time_type, (time_col, dx_col) in fitts.TIME_TYPES.items():
+        def aggregate_condition(group):
+            A_val = group['A'].iloc[0]
+            return pd.Series({
+                'n_trials': len(group),
+                'MT_mean': group[time_col].mean(),
+                'MT_std': group[time_col].std(),
+                'dx_mean': group[dx_col].mean(),
+                'dx_std': group[dx_col].std(),
+                'We': 4.133 * group[dx_col].std(),
+                'Ae': A_val + group[dx_col].mean(),
+            })
+
+        grouped = df.groupby(grouping_vars, group_keys=False)[df.columns.tolist()].apply(aggregate_condition).reset_index()
+        grouped['IDe'] = np.log2(1 + grouped['Ae'] / grouped['We'])
+        grouped['TP'] = grouped['IDe'] / grouped['MT_mean']
+        grouped['time_type'] = time_type
+        condition_metrics.append(grouped)
+    return pd.concat(condition_metrics, ignore_index=True)
+
+
+def _participant_metrics(df):
+    return fitts.aggregate_condition_metrics(df, fitts.CONDITION_VARS + ['participantId'])
+
+
+def _participant_metrics_reference(df):
+    return condition_metrics_reference(df, fitts.CONDITION_VARS + ['participantId'])
+
+
+def _assert_frames(got, expected):
+    pd.testing.assert_frame_equal(got, expected, check_exact=True)
+
+
+def _assert_frames_close(got, expected):
+    # grouped mean/std sum in a different order than Series.mean/std: equal up to rounding
+    pd.testing.assert_frame_equal(got, expected, check_exact=False, rtol=1e-12, atol=1e-9)
+
+
+# name -> (current implementation, reference implementation, compare)
+CASES = {
+    "calculate_endpoint_projections": (fitts.calculate_endpoint_projections, endpoint_projections_reference, _assert_frames),
+    "aggregate_condition_metrics": (fitts.aggregate_condition_metrics, condition_metrics_reference, _assert_frames_close),
+    "aggregate_condition_metrics[participant]": (_participant_metrics, _participant_metrics_reference, _assert_frames_close),
+}
+
+
+def run_case(name, df):
+    new_fn, ref_fn, compare = CASES[name]
+
+    start = time.perf_counter()
+    expected = ref_fn(df)
+    t_ref = time.perf_counter() - start
+
+    start = time.perf_counter()
+    got = new_fn(df)
+    t_new = time.perf_counter() - start
+
+    try:
+        compare(got, expected)
+        failed = 0
+    except AssertionError as e:
+        print(e)
+        failed = 1
+
+    print(f"{name}: {len(df)} trials, {'MISMATCH' if failed else 'ok'} | "
+          f"reference {t_ref * 1e3:.1f} ms, current {t_new * 1e3:.1f} ms "
+          f"({t_ref / t_new if t_new else np.nan:.1f}x)")
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity check and timing of 3_2_fittsAnalysis.py")
+    parser.add_argument("--only", nargs="+", choices=sorted(CASES), default=sorted(CASES),
+                        help="Functions to check (default: all)")
+    args = parser.parse_args()
+
+    df = load_trials()
+    failed = sum(run_case(name, df) for name in args.only)
+    if failed:
+        raise SystemExit(f"{failed} mismatching checks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Size and load-time comparison of the kinematics formats.
+
+Takes the float64 kinematics table (kinematics.parquet if 2_movement_analysis.py
+wrote it with --kinematics-format full|both, otherwise recomputed from the samples
+through the submovement cache), writes it as the original float64 Parquet, as CSV
+and in the compact format of kinematics_store.py to a temporary directory, checks
+that the compact file reads back to the same frame and reports the file size and
+best-of-N load time of each.
+
+Usage: python bench_kinematics.py [--repeat N]
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import utils_paths as up
+from kinematics_store import write_kinematics, read_kinematics, SIGNAL_COLUMNS
+
+
+def _best_time(fn, repeat):
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _compact_memory_mb(df):
+    """In-memory size of df with the dtypes read_kinematics(compact=True) returns."""
+    compact = df.astype({col: np.float32 for col in SIGNAL_COLUMNS}).astype(
+        {"trialDocId": "category", "gap_fill": "category", "segment_id": np.float32})
+    return compact.memory_usage(deep=True).sum() / 1e6
+
+
+def load_full_kinematics():
+    """The float64 kinematics frame; the default compact output only keeps float32 signals."""
+    if Path(up.KINEMATICS_FILE).exists():
+        return pd.read_parquet(up.KINEMATICS_FILE)
+    if not Path(up.SAMPLES_FILE).exists():
+        raise SystemExit(f"Neither {up.KINEMATICS_FILE} nor {up.SAMPLES_FILE} found: run 1_flatten_data.py first")
+    from fitts import load_script
+    from positions_store import read_samples
+    from submovement_cache import SubmovementCache
+
+    print(f"{up.KINEMATICS_FILE} not found: recomputing the kinematics (cached trials are reused)")
+    _, kinematic_rows = load_script("2_movement_analysis.py").analyze_trials(read_samples(up.SAMPLES_FILE),
+                                                                             cache=SubmovementCache())
+    return pd.concat(kinematic_rows, ignore_index=True)
+
+
+def check_roundtrip(df, path):
+    """Exact for ids, t, flags, gap_fill and segment_id; float32 rounding for x/y/v/a."""
+    got = read_kinematics(path)
+    exact = [col for col in df.columns if col not in SIGNAL_COLUMNS]
+    pd.testing.assert_frame_equal(got[exact], df[exact], check_exact=True)
+    expected = df[SIGNAL_COLUMNS].astype(np.float32).astype(np.float64)
+    pd.testing.assert_frame_equal(got[SIGNAL_COLUMNS], expected, check_exact=True)
+    err = (got[SIGNAL_COLUMNS] - df[SIGNAL_COLUMNS]).abs().max()
+    print("max |float32 - float64|: " + ", ".join(f"{col} {err[col]:.2e}" for col in SIGNAL_COLUMNS))
+
+    some = df["trialDocId"].drop_duplicates().iloc[::10].tolist()
+    subset = read_kinematics(path, trial_ids=some, columns=["trialDocId", "t", "gap_boundary"])
+    expected = df.loc[df["trialDocId"].isin(some), ["trialDocId", "t", "gap_boundary"]].reset_index(drop=True)
+    pd.testing.assert_frame_equal(subset, expected, check_exact=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Size and load time of the kinematics formats")
+    parser.add_argument("--repeat", type=int, default=5, help="Loads per format, the best is reported (default: 5)")
+    args = parser.parse_args()
+
+    df = load_full_kinematics()
+    print(f"{len(df)} samples, {df['trialDocId'].nunique()} trials, "
+          f"{df.memory_usage(deep=True).sum() / 1e6:.1f} MB in memory "
+          f"({_compact_memory_mb(df):.1f} MB with compact=True)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        full = Path(tmp) / "kinematics.parquet"
+        csv = Path(tmp) / "kinematics.csv"
+        compact = Path(tmp) / "kinematics_compact.parquet"
+        df.to_parquet(full, index=False)
+        df.to_csv(csv, index=False)
+        write_kinematics(df, compact)
+        check_roundtrip(df, compact)
+
+        loads = {
+            "parquet (float64)": (full, lambda: pd.read_parquet(full)),
+            "csv": (csv, lambda: pd.read_csv(csv)),
+            "compact": (compact, lambda: read_kinematics(compact)),
+            "compact, compact=True": (compact, lambda: read_kinematics(compact, compact=True)),
+        }
+        base_size = full.stat().st_size
+        base_time = None
+        for name, (path, load) in loads.items():
+            elapsed = _best_time(load, args.repeat)
+            base_time = base_time or elapsed
+            size = path.stat().st_size
+            print(f"{name:>22}: {size / 1e6:7.2f} MB ({base_size / size:5.2f}x vs parquet), "
+                  f"load {elapsed * 1e3:7.1f} ms ({base_time / elapsed:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Cold-start check and benchmark of the fitts.py commands (python -X importtime).
+
+Every target runs in a fresh interpreter: `fitts.py --help`, `fitts.py <command> --help`
+for every command (its script is imported and its arguments parsed, nothing runs),
+and a few library entry points. For each one the wall time (best of --repeat runs),
+the import time reported by -X importtime and the heavy modules it loaded are printed.
+
+The run fails if a target loads a module it must not: matplotlib, statsmodels and
+scipy (signal filters, stats) are imported inside the functions that plot, fit
+models or filter, so no command loads them at start-up, and `fitts.py --help`
+loads none of the heavy modules. It also fails if `fitts.py --help` takes longer
+than --budget-ms.
+
+Usage: python bench_startup.py [--repeat N] [--budget-ms MS] [--top N]
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+from pathlib import Path
+from fitts import COMMANDS
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+FITTS = str(SCRIPTS_DIR / "fitts.py")
+
+HEAVY = ["numpy", "pandas", "pyarrow", "scipy.signal", "scipy.stats", "matplotlib", "matplotlib.pyplot",
+         "statsmodels", "duckdb"]
+LAZY = {"matplotlib", "statsmodels", "scipy.signal", "scipy.stats"}  # only inside the functions that use them
+
+# Condition metrics of 3_2 without plots or tests, as `fitts.py fitts --no-plots` computes them (nothing written)
+_METRICS = ("import sys; sys.argv = ['fitts']; from fitts import load_script; "
+            "load_script('3_2_fittsAnalysis.py').calculate_fitts_law_metrics(save_results=False, verbose=False)")
+
+# (label, interpreter arguments, modules it must not load)
+TARGETS = [
+    ("fitts --help", [FITTS, "--help"], set(HEAVY)),
+    *[(f"fitts {name} --help", [FITTS, name, "--help"], LAZY) for name in COMMANDS],
+    ("import utils_paths", ["-c", "import utils_paths"], set(HEAVY)),
+    ("import profiling", ["-c", "import profiling"], set(HEAVY)),
+    ("3_2 metrics, no plots", ["-c", _METRICS], LAZY),
+    ("catalog.connect()", ["-c", "import catalog; catalog.connect()"], LAZY),
+]
+
+
+def import_times(args):
+    """{module: cumulative us} of every import of a run, and the total of the top-level ones."""
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=SCRIPTS_DIR,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(args)} failed:\n{result.stderr[-2000:]}")
+    modules, total = {}, 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules[name.strip()] = int(cumulative)
+        if not name[1:].startswith(" "):  # nested imports are indented
+            total += int(cumulative)
+    return modules, total
+
+
+def wall_time(args, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, *args], cwd=SCRIPTS_DIR, capture_output=True, check=True)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def loaded(modules, name):
+    return name in modules or any(m.startswith(name + ".") for m in modules)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cold-start time of the fitts.py commands")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per target, the best wall time is kept (default: 5)")
+    parser.add_argument("--budget-ms", type=float, default=250.0,
+                        help="Maximum wall time of `fitts.py --help` (default: 250)")
+    parser.add_argument("--top", type=int, default=0, metavar="N", help="Also list the N slowest imports of each target")
+    args = parser.parse_args(argv)
+
+    failures = []
+    print(f"{'Target':<26} {'wall ms':>8} {'import ms':>10}  heavy modules")
+    for label, target_args, forbidden in TARGETS:
+        modules, total = import_times(target_args)
+        wall = wall_time(target_args, args.repeat) * 1e3
+        heavy = [name for name in HEAVY if loaded(modules, name)]
+        print(f"{label:<26} {wall:8.1f} {total / 1e3:10.1f}  {' '.join(heavy) or '-'}")
+        if args.top:
+            for name, us in sorted(modules.items(), key=lambda item: -item[1])[:args.top]:
+                print(f"{'':<28}{us / 1e3:8.1f} ms  {name}")
+
+        unexpected = [name for name in sorted(forbidden) if loaded(modules, name)]
+        if unexpected:
+            failures.append(f"{label} imports {', '.join(unexpected)}")
+        if label == "fitts --help" and wall > args.budget_ms:
+            failures.append(f"{label} took {wall:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    if failures:
+        print("\nFAILED:\n  " + "\n  ".join(failures))
+        raise SystemExit(1)
+    print("\nStart-up OK: no target loads a module it should import lazily")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Per-trial parity check and benchmark of the submovements.py hot paths.
+
+Every function registered in CASES is run on each trial of samples_latest.parquet
+with both the current implementation (submovements.py) and the original one
+(submovements_reference.py). The outputs must match; the time per trial is
+reported for both.
+
+Usage: python bench_submovements.py [--trials N] [--only NAME ...]
+"""
+
+import argparse
+import time
+import numpy as np
+import pandas as pd
+import utils_paths as up
+import submovements as sm
+import submovements_reference as ref
+
+
+def _assert_frames(got, expected):
+    pd.testing.assert_frame_equal(got, expected, check_exact=True)
+
+
+def _resample_args(trial):
+    return (trial,), dict(dt_ms=sm.ResampleCfg.dt_ms, gap_ms=sm.ResampleCfg.gap_ms)
+
+
+def _assert_equal(got, expected):
+    assert got == expected
+
+
+def _kinematics_args(trial):
+    cfg = sm.ResampleCfg()
+    uni = sm.resample_uniform(trial, dt_ms=cfg.dt_ms, gap_ms=cfg.gap_ms)
+    fs = 1000 / cfg.dt_ms
+    uni[['x', 'y']] = sm.butter_lowpass_filter(uni[['x', 'y']].to_numpy(), cutoff=sm.FILTER_CUTOFF_HZ, fs=fs)
+    kin = sm.compute_kinematics(uni, dt_ms=cfg.dt_ms, smooth_window=cfg.smooth_window)
+    return (kin, sm.Thresholds()), dict(dt_ms=cfg.dt_ms)
+
+
+def _label_runs_args(trial):
+    (kin, thr), _ = _kinematics_args(trial)
+    used_mask = np.zeros(len(kin), dtype=bool)
+    used_mask[::50] = True
+    return (kin['v'] >= thr.slow_speed_min, used_mask), {}
+
+
+def _detect_submovements_numpy(*args, **kwargs):
+    """detect_submovements forced onto the pure-NumPy scan (what runs without numba)."""
+    scan = sm._scan_segments
+    sm._scan_segments = sm._scan_segments_numpy
+    try:
+        return sm.detect_submovements(*args, **kwargs)
+    finally:
+        sm._scan_segments = scan
+
+
+def _filter_args(trial):
+    cfg = sm.ResampleCfg()
+    uni = sm.resample_uniform(trial, dt_ms=cfg.dt_ms, gap_ms=cfg.gap_ms)
+    return (uni['x'].values,), dict(cutoff=sm.FILTER_CUTOFF_HZ, fs=1000 / cfg.dt_ms)
+
+
+def _assert_arrays(got, expected):
+    np.testing.assert_array_equal(got, expected)
+
+
+# name -> (current implementation, reference implementation, build args from a trial, compare)
+CASES = {
+    "resample_uniform": (sm.resample_uniform, ref.resample_uniform, _resample_args, _assert_frames),
+    "detect_submovements": (sm.detect_submovements, ref.detect_submovements, _kinematics_args, _assert_equal),
+    "detect_submovements[numpy]": (_detect_submovements_numpy, ref.detect_submovements, _kinematics_args, _assert_equal),
+    "butter_lowpass_filter": (sm.butter_lowpass_filter, ref.butter_lowpass_filter, _filter_args, _assert_arrays),
+    "_label_runs": (sm._label_runs, ref._label_runs, _label_runs_args, _assert_equal),
+}
+
+
+def load_trials(n_trials=None):
+    df = pd.read_parquet(up.SAMPLES_FILE, columns=["trialDocId", "t", "x", "y"])
+    trials = [grp[['t', 'x', 'y']].sort_values('t').reset_index(drop=True)
+              for _, grp in df.groupby("trialDocId")]
+    return trials[:n_trials] if n_trials else trials
+
+
+def run_case(name, trials):
+    new_fn, ref_fn, make_args, compare = CASES[name]
+    t_new = t_ref = 0.0
+    mismatches = 0
+    for trial in trials:
+        args, kwargs = make_args(trial)
+
+        start = time.perf_counter()
+        expected = ref_fn(*args, **kwargs)
+        t_ref += time.perf_counter() - start
+
+        start = time.perf_counter()
+        got = new_fn(*args, **kwargs)
+        t_new += time.perf_counter() - start
+
+        try:
+            compare(got, expected)
+        except AssertionError:
+            mismatches += 1
+
+    n = max(len(trials), 1)
+    print(f"{name}: {len(trials)} trials, {mismatches} mismatches | "
+          f"reference {t_ref / n * 1e3:.3f} ms/trial, current {t_new / n * 1e3:.3f} ms/trial "
+          f"({t_ref / t_new if t_new else np.nan:.1f}x)")
+    return mismatches
+
+
+def check_batch_filter(trials, tol=1e-9):
+    """butter_lowpass_filter_batch against the per-trial filter, over all trials at once."""
+    cfg = sm.ResampleCfg()
+    fs = 1000 / cfg.dt_ms
+    xys = [sm.resample_uniform(trial, dt_ms=cfg.dt_ms, gap_ms=cfg.gap_ms)[['x', 'y']].to_numpy() for trial in trials]
+
+    start = time.perf_counter()
+    expected = [sm.butter_lowpass_filter(xy, cutoff=sm.FILTER_CUTOFF_HZ, fs=fs) for xy in xys]
+    t_single = time.perf_counter() - start
+
+    start = time.perf_counter()
+    got = sm.butter_lowpass_filter_batch(xys, cutoff=sm.FILTER_CUTOFF_HZ, fs=fs)
+    t_batch = time.perf_counter() - start
+
+    max_diff = max((np.abs(g - e).max() for g, e in zip(got, expected)), default=0.0)
+    n = max(len(trials), 1)
+    print(f"butter_lowpass_filter_batch: max |diff| {max_diff:.3g} (tol {tol:g}) | "
+          f"per-trial {t_single / n * 1e3:.3f} ms/trial, batch {t_batch / n * 1e3:.3f} ms/trial")
+    return int(max_diff > tol)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parity check and per-trial timing of submovements.py")
+    parser.add_argument("--trials", type=int, default=None, help="Only use the first N trials")
+    parser.add_argument("--only", nargs="+", choices=sorted(CASES), default=sorted(CASES),
+                        help="Functions to check (default: all)")
+    args = parser.parse_args()
+
+    trials = load_trials(args.trials)
+    failed = sum(run_case(name, trials) for name in args.only)
+    failed += check_batch_filter(trials)
+    if failed:
+        raise SystemExit(f"{failed} mismatching trials")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Round-trip check and benchmark of the packed cursor traces (trace_codec.js / trace_codec.py).
+
+1. Random traces are encoded by trace_codec.js under Node and decoded by
+   trace_codec.py, and the other way round; both encoders must produce the same
+   strings and the decoded samples must equal the input (time rounded to the us).
+   Skipped if node is not on the PATH.
+2. Half of the trials of the latest raw trials snapshot are re-encoded as packed
+   traces (positions rounded to whole pixels) and 1_flatten_data.py's columnar
+   engine is checked against its reference loop on the mixed table.
+3. Upload size and decode time of the packed traces vs the cursorPositions arrays.
+
+Usage: python bench_trace_codec.py [--traces N]
+"""
+
+import argparse
+import importlib.util
+import json
+import shutil
+import subprocess
+import time
+from pathlib import Path
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+import utils_paths as up
+from trace_codec import decode_traces, encode_trace
+
+TRACE_CODEC_JS = Path(__file__).resolve().parents[2] / "trace_codec.js"
+
+_spec = importlib.util.spec_from_file_location("flatten", Path(__file__).with_name("1_flatten_data.py"))
+flatten = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(flatten)
+
+# Reads [[encode, [positions...]], [decode, "trace"], ...] from stdin and answers with the results
+_NODE_SCRIPT = """
+const codec = require(process.argv[1]);
+let input = "";
+process.stdin.on("data", chunk => input += chunk);
+process.stdin.on("end", () => {
+  const out = JSON.parse(input).map(([op, arg]) =>
+    op === "encode" ? codec.encodeCursorTrace(arg) : codec.decodeCursorTrace(arg));
+  process.stdout.write(JSON.stringify(out));
+});
+"""
+
+
+def random_trace(rng, n):
+    """cursorPositions-like samples: integer pixels, mousemove-like fractional ms times."""
+    t = np.round(np.cumsum(rng.uniform(0.1, 20, n)) - 5, 1) + rng.choice([0, 1e-9, -1e-9], n)
+    x = rng.integers(0, 1920) + np.cumsum(rng.integers(-300, 300, n))
+    y = rng.integers(0, 1080) + np.cumsum(rng.integers(-300, 300, n))
+    return t, x.astype(np.float64), y.astype(np.float64)
+
+
+def _node(requests):
+    result = subprocess.run(["node", "-e", _NODE_SCRIPT, str(TRACE_CODEC_JS)], input=json.dumps(requests),
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def check_node_roundtrip(n_traces, rng):
+    traces = [random_trace(rng, int(rng.integers(1, 500))) for _ in range(n_traces)]
+    traces.append((np.array([0.0, 1.5]), np.array([10.5, 11.0]), np.array([0.0, 0.0])))  # fractional px: not packed
+    traces.append((np.array([0.0, 1.0]), np.array([0.0, 40000.0]), np.array([0.0, 0.0])))  # delta overflow: not packed
+
+    positions = [[{"x": xi, "y": yi, "time": ti} for ti, xi, yi in zip(t.tolist(), x.tolist(), y.tolist())]
+                 for t, x, y in traces]
+    js_encoded = _node([["encode", p] for p in positions])
+    py_encoded = [encode_trace(t, x, y) for t, x, y in traces]
+    assert js_encoded == py_encoded, "trace_codec.js and trace_codec.py encode differently"
+    assert js_encoded[-2] is None and js_encoded[-1] is None
+
+    packed = [(trace, sample) for trace, sample in zip(py_encoded, traces) if trace is not None]
+    lengths, t, x, y = decode_traces([trace for trace, _ in packed])
+    expected_t = np.concatenate([np.floor(s[0] * 1000 + 0.5) / 1000 for _, s in packed])
+    np.testing.assert_array_equal(lengths, [len(s[0]) for _, s in packed])
+    np.testing.assert_array_equal(t, expected_t)
+    np.testing.assert_array_equal(x, np.concatenate([s[1] for _, s in packed]))
+    np.testing.assert_array_equal(y, np.concatenate([s[2] for _, s in packed]))
+
+    js_decoded = _node([["decode", trace] for trace, _ in packed])
+    js_t = np.array([p["time"] for trial in js_decoded for p in trial])
+    js_x = np.array([p["x"] for trial in js_decoded for p in trial])
+    np.testing.assert_array_equal(js_t, t)
+    np.testing.assert_array_equal(js_x, x)
+    print(f"Node <-> Python round trip OK: {len(packed)} traces, {lengths.sum()} samples")
+
+
+def pack_half(table):
+    """The raw trials table with every other trial's cursorPositions replaced by a cursorTrace."""
+    positions = table.column("cursorPositions").combine_chunks()
+    traces, kept = [], []
+    for i, trial in enumerate(positions.to_pylist()):
+        if i % 2 == 0 and trial:
+            traces.append(encode_trace([p["time"] for p in trial], [round(p["x"]) for p in trial],
+                                       [round(p["y"]) for p in trial]))
+            kept.append(None)
+        else:
+            traces.append(None)
+            kept.append(trial)
+    table = table.set_column(table.column_names.index("cursorPositions"), "cursorPositions",
+                             pa.array(kept, type=positions.type))
+    return table.append_column("cursorTrace", pa.array(traces, type=pa.string()))
+
+
+def check_flatten_parity(table):
+    mixed = pack_half(table)
+    df_trials = mixed.to_pandas()
+    flatten.check_positions_parity(df_trials, mixed.column("cursorPositions"), mixed.column("cursorTrace"))
+
+
+def report_size_and_speed(table):
+    positions = table.column("cursorPositions").combine_chunks()
+    trials = positions.to_pylist()
+    traces = [encode_trace([p["time"] for p in trial], [round(p["x"]) for p in trial], [round(p["y"]) for p in trial])
+              for trial in trials if trial]
+    as_maps = sum(len(json.dumps(trial)) for trial in trials if trial)
+    as_traces = sum(len(trace) for trace in traces)
+
+    start = time.perf_counter()
+    lengths, t, x, y = decode_traces(traces)
+    t_packed = time.perf_counter() - start
+    start = time.perf_counter()
+    flat = pc.list_flatten(positions)
+    _ = [flat.field(f).to_numpy() for f in ("time", "x", "y")]
+    t_arrow = time.perf_counter() - start
+    start = time.perf_counter()
+    _ = [(p["time"], p["x"], p["y"]) for trial in trials if trial for p in trial]
+    t_dicts = time.perf_counter() - start
+
+    print(f"{len(traces)} trials, {lengths.sum()} samples: cursorPositions as JSON {as_maps / 1e6:.2f} MB, "
+          f"cursorTrace {as_traces / 1e6:.2f} MB ({as_maps / as_traces:.1f}x smaller)")
+    print(f"decode: traces {t_packed * 1e3:.1f} ms, arrow list flatten {t_arrow * 1e3:.1f} ms, "
+          f"walking the dicts {t_dicts * 1e3:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Round-trip check and benchmark of the packed cursor traces")
+    parser.add_argument("--traces", type=int, default=200, help="Random traces for the Node round trip (default: 200)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if shutil.which("node"):
+        check_node_roundtrip(args.traces, rng)
+    else:
+        print("node not found, skipping the JavaScript round trip")
+
+    trials_path = sorted(Path(up.RAW_DATA).glob("trials_*.parquet"))[-1]
+    table = pq.read_table(trials_path)
+    check_flatten_parity(table)
+    report_size_and_speed(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Embedded DuckDB catalog over the processed Parquet/CSV artifacts.
+
+connect() returns a DuckDB connection where every processed table is a view over
+its file, so queries read only the columns and row groups they need, run on all
+cores and spill to disk instead of materializing whole tables in pandas:
+
+    trials_latest      one row per trial (1_flatten_data.py)
+    samples            trialDocId, t, x, y per cursor sample
+    position_trials    trial attributes of the positions star schema
+    positions_latest   samples joined with position_trials (same rows as positions_latest.parquet)
+    submovements       detected segments (2_movement_analysis.py)
+    kinematics         uniform kinematics, t rebuilt from the compact file's t0/dt_ms
+    error_rates        success / error counts per participant and condition
+
+plus the ready-made joins in QUERIES (segments with their trial, per-condition
+aggregates). Views are only created for the files that exist.
+
+    con = catalog.connect()
+    con.sql("SELECT * FROM segment_types_by_condition WHERE feedbackMode = 'green'").df()
+
+From the command line: python catalog.py "SELECT ..." [--out file.csv], or
+python catalog.py --list.
+"""
+
+import argparse
+from pathlib import Path
+import utils_paths as up
+
+try:
+    import duckdb
+except ImportError:  # duckdb is optional; only needed for the query layer
+    duckdb = None
+
+# Experimental condition of a trial (the Fitts' law analyses group by these)
+CONDITION_KEYS = ["W", "A", "buffer", "indication", "feedbackMode"]
+_CONDITIONS = ", ".join(CONDITION_KEYS)
+
+# name -> (file, SQL over it as {path}); only created when the file exists
+TABLES = {
+    "trials_latest": (up.TRIALS_FILE, "SELECT * FROM read_parquet('{path}')"),
+    "samples": (up.SAMPLES_FILE, "SELECT * FROM read_parquet('{path}')"),
+    "position_trials": (up.POSITION_TRIALS_FILE, "SELECT * FROM read_parquet('{path}')"),
+    "submovements": (up.SEGMENTS_FILE, "SELECT * FROM read_parquet('{path}')"),
+    "error_rates": (up.ERROR_RATES_FILE_CSV, "SELECT * FROM read_csv_auto('{path}')"),
+}
+
+# Distance_to_target as in positions_store.distance_to_target (a missing target coordinate counts as 0)
+POSITIONS_SQL = f"""
+SELECT s.trialDocId, p.participantId, s.t, s.x, s.y,
+       p.Target_position_x, p.Target_position_y,
+       sqrt(pow(s.x - coalesce(p.Target_position_x, 0), 2) + pow(s.y - coalesce(p.Target_position_y, 0), 2)) AS Distance_to_target,
+       p.Distance_to_target_indication_down, p.Distance_to_target_indication_up,
+       p.Indication_down_x, p.Indication_down_y, p.Indication_up_x, p.Indication_up_y,
+       p.W, p.A, p.ID, p.indication, p.feedbackMode, p.buffer, p.source
+FROM samples s JOIN position_trials p USING (trialDocId)
+"""
+
+# k is the position of a sample inside its trial (rows are contiguous and in time order)
+KINEMATICS_SQL = """
+SELECT trialDocId,
+       t0 + (file_row_number - min(file_row_number) OVER (PARTITION BY trialDocId)) * {dt_ms} AS t,
+       x::DOUBLE AS x, y::DOUBLE AS y,
+       (flags & 1) <> 0 AS imputed,
+       gap_fill,
+       CASE WHEN segment_id < 0 THEN NULL ELSE segment_id::DOUBLE END AS segment_id,
+       (flags & 2) <> 0 AS gap_boundary,
+       v::DOUBLE AS v, a::DOUBLE AS a
+FROM read_parquet('{path}', file_row_number = true) JOIN kinematics_t0 USING (trialDocId)
+"""
+
+# Ready-made joins and aggregates, created as views after the tables
+QUERIES = {
+    "segments_trials": (["submovements", "trials_latest"], f"""
+        SELECT s.*, t.participantId, {", ".join(f"t.{col}" for col in CONDITION_KEYS)}, t.success
+        FROM submovements s JOIN trials_latest t USING (trialDocId)
+    """),
+    "segment_types_by_condition": (["segments_trials"], f"""
+        SELECT {_CONDITIONS}, type,
+               count(*) AS n_segments,
+               count(DISTINCT trialDocId) AS n_trials,
+               avg(duration_ms) AS duration_ms_mean,
+               avg(v_peak_px_per_ms) AS v_peak_mean
+        FROM segments_trials
+        GROUP BY {_CONDITIONS}, type
+        ORDER BY {_CONDITIONS}, type
+    """),
+    "trials_by_condition": (["trials_latest"], f"""
+        SELECT {_CONDITIONS},
+               count(*) AS n_trials,
+               count(DISTINCT participantId) AS n_participants,
+               avg(success::INTEGER) AS success_rate,
+               avg(Reaching_time) AS Reaching_time_mean,
+               avg(Indication_down_t) AS Indication_down_t_mean,
+               avg(Indication_up_t) AS Indication_up_t_mean
+        FROM trials_latest
+        GROUP BY {_CONDITIONS}
+        ORDER BY {_CONDITIONS}
+    """),
+    "kinematics_trials": (["kinematics", "trials_latest"], f"""
+        SELECT k.*, t.participantId, {", ".join(f"t.{col}" for col in CONDITION_KEYS)}
+        FROM kinematics k JOIN trials_latest t USING (trialDocId)
+    """),
+}
+
+
+def _sql_path(path):
+    return str(Path(path).resolve()).replace("'", "''")
+
+
+def connect(database=":memory:", threads=None, memory_limit=None, temp_directory=up.DUCKDB_TEMP_DIR):
+    """
+    DuckDB connection with the processed artifacts registered as views.
+
+    Parameters:
+    -----------
+    database : str
+        DuckDB database file, or ":memory:" (the views only hold the file paths)
+    threads : int, optional
+        Worker threads (default: DuckDB's, all cores)
+    memory_limit : str, optional
+        e.g. "2GB"; beyond it joins/aggregations spill to temp_directory
+    temp_directory : str
+        Where DuckDB spills
+
+    Returns:
+    --------
+    duckdb.DuckDBPyConnection
+    """
+    if duckdb is None:
+        raise ImportError("The query layer needs duckdb (pip install duckdb)")
+    con = duckdb.connect(database)
+    Path(temp_directory).mkdir(parents=True, exist_ok=True)
+    con.execute(f"SET temp_directory = '{_sql_path(temp_directory)}'")
+    if threads:
+        con.execute(f"SET threads = {int(threads)}")
+    if memory_limit:
+        con.execute(f"SET memory_limit = '{memory_limit}'")
+
+    created = set()
+    for name, (path, sql) in TABLES.items():
+        if Path(path).exists():
+            con.execute(f"CREATE OR REPLACE VIEW {name} AS {sql.format(path=_sql_path(path))}")
+            created.add(name)
+    if {"samples", "position_trials"} <= created:
+        con.execute(f"CREATE OR REPLACE VIEW positions_latest AS {POSITIONS_SQL}")
+        created.add("positions_latest")
+
+    if Path(up.KINEMATICS_COMPACT_FILE).exists():
+        from kinematics_store import read_metadata
+        metadata = read_metadata(up.KINEMATICS_COMPACT_FILE)
+        con.execute("CREATE OR REPLACE TEMP TABLE kinematics_t0 AS "
+                    "SELECT unnest(?::VARCHAR[]) AS trialDocId, unnest(?::DOUBLE[]) AS t0",
+                    [metadata["trialDocId"], metadata["t0"]])
+        sql = KINEMATICS_SQL.format(path=_sql_path(up.KINEMATICS_COMPACT_FILE), dt_ms=metadata["dt_ms"])
+        con.execute(f"CREATE OR REPLACE VIEW kinematics AS {sql}")
+        created.add("kinematics")
+    elif Path(up.KINEMATICS_FILE).exists():
+        con.execute(f"CREATE OR REPLACE VIEW kinematics AS SELECT * FROM read_parquet('{_sql_path(up.KINEMATICS_FILE)}')")
+        created.add("kinematics")
+
+    for name, (needs, sql) in QUERIES.items():
+        if set(needs) <= created:
+            con.execute(f"CREATE OR REPLACE VIEW {name} AS {sql}")
+            created.add(name)
+    return con
+
+
+def query(sql, params=None, con=None):
+    """Run sql on the catalog (a new connection unless con is given) and return a DataFrame."""
+    con = con or connect()
+    return con.execute(sql, params).df()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SQL over the processed artifacts (DuckDB)")
+    parser.add_argument("sql", nargs="?", help="Query to run, e.g. \"SELECT * FROM trials_by_condition\"")
+    parser.add_argument("--list", action="store_true", help="List the available views and exit")
+    parser.add_argument("--out", help="Write the result to this CSV (or .parquet) instead of printing it")
+    parser.add_argument("--threads", type=int, default=None, help="DuckDB worker threads (default: all cores)")
+    parser.add_argument("--memory-limit", default=None, help="e.g. 2GB; larger joins spill to disk")
+    args = parser.parse_args(argv)
+
+    con = connect(threads=args.threads, memory_limit=args.memory_limit)
+    if args.list or not args.sql:
+        for (name,) in con.execute("SELECT view_name FROM duckdb_views() WHERE NOT internal ORDER BY view_name").fetchall():
+            print(name)
+        return
+
+    if args.out:
+        # COPY streams the result to the file without building a DataFrame
+        fmt = "PARQUET" if args.out.endswith(".parquet") else "CSV, HEADER"
+        con.execute(f"COPY ({args.sql}) TO '{_sql_path(args.out)}' (FORMAT {fmt})")
+        print(f"Saved {args.out}")
+    else:
+        print(con.sql(args.sql))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+In-memory stand-in for the google.cloud.firestore client.
+
+Implements the small query surface used by 0_fetchdata_firestore.py
+(collection / order_by / where / start_after / limit / stream / count) so the fetch
+logic can be run offline. Each stream() can sleep for a simulated round trip
+plus a per-document transfer time and fail at random, to exercise the
+parallel fetch and its retries. The generated documents follow the shape
+written by firebase.js (participants, fitts_trials, fitts_pre_trials).
+"""
+
+from datetime import datetime, timedelta, timezone
+import random
+import string
+import time
+
+DOC_ID_FIELD = "__name__"
+
+
+class FakeUnavailable(Exception):
+    """Simulated transient backend error (the real client raises ServiceUnavailable)."""
+
+
+class FakeDocumentReference:
+    def __init__(self, collection, doc_id):
+        self._collection = collection
+        self.id = doc_id
+
+    def get(self):
+        return FakeDocumentSnapshot(self.id, self._collection._docs.get(self.id, {}))
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    def get(self, field):
+        if field == DOC_ID_FIELD:
+            return self.id
+        return self._data.get(field)
+
+    def to_dict(self):
+        return dict(self._data)
+
+
+class FakeQuery:
+    def __init__(self, collection, orders=(), filters=(), cursor=None, limit=None):
+        self._collection = collection
+        self._orders = list(orders)
+        self._filters = list(filters)
+        self._cursor = cursor
+        self._limit = limit
+
+    def _copy(self, **changes):
+        state = dict(orders=self._orders, filters=self._filters, cursor=self._cursor, limit=self._limit)
+        state.update(changes)
+        return FakeQuery(self._collection, **state)
+
+    def order_by(self, field):
+        return self._copy(orders=self._orders + [field])
+
+    def where(self, field, op, value):
+        return self._copy(filters=self._filters + [(field, op, value)])
+
+    def start_after(self, cursor):
+        return self._copy(cursor=cursor)
+
+    def limit(self, count):
+        return self._copy(limit=count)
+
+    def count(self):
+        return FakeAggregationQuery(self)
+
+    def _sort_key(self, snap):
+        return tuple(snap.get(f) for f in self._orders) + (snap.id,)
+
+    def _cursor_key(self):
+        if isinstance(self._cursor, FakeDocumentSnapshot):
+            return self._sort_key(self._cursor)
+        values = []
+        for f in self._orders:
+            v = self._cursor[f]
+            values.append(v.id if isinstance(v, FakeDocumentReference) else v)
+        doc_id = self._cursor.get(DOC_ID_FIELD)
+        doc_id = doc_id.id if isinstance(doc_id, FakeDocumentReference) else doc_id
+        return tuple(values) + (doc_id if doc_id is not None else "",)
+
+    def _matches(self, snap):
+        for field, op, value in self._filters:
+            v = snap.get(field)
+            if op == "==" and value is None:
+                # Matches a stored null, never a missing field
+                if field not in snap._data or v is not None:
+                    return False
+                continue
+            if v is None:
+                return False
+            if op == "==" and not v == value:
+                return False
+            if op == "in" and v not in value:
+                return False
+            if op == ">" and not v > value:
+                return False
+            if op == ">=" and not v >= value:
+                return False
+            if op == "<" and not v < value:
+                return False
+        return True
+
+    def stream(self):
+        client = self._collection._client
+        if client.failure_rate and client._rng.random() < client.failure_rate:
+            raise FakeUnavailable("simulated transient error")
+        snaps = [FakeDocumentSnapshot(i, d) for i, d in self._collection._docs.items()]
+        # Like Firestore, documents missing an order_by field are left out of the query
+        snaps = [s for s in snaps if all(s.get(f) is not None for f in self._orders)]
+        snaps = [s for s in snaps if self._matches(s)]
+        snaps.sort(key=self._sort_key)
+        if self._cursor is not None:
+            ck = self._cursor_key()
+            snaps = [s for s in snaps if self._sort_key(s) > ck]
+        if self._limit is not None:
+            snaps = snaps[:self._limit]
+        if client.latency or client.doc_latency:
+            time.sleep(client.latency + client.doc_latency * len(snaps))
+        return iter(snaps)
+
+
+class FakeAggregationResult:
+    def __init__(self, value):
+        self.alias = "field_1"
+        self.value = value
+
+
+class FakeAggregationQuery:
+    def __init__(self, query):
+        self._query = query
+
+    def get(self):
+        return [[FakeAggregationResult(sum(1 for _ in self._query.stream()))]]
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, docs, client):
+        self._docs = docs
+        self._client = client
+        super().__init__(self)
+
+    def document(self, doc_id):
+        return FakeDocumentReference(self, doc_id)
+
+
+class FakeClient:
+    def __init__(self, latency=0.0, doc_latency=0.0, failure_rate=0.0, seed=0):
+        self._collections = {}
+        self.latency = latency
+        self.doc_latency = doc_latency
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+
+    def collection(self, name):
+        return FakeCollection(self._collections.setdefault(name, {}), self)
+
+    def add(self, name, data, doc_id=None):
+        doc_id = doc_id or "".join(random.choices(string.ascii_letters + string.digits, k=20))
+        self._collections.setdefault(name, {})[doc_id] = data
+        return doc_id
+
+
+def _fake_trial(rng, participant_id, trial_index, when, packed=False):
+    n = rng.randint(50, 400)
+    t, x, y = 0.0, rng.uniform(0, 800), rng.uniform(0, 600)
+    positions = []
+    for _ in range(n):
+        t += rng.uniform(2, 20)
+        x += rng.gauss(3, 2)
+        y += rng.gauss(1, 2)
+        positions.append({"time": t, "x": x, "y": y})
+    event = lambda: {"x": rng.uniform(0, 800), "y": rng.uniform(0, 600), "time": rng.uniform(200, 2000), "inTarget": True}
+    W, A = rng.choice([20, 40, 80]), rng.choice([200, 400])
+    trial = {
+        "participantId": participant_id,
+        "timestamp": when.isoformat(timespec="milliseconds") + "Z",
+        "uploadedAt": when.replace(tzinfo=timezone.utc),  # serverTimestamp(), resolved by the server
+        "trialIndex": trial_index,
+        "W": W,
+        "A": A,
+        "ID": 0,
+        "buffer": rng.choice([0.8, 1.0, 1.2]),
+        "indication": rng.choice(["click", "barspace"]),
+        "feedbackMode": rng.choice(["none", "green"]),
+        "targetPosition": {"x": rng.uniform(0, 800), "y": rng.uniform(0, 600)},
+        "previousTargetPosition": {"x": rng.uniform(0, 800), "y": rng.uniform(0, 600)},
+        "indicationsDown": [event()],
+        "indicationsUp": [event()],
+        "reachingTimes": [event()],
+        "outTimes": [],
+        "bufferReachingTimes": [event()],
+        "bufferOutTimes": [],
+        "wrongIndications": [],
+        "success": rng.random() > 0.1,
+        "cursorPositions": positions,
+    }
+    if packed:
+        from trace_codec import encode_trace
+        # As uploaded with pack_cursor_traces: integer pixels (offsetX/offsetY) in a cursorTrace
+        trial["cursorTrace"] = encode_trace([p["time"] for p in positions],
+                                            [round(p["x"]) for p in positions], [round(p["y"]) for p in positions])
+        del trial["cursorPositions"]
+    return trial
+
+
+def add_fake_participants(client, n_participants, trials_per_participant=20, start=None, seed=0, packed_fraction=0.0):
+    """
+    Append synthetic participants with their trials and pre-trials; returns the new ids.
+    A packed_fraction of the trials is uploaded with a packed cursorTrace.
+    """
+    rng = random.Random(seed)
+    when = start or datetime(2026, 1, 1)
+    ids = []
+    for _ in range(n_participants):
+        pid = "".join(rng.choices(string.hexdigits.lower(), k=24))
+        client.add("participants", {"startedAt": when.isoformat(), "completed": True, "orderIndex": 0}, doc_id=pid)
+        for k in range(trials_per_participant):
+            when += timedelta(milliseconds=rng.randint(500, 3000))
+            packed = packed_fraction > 0 and rng.random() < packed_fraction
+            client.add("fitts_trials", _fake_trial(rng, pid, k, when, packed))
+        for k in range(3):
+            when += timedelta(milliseconds=rng.randint(500, 3000))
+            client.add("fitts_pre_trials", _fake_trial(rng, pid, k, when))
+        ids.append(pid)
+    return ids
+
+
+def make_fake_client(n_participants=5, trials_per_participant=20, seed=0,
+                     latency=0.0, doc_latency=0.0, failure_rate=0.0, packed_fraction=0.0):
+    client = FakeClient(latency=latency, doc_latency=doc_latency, failure_rate=failure_rate, seed=seed)
+    add_fake_participants(client, n_participants, trials_per_participant, seed=seed, packed_fraction=packed_fraction)
+    return client
@@ -0,0 +1,75 @@
+"""
+Single entry point of the analysis scripts.
+
+    python fitts.py <command> [options]
+
+    fetch      0_fetchdata_firestore.py   Firestore -> data/raw
+    flatten    1_flatten_data.py          raw snapshot -> trials / samples tables
+    movement   2_movement_analysis.py     submovements and kinematics
+    analyze    3_1_analysis.py            movement type at the reaching / click events
+    fitts      3_2_fittsAnalysis.py       Fitts law metrics, plots, --stats
+    plot       3_2_fittsAnalysis.py       plots from the saved condition metrics
+    qa         testing.py                 failed trials for review (test/test_qa.json)
+    query      catalog.py                 SQL over the processed artifacts
+    pipeline   run_pipeline.py            the stages whose inputs changed
+
+The options after the command go to the entry point of its script, which runs as
+if it had been started directly (`python fitts.py fitts --help` lists them).
+
+A script is only imported once its command is chosen, and the scripts import
+matplotlib, statsmodels and scipy.stats inside the functions that use them: the
+help and the commands that neither plot nor fit models start without them.
+bench_startup.py measures the import time of every command (python -X importtime).
+"""
+
+import argparse
+import importlib.util
+import sys
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+# command -> (script, entry point, help)
+COMMANDS = {
+    "fetch": ("0_fetchdata_firestore.py", "main", "Export the Firestore collections to data/raw"),
+    "flatten": ("1_flatten_data.py", "main", "Flatten the latest raw snapshot into the processed tables"),
+    "movement": ("2_movement_analysis.py", "main", "Submovement analysis of the cursor samples"),
+    "analyze": ("3_1_analysis.py", "main", "Movement type at the reaching and click events of every trial"),
+    "fitts": ("3_2_fittsAnalysis.py", "main", "Fitts law metrics per condition, plots and statistical tests"),
+    "plot": ("3_2_fittsAnalysis.py", "plot_main", "Render the Fitts law plots from the saved condition metrics"),
+    "qa": ("testing.py", "main", "Write the failed trials that reached the target to the QA file"),
+    "query": ("catalog.py", "main", "SQL over the processed artifacts (DuckDB)"),
+    "pipeline": ("run_pipeline.py", "main", "Run the analysis stages whose inputs changed"),
+}
+
+
+def load_script(script):
+    """Import a script of SCRIPTS_DIR by file name (the digit-prefixed ones are not valid module names)."""
+    name = Path(script).stem
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, SCRIPTS_DIR / script)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module  # so process-pool workers can unpickle its functions
+    spec.loader.exec_module(module)
+    return module
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="fitts", description="Fitts study analysis: one command per stage")
+    commands = parser.add_subparsers(dest="command", metavar="command", required=True)
+    for name, (script, _, help) in COMMANDS.items():
+        # The command's own options (and -h) are parsed by its script
+        commands.add_parser(name, help=help, add_help=False)
+    args, rest = parser.parse_known_args(argv)
+
+    script, entry, _ = COMMANDS[args.command]
+    if str(SCRIPTS_DIR) not in sys.path:
+        sys.path.insert(0, str(SCRIPTS_DIR))  # the scripts import utils_paths & co. as top-level modules
+    # argv[0] names the script in its usage line and in the profiling report
+    sys.argv = [str(SCRIPTS_DIR / script), *rest]
+    return getattr(load_script(script), entry)(rest)
+
+
+if __name__ == "__main__":
+    main()
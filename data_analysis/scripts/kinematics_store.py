@@ -0,0 +1,187 @@
+"""
+Compact on-disk format of the uniform kinematics table (2_movement_analysis.py).
+
+The full table has one row per resampled sample (every dt_ms ms) with the trial id
+repeated as a string, float64 t/x/y/v/a, an object gap_fill column and a float
+segment_id. The compact file stores the same rows, in the same order, as:
+
+    trialDocId    dictionary-encoded string (one int code per row, RLE-compressed)
+    x, y, v, a    float32, byte-stream-split
+    flags         uint8, bit 0 = imputed, bit 1 = gap_boundary
+    gap_fill      dictionary-encoded string
+    segment_id    int16, -1 where the sample is in no gap-free segment (NaN)
+
+t is not stored: the grid of a trial is t0 + k * dt_ms, k being the position of
+the sample inside its trial. dt_ms and the t0 of every trial are kept in the file's
+key-value metadata. write_kinematics refuses a table whose t does not follow that
+grid exactly, so t, the flags, the ids and segment_id come back bit-identical;
+x/y/v/a come back rounded to float32 (~1e-4 px at screen coordinates).
+
+The file is zstd-compressed Parquet. read_kinematics rebuilds the full frame, or
+only the requested trials/columns. Rebuilding the float64/object frame costs about
+as much as reading the float64 kinematics.parquet (38 vs 37 ms on 184586 samples,
+bench_kinematics.py); the gain of the default read is the 3.4x smaller file. With
+compact=True (float32 signals, categorical ids) it loads in half the time.
+"""
+
+import json
+import os
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import utils_paths as up
+from submovements import ResampleCfg
+
+FORMAT_VERSION = 1
+METADATA_KEY = b"fitts.kinematics"
+# Column order of the frame compute_kinematics/2_movement_analysis.py produce
+KINEMATICS_COLUMNS = ["trialDocId", "t", "x", "y", "imputed", "gap_fill", "segment_id", "gap_boundary", "v", "a"]
+SIGNAL_COLUMNS = ["x", "y", "v", "a"]
+FLAG_BITS = {"imputed": 1, "gap_boundary": 2}
+ZSTD_LEVEL = 9
+ROW_GROUP_SIZE = 1 << 17
+
+
+def _trial_positions(codes):
+    """Start row of each run of equal codes, and the position of every row inside its run."""
+    n = len(codes)
+    starts = np.flatnonzero(np.diff(codes, prepend=codes[:1] - 1) != 0) if n else np.empty(0, dtype=np.int64)
+    run_start = np.repeat(starts, np.diff(np.append(starts, n)))
+    return starts, np.arange(n) - run_start
+
+
+def write_kinematics(df, path=up.KINEMATICS_COMPACT_FILE, dt_ms=ResampleCfg.dt_ms):
+    """
+    Write the kinematics frame in the compact format (atomically).
+
+    Parameters:
+    -----------
+    df : DataFrame
+        KINEMATICS_COLUMNS, the samples of each trial contiguous and in time order
+    path : str
+        Output file
+    dt_ms : int
+        Resampling step the frame was produced with
+
+    Returns:
+    --------
+    int
+        Size of the written file in bytes
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    ids = pd.Categorical(df["trialDocId"])
+    codes = ids.codes.astype(np.int32)
+    starts, k = _trial_positions(codes)
+    if len(np.unique(codes[starts])) != len(starts):
+        raise ValueError("The samples of every trial must be contiguous")
+
+    t = df["t"].to_numpy(dtype=np.float64)
+    t0 = t[starts]
+    if not np.array_equal(t, np.repeat(t0, np.diff(np.append(starts, len(t)))) + k * dt_ms):
+        raise ValueError(f"t does not follow a uniform {dt_ms} ms grid inside every trial")
+
+    segment_id = df["segment_id"].to_numpy(dtype=np.float64)
+    if np.nanmax(segment_id, initial=-1) > np.iinfo(np.int16).max:
+        raise ValueError("segment_id does not fit in int16")
+
+    flags = np.zeros(len(df), dtype=np.uint8)
+    for col, bit in FLAG_BITS.items():
+        flags |= df[col].to_numpy(dtype=bool).astype(np.uint8) * np.uint8(bit)
+
+    gap_fill = pd.Categorical(df["gap_fill"])
+    columns = {
+        "trialDocId": pa.DictionaryArray.from_arrays(pa.array(codes), pa.array(ids.categories.astype(str))),
+        **{col: pa.array(df[col].to_numpy(dtype=np.float32)) for col in SIGNAL_COLUMNS},
+        "flags": pa.array(flags),
+        "gap_fill": pa.DictionaryArray.from_arrays(pa.array(gap_fill.codes.astype(np.int8)),
+                                                   pa.array(gap_fill.categories.astype(str))),
+        "segment_id": pa.array(np.where(np.isnan(segment_id), -1, segment_id).astype(np.int16)),
+    }
+    metadata = {
+        "version": FORMAT_VERSION,
+        "dt_ms": dt_ms,
+        "trialDocId": [str(ids.categories[c]) for c in codes[starts]],
+        "t0": t0.tolist(),
+    }
+    table = pa.table(columns).replace_schema_metadata({METADATA_KEY: json.dumps(metadata).encode()})
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    pq.write_table(table, tmp, compression="zstd", compression_level=ZSTD_LEVEL,
+                   use_dictionary=["trialDocId", "gap_fill", "segment_id", "flags"],
+                   use_byte_stream_split=SIGNAL_COLUMNS, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, path)
+    return path.stat().st_size
+
+
+def read_metadata(path=up.KINEMATICS_COMPACT_FILE):
+    """dt_ms and the per-trial t0 of a compact file (its 'trialDocId' and 't0' lists, in file order)."""
+    import pyarrow.parquet as pq
+
+    metadata = json.loads(pq.read_schema(path).metadata[METADATA_KEY])
+    if metadata["version"] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported kinematics format version {metadata['version']}")
+    return metadata
+
+
+def read_kinematics(path=up.KINEMATICS_COMPACT_FILE, trial_ids=None, columns=None, compact=False):
+    """
+    Read a file written by write_kinematics back into the kinematics frame.
+
+    Parameters:
+    -----------
+    path : str
+        Compact kinematics file
+    trial_ids : list, optional
+        Only these trials; row groups without them are skipped
+    columns : list, optional
+        Subset of KINEMATICS_COLUMNS to return (default: all, in the original order)
+    compact : bool
+        Keep x/y/v/a as float32 and trialDocId/gap_fill as categoricals instead of
+        the float64/object dtypes of the original frame
+
+    Returns:
+    --------
+    DataFrame
+    """
+    import pyarrow.parquet as pq
+
+    columns = list(KINEMATICS_COLUMNS if columns is None else columns)
+    unknown = set(columns) - set(KINEMATICS_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown kinematics columns: {sorted(unknown)}")
+
+    metadata = read_metadata(path)
+
+    stored = ["trialDocId"]
+    stored += [col for col in columns if col in SIGNAL_COLUMNS or col in ("gap_fill", "segment_id")]
+    if any(col in FLAG_BITS for col in columns):
+        stored.append("flags")
+    filters = [("trialDocId", "in", list(trial_ids))] if trial_ids is not None else None
+    table = pq.read_table(path, columns=stored, filters=filters)
+
+    ids = table.column("trialDocId").to_pandas()
+    out = {"trialDocId": ids if compact else ids.astype(object).to_numpy()}
+    if "t" in columns:
+        # Position of each trial in the metadata, then t = t0 + k * dt_ms
+        trial_index = pd.Index(metadata["trialDocId"]).get_indexer(ids.cat.categories)[ids.cat.codes.to_numpy()]
+        _, k = _trial_positions(trial_index)
+        out["t"] = np.asarray(metadata["t0"], dtype=np.float64)[trial_index] + k * metadata["dt_ms"]
+    for col in SIGNAL_COLUMNS:
+        if col in columns:
+            values = table.column(col).to_numpy()
+            out[col] = values if compact else values.astype(np.float64)
+    if "flags" in stored:
+        flags = table.column("flags").to_numpy()
+        for col, bit in FLAG_BITS.items():
+            out[col] = (flags & bit) != 0
+    if "gap_fill" in columns:
+        gap_fill = table.column("gap_fill").to_pandas()
+        out["gap_fill"] = gap_fill if compact else gap_fill.astype(object).to_numpy()
+    if "segment_id" in columns:
+        segment_id = table.column("segment_id").to_numpy()
+        out["segment_id"] = np.where(segment_id < 0, np.nan, segment_id).astype(np.float32 if compact else np.float64)
+    return pd.DataFrame({col: out[col] for col in columns})
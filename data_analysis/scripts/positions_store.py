@@ -0,0 +1,131 @@
+"""
+Star schema of the cursor positions: a slim samples table plus a trial dimension.
+
+positions_latest.parquet repeats the trial attributes (target, endpoints, W/A/ID,
+condition, participant) on every cursor sample. 1_flatten_data.py also writes
+them once per trial:
+
+    samples_latest.parquet          trialDocId, t, x, y (one row per sample)
+    position_trials_latest.parquet  trialDocId + TRIAL_COLUMNS (one row per trial)
+
+Stages that only need t/x/y read the samples table (read_samples). read_positions
+joins both on read and returns the wide layout, POSITION_COLUMNS with
+Distance_to_target recomputed per sample, bit-identical to positions_latest.parquet.
+The wide file is still written by default for the readers that load it directly
+(1_flatten_data.py --no-wide skips it).
+"""
+
+import numpy as np
+import pandas as pd
+import utils_paths as up
+
+SAMPLE_COLUMNS = ["trialDocId", "t", "x", "y"]
+TRIAL_COLUMNS = [
+    "trialDocId", "participantId",
+    "Target_position_x", "Target_position_y",
+    "Distance_to_target_indication_down", "Distance_to_target_indication_up",
+    "Indication_down_x", "Indication_down_y", "Indication_up_x", "Indication_up_y",
+    "W", "A", "ID", "indication", "feedbackMode", "buffer", "source",
+]
+# Column order of the wide positions table (both flatten engines must produce exactly this)
+POSITION_COLUMNS = [
+    "trialDocId", "participantId", "t", "x", "y",
+    "Target_position_x", "Target_position_y",
+    "Distance_to_target", "Distance_to_target_indication_down", "Distance_to_target_indication_up",
+    "Indication_down_x", "Indication_down_y", "Indication_up_x", "Indication_up_y",
+    "W", "A", "ID", "indication", "feedbackMode", "buffer", "source",
+]
+
+
+def _pow2(a):
+    """
+    Element-wise a**2 rounded like Python's float ** 2 (libm pow), not like x*x.
+    numpy's ** 2 takes a multiply fast path that differs in the last bit for a few
+    values, which would break bit-for-bit parity with the loop output.
+    """
+    a = np.asarray(a, dtype=np.float64)
+    return np.float_power(a, np.full_like(a, 2.0))
+
+
+def distance_to_target(x, y, target_x, target_y):
+    """Per-sample distance to the trial target; a missing target coordinate counts as 0."""
+    target_x = pd.Series(target_x).fillna(0).to_numpy()
+    target_y = pd.Series(target_y).fillna(0).to_numpy()
+    return np.sqrt(_pow2(np.asarray(x) - target_x) + _pow2(np.asarray(y) - target_y))
+
+
+def split_positions(df_positions):
+    """(samples, trials) tables of a wide positions frame."""
+    samples = df_positions[SAMPLE_COLUMNS].reset_index(drop=True)
+    trials = df_positions.drop_duplicates("trialDocId")[TRIAL_COLUMNS].reset_index(drop=True)
+    return samples, trials
+
+
+def join_positions(samples, trials, columns=None):
+    """
+    Wide positions frame: every sample with the attributes of its trial.
+
+    Parameters:
+    -----------
+    samples : DataFrame
+        SAMPLE_COLUMNS
+    trials : DataFrame
+        TRIAL_COLUMNS, one row per trialDocId
+    columns : list, optional
+        Subset of POSITION_COLUMNS to return (default: all)
+
+    Returns:
+    --------
+    DataFrame
+    """
+    columns = list(POSITION_COLUMNS if columns is None else columns)
+    trials = trials.set_index("trialDocId")
+    if not trials.index.is_unique:
+        raise ValueError("The trials table has duplicated trialDocId")
+    rows = trials.index.get_indexer(samples["trialDocId"])
+    if (rows < 0).any():
+        missing = samples["trialDocId"].to_numpy()[rows < 0][0]
+        raise ValueError(f"Sample of trial {missing} has no row in the trials table")
+
+    needed = set(columns) | ({"Target_position_x", "Target_position_y"} if "Distance_to_target" in columns else set())
+    attrs = trials[[col for col in trials.columns if col in needed]].take(rows).reset_index(drop=True)
+    out = pd.concat([samples.reset_index(drop=True), attrs], axis=1)
+    if "Distance_to_target" in columns:
+        out["Distance_to_target"] = distance_to_target(out["x"], out["y"],
+                                                       out["Target_position_x"], out["Target_position_y"])
+    return out[columns]
+
+
+def write_positions(samples, trials, samples_path=up.SAMPLES_FILE, trials_path=up.POSITION_TRIALS_FILE):
+    samples[SAMPLE_COLUMNS].to_parquet(samples_path, index=False)
+    trials[TRIAL_COLUMNS].to_parquet(trials_path, index=False)
+
+
+def read_samples(path=up.SAMPLES_FILE, columns=None, trial_ids=None):
+    """The samples table (or some of its columns/trials); no join."""
+    filters = [("trialDocId", "in", list(trial_ids))] if trial_ids is not None else None
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
+def read_trials(path=up.POSITION_TRIALS_FILE, columns=None, trial_ids=None):
+    """The trial dimension table (or some of its columns/trials)."""
+    filters = [("trialDocId", "in", list(trial_ids))] if trial_ids is not None else None
+    return pd.read_parquet(path, columns=columns, filters=filters)
+
+
+def read_positions(columns=None, trial_ids=None, samples_path=up.SAMPLES_FILE, trials_path=up.POSITION_TRIALS_FILE):
+    """
+    The wide positions table (the rows of positions_latest.parquet), joined on read.
+    Only the columns asked for are read from each table.
+    """
+    columns = list(POSITION_COLUMNS if columns is None else columns)
+    unknown = set(columns) - set(POSITION_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown positions columns: {sorted(unknown)}")
+    sample_cols = [col for col in SAMPLE_COLUMNS if col in columns or col == "trialDocId"
+                   or (col in ("x", "y") and "Distance_to_target" in columns)]
+    trial_cols = [col for col in TRIAL_COLUMNS if col in columns or col == "trialDocId"
+                  or (col in ("Target_position_x", "Target_position_y") and "Distance_to_target" in columns)]
+    samples = read_samples(samples_path, columns=sample_cols, trial_ids=trial_ids)
+    trials = read_trials(trials_path, columns=trial_cols, trial_ids=trial_ids)
+    return join_positions(samples, trials, columns)
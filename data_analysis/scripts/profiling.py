@@ -0,0 +1,215 @@
+"""
+Opt-in timing of the pipeline stages and of the submovement hot paths.
+
+Set FITTS_PROFILE before running any script (run_pipeline.py --profile does it for
+every stage):
+
+    FITTS_PROFILE=1            wall time, CPU time, peak RSS and rows per stage/function
+    FITTS_PROFILE=cprofile     the same, plus a cProfile dump (<report>.prof)
+    FITTS_PROFILE=pyinstrument the same, plus a pyinstrument report (<report>.html), if installed
+
+At exit the script writes <script>_<timestamp>_<pid>.json and .csv to PROFILE_DIR.
+Scripts mark their stages with `with stage("name") as s: ...; s.rows = n`, and
+functions are decorated with @timed. When profiling is off, stage() returns a
+shared no-op object and @timed costs one flag check per call.
+
+Times are inclusive (a function called inside a stage counts in both). Only the
+process that calls enable() reports: calls made in process-pool workers are not
+collected, run with --workers 1 to get per-function numbers.
+"""
+
+import atexit
+import csv
+import functools
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+import utils_paths as up
+
+PROFILE_ENV = "FITTS_PROFILE"
+PROFILERS = ("cprofile", "pyinstrument")
+
+_enabled = False
+_records = {}
+_profiler = None
+_profiler_kind = None
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, or None if it can't be read."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class _Record:
+    __slots__ = ("name", "kind", "calls", "wall_s", "cpu_s", "rows", "peak_rss_mb")
+
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.calls = 0
+        self.wall_s = 0.0
+        self.cpu_s = 0.0
+        self.rows = 0
+        self.peak_rss_mb = None
+
+    def add(self, wall, cpu, rows):
+        self.calls += 1
+        self.wall_s += wall
+        self.cpu_s += cpu
+        self.rows += rows or 0
+        self.peak_rss_mb = peak_rss_mb()
+
+    def as_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+def _record(name, kind):
+    rec = _records.get(name)
+    if rec is None:
+        rec = _records[name] = _Record(name, kind)
+    return rec
+
+
+class _Stage:
+    """Times a `with` block; set .rows inside it to record how many rows it processed."""
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, *exc):
+        _record(self.name, "stage").add(time.perf_counter() - self._wall,
+                                        time.process_time() - self._cpu, self.rows)
+        return False
+
+
+class _NoStage:
+    rows = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name, rows=None):
+    """Context manager timing one stage of a script (a no-op when profiling is off)."""
+    return _Stage(name, rows) if _enabled else _NO_STAGE
+
+
+def _len_of_first(args, kwargs, result):
+    try:
+        return len(args[0])
+    except (IndexError, TypeError):
+        return None
+
+
+def timed(fn=None, *, name=None, rows=_len_of_first):
+    """
+    Decorator recording every call of a function when profiling is on.
+
+    rows(args, kwargs, result) gives the rows processed by a call; by default the
+    length of the first argument.
+    """
+    if fn is None:
+        return functools.partial(timed, name=name, rows=rows)
+    label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return fn(*args, **kwargs)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        result = fn(*args, **kwargs)
+        _record(label, "function").add(time.perf_counter() - wall, time.process_time() - cpu,
+                                       rows(args, kwargs, result))
+        return result
+    return wrapper
+
+
+def enabled():
+    return _enabled
+
+
+def enable(profiler=None, report_dir=up.PROFILE_DIR):
+    """
+    Start recording; the report is written to report_dir at exit.
+    profiler: None, "cprofile" or "pyinstrument" to also dump a call profile.
+    """
+    global _enabled, _profiler, _profiler_kind
+    if _enabled:
+        return
+    _enabled = True
+    if profiler == "cprofile":
+        import cProfile
+        _profiler = cProfile.Profile()
+        _profiler.enable()
+    elif profiler == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:  # pyinstrument is optional; keep the stage/function report
+            print("pyinstrument is not installed, writing the stage report only")
+        else:
+            _profiler = Profiler()
+            _profiler.start()
+    _profiler_kind = profiler if _profiler is not None else None
+    atexit.register(write_report, report_dir)
+
+
+def write_report(report_dir=up.PROFILE_DIR):
+    """Write the records (and the profiler dump, if any) as <script>_<timestamp>_<pid>.*; returns the JSON path."""
+    report_dir = Path(report_dir)
+    report_dir.mkdir(parents=True, exist_ok=True)
+    script = Path(sys.argv[0]).stem or "python"
+    stem = report_dir / f"{script}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{os.getpid()}"
+
+    rows = [rec.as_dict() for rec in _records.values()]
+    report = {
+        "script": script,
+        "argv": sys.argv[1:],
+        "peak_rss_mb": peak_rss_mb(),
+        "records": rows,
+    }
+    with open(f"{stem}.json", "w") as f:
+        json.dump(report, f, indent=1)
+    with open(f"{stem}.csv", "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(_Record.__slots__))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    if _profiler_kind == "cprofile":
+        _profiler.disable()
+        _profiler.dump_stats(f"{stem}.prof")
+    elif _profiler_kind == "pyinstrument":
+        _profiler.stop()
+        Path(f"{stem}.html").write_text(_profiler.output_html())
+
+    print(f"Profile report: {stem}.json")
+    return f"{stem}.json"
+
+
+_mode = os.environ.get(PROFILE_ENV, "").strip().lower()
+if _mode and _mode not in ("0", "false", "no"):
+    enable(_mode if _mode in PROFILERS else None)
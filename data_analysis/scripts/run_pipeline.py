@@ -0,0 +1,212 @@
+"""
+Runs the analysis scripts in order, skipping the stages whose inputs did not change.
+
+    0_fetchdata_firestore.py -> 1_flatten_data.py -> 2_movement_analysis.py -> 3_1_analysis.py
+                                                                             -> 3_2_fittsAnalysis.py
+
+Each stage declares the files it reads and writes (utils_paths constants). After a
+stage runs, the content hash of its inputs is stored in PIPELINE_STATE_FILE; next
+time the stage only runs again if one of those hashes changed or an output is
+missing. The hash of a file is only recomputed when its mtime or size changed, so
+an up-to-date pipeline costs a few stat() calls. A stage that rewrites an output
+with the same content does not trigger the stages after it.
+
+With --fetch-args "--incremental" the fetch stage only downloads the documents
+uploaded since the last fetch (as deltas) and then runs `0_fetchdata_firestore.py
+compact`, so the snapshot the flatten stage reads includes them.
+
+New data: the flatten stage always rewrites the full tables from the latest raw
+snapshot, and 2_movement_analysis.py only computes the trials that are not in its
+result cache (submovement_cache.py), i.e. the new ones. The 3_x stages aggregate
+over everyone and are rerun in full.
+
+Usage: python run_pipeline.py [--fetch] [--force STAGE ...] [--only STAGE ...] [--dry-run] [--profile [cprofile|pyinstrument]]
+"""
+
+import argparse
+from dataclasses import dataclass, field
+import hashlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+import utils_paths as up
+from profiling import PROFILE_ENV, PROFILERS
+
+SCRIPTS_DIR = Path(__file__).parent
+STATE_FILE = Path(up.PIPELINE_STATE_FILE)
+
+
+def _latest_raw(prefix):
+    """Latest raw snapshot of a collection (the one 1_flatten_data.py reads)."""
+    def paths():
+        snapshots = sorted(Path(up.RAW_DATA).glob(f"{prefix}_*.parquet"))
+        return [str(snapshots[-1])] if snapshots else []
+    return paths
+
+
+@dataclass
+class Stage:
+    name: str
+    script: str
+    inputs: List = field(default_factory=list)   # paths, or callables returning paths
+    outputs: List[str] = field(default_factory=list)
+    args: List[str] = field(default_factory=list)
+
+    def input_paths(self):
+        paths = []
+        for item in self.inputs:
+            paths.extend(item() if isinstance(item, Callable) else [item])
+        return paths
+
+
+STAGES = [
+    Stage("fetch", "0_fetchdata_firestore.py",
+          outputs=[]),
+    Stage("flatten", "1_flatten_data.py",
+          inputs=[_latest_raw("trials"), _latest_raw("pre_trials")],
+          outputs=[up.TRIALS_FILE, up.TRIALS_FILE_CSV, up.PRE_TRIALS_FILE, up.ERROR_RATES_FILE_CSV,
+                   up.SAMPLES_FILE, up.POSITION_TRIALS_FILE, up.POSITIONS_FILE]),
+    Stage("movement", "2_movement_analysis.py",
+          inputs=[up.SAMPLES_FILE, up.POSITION_TRIALS_FILE],
+          outputs=[up.SEGMENTS_FILE, up.KINEMATICS_COMPACT_FILE, up.SEGMENTS_DATASET]),
+    Stage("analysis", "3_1_analysis.py",
+          inputs=[up.TRIALS_FILE, up.SEGMENTS_FILE],
+          outputs=[up.ANALYSIS_FILE_1]),
+    Stage("fitts", "3_2_fittsAnalysis.py",
+          inputs=[up.TRIALS_FILE_CSV, up.ERROR_RATES_FILE_CSV],
+          outputs=[str(Path(up.PROCESSED_CSV_DATA) / "fitts_conditions_summary.csv")]),
+]
+
+
+def file_hash(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprint(path, known=None):
+    """{mtime_ns, size, sha256} of a file; the hash is reused from `known` if mtime and size match."""
+    st = os.stat(path)
+    if known and known.get("mtime_ns") == st.st_mtime_ns and known.get("size") == st.st_size:
+        return known
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": file_hash(path)}
+
+
+def load_state():
+    if STATE_FILE.exists():
+        return json.loads(STATE_FILE.read_text())
+    return {"stages": {}}
+
+
+def save_state(state):
+    STATE_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = STATE_FILE.with_suffix(".tmp")
+    tmp.write_text(json.dumps(state, indent=2))
+    os.replace(tmp, STATE_FILE)
+
+
+def stale_reason(stage, state):
+    """Why the stage has to run, or None if it is up to date."""
+    missing = [p for p in stage.outputs if not Path(p).exists()]
+    if missing:
+        return f"missing {Path(missing[0]).name}"
+    paths = stage.input_paths()
+    absent = [p for p in paths if not Path(p).exists()]
+    if absent:
+        return f"missing input {Path(absent[0]).name}"
+    recorded = state["stages"].get(stage.name)
+    if recorded is None:
+        return "never run"
+    if sorted(recorded) != sorted(paths):
+        return "inputs moved"
+    for p in paths:
+        if fingerprint(p, recorded[p])["sha256"] != recorded[p]["sha256"]:
+            return f"{Path(p).name} changed"
+    return None
+
+
+def run_stage(stage, profile=None):
+    env = dict(os.environ, MPLBACKEND="Agg")  # 3_2 makes plots; never open windows
+    if profile:
+        env[PROFILE_ENV] = profile  # each script writes its report to PROFILE_DIR at exit
+    cmd = [sys.executable, stage.script, *stage.args]
+    return subprocess.run(cmd, cwd=SCRIPTS_DIR, env=env).returncode
+
+
+def main(argv=None):
+    names = [s.name for s in STAGES]
+    parser = argparse.ArgumentParser(description="Run the analysis stages whose inputs changed")
+    parser.add_argument("--fetch", action="store_true",
+                        help="Also pull new data from Firestore first (skipped by default)")
+    parser.add_argument("--fetch-args", default="", metavar="ARGS",
+                        help="Extra arguments for 0_fetchdata_firestore.py, e.g. \"--workers 8\"")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Processes for 2_movement_analysis.py (default: 1)")
+    parser.add_argument("--force", nargs="+", choices=names, default=[],
+                        help="Run these stages even if they are up to date")
+    parser.add_argument("--only", nargs="+", choices=names, default=None,
+                        help="Only consider these stages")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Print what would run and exit")
+    parser.add_argument("--profile", nargs="?", const="1", choices=["1", *PROFILERS], default=None,
+                        help="Write a stage/function timing report per script to PROFILE_DIR, "
+                             "optionally with a cProfile or pyinstrument dump")
+    args = parser.parse_args(argv)
+
+    stages = {s.name: s for s in STAGES}
+    stages["fetch"].args = shlex.split(args.fetch_args)
+    stages["movement"].args = ["--workers", str(args.workers)]
+
+    state = load_state()
+    report = []
+    for stage in STAGES:
+        if args.only is not None and stage.name not in args.only:
+            continue
+        if stage.name == "fetch":
+            if not (args.fetch or stage.name in args.force):
+                report.append((stage.name, "skipped (no --fetch)", 0.0))
+                continue
+            reason = "requested"
+        else:
+            reason = "forced" if stage.name in args.force else stale_reason(stage, state)
+        if reason is None:
+            report.append((stage.name, "up to date", 0.0))
+            continue
+        if args.dry_run:
+            report.append((stage.name, f"would run ({reason})", 0.0))
+            continue
+
+        print(f"[{stage.name}] running {stage.script} ({reason})")
+        start = time.perf_counter()
+        code = run_stage(stage, args.profile)
+        if code == 0 and stage.name == "fetch" and "--incremental" in stage.args:
+            # 1_flatten_data.py only reads the latest snapshot: merge the new deltas into one
+            print(f"[{stage.name}] merging the deltas (compact)")
+            code = run_stage(Stage("compact", stage.script, args=["compact"]), args.profile)
+        elapsed = time.perf_counter() - start
+        if code != 0:
+            report.append((stage.name, f"FAILED (exit {code})", elapsed))
+            break
+
+        recorded = state["stages"].get(stage.name, {})
+        state["stages"][stage.name] = {p: fingerprint(p, recorded.get(p)) for p in stage.input_paths()}
+        save_state(state)
+        report.append((stage.name, f"ran ({reason})", elapsed))
+
+    print(f"\n{'Stage':<10} {'Status':<48} Time")
+    for name, status, elapsed in report:
+        print(f"{name:<10} {status:<48} {elapsed:6.2f}s")
+    print(f"Total: {sum(e for _, _, e in report):.2f}s")
+    if any(status.startswith("FAILED") for _, status, _ in report):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+On-disk cache of analyze_trial_positions results.
+
+Trials never change once uploaded, so the result of the submovement analysis of a
+trial only depends on its (t, x, y) samples and on the analysis settings. The key
+is a hash of both: the sample arrays, the ResampleCfg and Thresholds values and
+the filter cut-off. Changing a threshold gives every trial a new key, the old
+entries are simply not read anymore and are dropped by the size cap
+(least recently used first).
+
+One pickle per trial in SUBMOVEMENT_CACHE_DIR, written atomically so several
+runs can share the directory. ResultCache is the same store for any picklable
+result; 3_2_fittsAnalysis.py keeps its statistical tests in one.
+"""
+
+from dataclasses import asdict
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+import numpy as np
+import utils_paths as up
+import submovements as sm
+
+# Bump when the analysis code changes in a way the settings don't capture
+CACHE_VERSION = 1
+DEFAULT_MAX_MB = 512
+
+
+def trial_key(df_trial, resample_cfg, thresholds):
+    """Hash of a trial's (t, x, y) samples and the settings it is analyzed with."""
+    h = hashlib.sha256()
+    settings = {
+        "version": CACHE_VERSION,
+        "resample": asdict(resample_cfg),
+        "thresholds": asdict(thresholds),
+        "filter_cutoff_hz": sm.FILTER_CUTOFF_HZ,
+    }
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    for col in ("t", "x", "y"):
+        values = np.ascontiguousarray(df_trial[col].to_numpy(dtype=np.float64))
+        h.update(len(values).to_bytes(8, "little"))
+        h.update(values.tobytes())
+    return h.hexdigest()
+
+
+class ResultCache:
+    """Pickled results by key in cache_dir, capped at max_mb by trim (least recently used first)."""
+
+    label = "Result cache"
+
+    def __init__(self, cache_dir, max_mb=DEFAULT_MAX_MB):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}.pkl"
+
+    def get(self, key):
+        """Cached result for key, or None. A hit refreshes the entry's LRU position."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        os.utime(path)  # mtime is the last-use time for eviction
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+
+    def trim(self):
+        """Delete least recently used entries until the cache fits in max_mb. Returns how many."""
+        entries = []
+        for path in self.cache_dir.glob("*.pkl"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        self.evicted += removed
+        return removed
+
+    def summary(self):
+        return f"{self.label}: {self.hits} hits, {self.misses} misses, {self.evicted} evicted"
+
+
+class SubmovementCache(ResultCache):
+    label = "Submovement cache"
+
+    def __init__(self, cache_dir=up.SUBMOVEMENT_CACHE_DIR, max_mb=DEFAULT_MAX_MB):
+        super().__init__(cache_dir, max_mb)
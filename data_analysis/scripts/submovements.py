@@ -13,7 +13,13 @@ from dataclasses import dataclass
 from typing import List, Dict, Optional, Tuple
 import numpy as np
 import pandas as pd
-from scipy.signal import butter, filtfilt
+from functools import lru_cache
+from profiling import timed
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional; detect_submovements falls back to NumPy
+    njit = None
 
 @dataclass
 class Thresholds:
@@ -41,12 +47,159 @@ class ResampleCfg:
     smooth_poly: Optional[int] = None   # reserved if you add savgol
     gap_ms: int = 40  # gap threshold for resampling (ms); if gap > this, inject zero-velocity boundary
 
-def butter_lowpass_filter(data, cutoff, fs, order=4):
+FILTER_CUTOFF_HZ = 10  # low-pass cut-off applied to x,y before differentiating
+
+@lru_cache(maxsize=None)
+def butter_lowpass_coeffs(cutoff, fs, order=4) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (b, a) of a Butterworth low-pass, designed once per (cutoff, fs, order).
+    The cached arrays are read-only.
+    """
+    from scipy.signal import butter  # scipy.signal takes ~1 s to import; only the analysis needs it
+
     nyq = 0.5 * fs
     normal_cutoff = cutoff / nyq
     b, a = butter(order, normal_cutoff, btype='low', analog=False)
-    return filtfilt(b, a, data)
+    b.setflags(write=False)
+    a.setflags(write=False)
+    return b, a
+
+@timed
+def butter_lowpass_filter(data, cutoff, fs, order=4):
+    """
+    Zero-phase low-pass along axis 0, so x and y can be filtered together as an (n, 2) array.
+    """
+    from scipy.signal import filtfilt
+
+    b, a = butter_lowpass_coeffs(cutoff, fs, order)
+    return filtfilt(b, a, data, axis=0)
 
+@timed(rows=lambda args, kwargs, result: sum(len(sig) for sig in args[0]))
+def butter_lowpass_filter_batch(signals: List[np.ndarray], cutoff, fs, order=4,
+                                chunk_size: int = 256) -> List[np.ndarray]:
+    """
+    butter_lowpass_filter over many signals of different lengths at once.
+
+    signals: list of (n_i,) or (n_i, k) arrays. Signals are sorted by length and
+    taken in chunks; in each chunk every column is odd-extended exactly like
+    filtfilt does, right-padded to the chunk's longest row and run through lfilter
+    as one 2-D array. The backward pass works on each row's own reversed samples,
+    so the padding never reaches them and the result equals the per-signal filter.
+    """
+    from scipy.signal import lfilter, lfilter_zi
+
+    b, a = butter_lowpass_coeffs(cutoff, fs, order)
+    padlen = 3 * max(len(a), len(b))
+    zi = lfilter_zi(b, a)
+
+    rows, owners = [], []
+    for k, sig in enumerate(signals):
+        sig = np.asarray(sig, dtype=float)
+        if sig.shape[0] <= padlen:
+            raise ValueError(f"The length of the input vector x must be greater than padlen, which is {padlen}.")
+        cols = sig.reshape(sig.shape[0], -1)
+        for c in range(cols.shape[1]):
+            rows.append(cols[:, c])
+            owners.append(k)
+
+    filtered = [None] * len(rows)
+    order_by_len = sorted(range(len(rows)), key=lambda r: len(rows[r]))
+    for c0 in range(0, len(order_by_len), chunk_size):
+        chunk = order_by_len[c0:c0 + chunk_size]
+        lens = np.array([len(rows[r]) + 2 * padlen for r in chunk])
+        ext = np.zeros((len(chunk), lens.max()))
+        for j, r in enumerate(chunk):
+            x = rows[r]
+            # odd extension, as scipy.signal.filtfilt(padtype='odd')
+            ext[j, :lens[j]] = np.concatenate((2 * x[0:1] - x[padlen:0:-1], x,
+                                               2 * x[-1:] - x[-2:-(padlen + 2):-1]))
+
+        # Per-row reversal of the valid samples (padding maps to index 0 and is zeroed)
+        rev = lens[:, None] - 1 - np.arange(ext.shape[1])[None, :]
+        pad = rev < 0
+        rev = np.maximum(rev, 0)
+
+        y, _ = lfilter(b, a, ext, axis=-1, zi=zi * ext[:, :1])
+        y = np.take_along_axis(y, rev, axis=1)
+        y[pad] = 0.0
+        y, _ = lfilter(b, a, y, axis=-1, zi=zi * y[:, :1])
+        y = np.take_along_axis(y, rev, axis=1)
+        for j, r in enumerate(chunk):
+            filtered[r] = y[j, padlen:lens[j] - padlen]
+
+    out, start = [], 0
+    for sig in signals:
+        sig = np.asarray(sig)
+        ncols = 1 if sig.ndim == 1 else sig.shape[1]
+        cols = filtered[start:start + ncols]
+        start += ncols
+        out.append(cols[0] if sig.ndim == 1 else np.column_stack(cols))
+    return out
+
+def _resample_arrays(t: np.ndarray, x: np.ndarray, y: np.ndarray,
+                     dt_ms: int, gap_ms: int) -> Dict[str, np.ndarray]:
+    """
+    Array core of resample_uniform. t must be sorted and start at the trial origin.
+    Returns the output columns as ndarrays.
+    """
+    # Segment the time series by gaps in the original sampling (runs of equal segment id)
+    seg_starts, seg_ends, _, _ = run_length_encode(np.cumsum(np.diff(t, prepend=t[0]) > gap_ms))
+
+    # Uniform grid and the grid slice [lo, hi) covered by each segment
+    grid = np.arange(t[0], t[-1], dt_ms)
+    lo = np.searchsorted(grid, t[seg_starts], side='left')
+    hi = np.searchsorted(grid, t[seg_ends], side='right')
+
+    m = len(grid)
+    out_x = np.full(m, np.nan)
+    out_y = np.full(m, np.nan)
+    segment_id = np.full(m, np.nan)
+    # Grid points that fall on an original sample are not imputed (gaps stay False)
+    imputed = np.zeros(m, dtype=bool)
+    not_sampled = ~np.isin(grid, t)
+
+    # Interpolate x,y only inside each segment (one pass over the segments)
+    for s, (i0, i1, g0, g1) in enumerate(zip(seg_starts, seg_ends, lo, hi)):
+        if g1 <= g0:
+            continue
+        tu = grid[g0:g1]
+        out_x[g0:g1] = np.interp(tu, t[i0:i1 + 1], x[i0:i1 + 1])
+        out_y[g0:g1] = np.interp(tu, t[i0:i1 + 1], y[i0:i1 + 1])
+        imputed[g0:g1] = not_sampled[g0:g1]
+        segment_id[g0:g1] = s
+
+    # A boundary is a change of segment id between two consecutive covered grid points;
+    # the first one found is not flagged
+    seg_change = np.zeros(m, dtype=bool)
+    if m > 1:
+        d = np.diff(segment_id)
+        seg_change[1:] = (d != 0) & ~np.isnan(d)
+    boundary_idx = np.flatnonzero(seg_change & ~np.isnan(segment_id))
+    gap_boundary = np.zeros(m, dtype=bool)
+    gap_boundary[boundary_idx[1:]] = True
+
+    # Grid points inside gaps take the next valid position, trailing ones the last
+    for col in (out_x, out_y):
+        valid = ~np.isnan(col)
+        if valid.all() or not valid.any():
+            continue
+        pos = np.arange(m)
+        nxt = np.minimum.accumulate(np.where(valid, pos, m)[::-1])[::-1]
+        prv = np.maximum.accumulate(np.where(valid, pos, -1))
+        fill = np.where(nxt < m, nxt, prv)
+        col[~valid] = col[fill[~valid]]
+
+    return {
+        't': grid,
+        'x': out_x,
+        'y': out_y,
+        'imputed': imputed,
+        'gap_fill': np.full(m, 'none', dtype=object),
+        'segment_id': segment_id,
+        'gap_boundary': gap_boundary,
+    }
+
+@timed
 def resample_uniform(
         df: pd.DataFrame, 
         dt_ms: int = 3, 
@@ -55,97 +208,25 @@ def resample_uniform(
     """
     df: DataFrame with columns ['t','x','y'] in ms, px
     Returns DF with uniform timeline (t0..tN step dt), interpolated x,y.
+
+    Grid points are placed per gap-free segment with np.searchsorted, so the cost
+    is linear in the grid size instead of segments x grid.
     """
     if df.empty:
         return df.copy()
 
-    df = df[['t','x','y']].sort_values('t').reset_index(drop=True)
-    if df['t'].iloc[0] > 0:
-        first_row = df.iloc[[0]].copy()
-        first_row['t'] = 0
-        df = pd.concat([first_row, df], ignore_index=True)
-
-
-    # Detect gaps in the original time series
-    dt = df['t'].diff().fillna(0.0)
-    is_gap = dt > gap_ms
-
-    #print(f"Detecting gaps in {df} \n dt - {dt} \n is_gap - {is_gap}")
+    df = df[['t','x','y']].sort_values('t')
+    t = df['t'].to_numpy()
+    x = df['x'].to_numpy()
+    y = df['y'].to_numpy()
+    if t[0] > 0:
+        t = np.concatenate(([0], t)).astype(t.dtype, copy=False)
+        x = np.concatenate((x[:1], x))
+        y = np.concatenate((y[:1], y))
 
-    # Segment the time series by gaps
-    seg_id = is_gap.cumsum()
-    df_segs = df.copy()
-    df_segs['segment_id'] = seg_id
-
-    #print(f"Detected {len(df_segs['segment_id'].unique())} segments in {df_segs}")
-
-    # Build uniform resampling 
-    t0, tN = df['t'].iloc[0], df['t'].iloc[-1]
-    grid = np.arange(t0, tN , dt_ms)
-    out = pd.DataFrame({'t': grid})
-    out['x'] = np.nan
-    out['y'] = np.nan
-    out['imputed'] = False  # will mark where we interpolate
-    out['gap_fill'] = 'none'  # will mark where we fill gaps
-    out['segment_id'] = np.nan  # will fill segment id later
-    out['gap_boundary'] = False  # will mark where we have gap boundaries
-
-    #print(f"Resampling {len(df)} positions to uniform grid of {len(out)} points - {out}")
-
-    # For each segment, interpolate x,y only inside the segment
-    for s in df_segs['segment_id'].unique():
-        seg_df= df_segs[df_segs['segment_id'] == s] # Return only the current segment
-        t_start, t_end = seg_df['t'].iloc[0], seg_df['t'].iloc[-1] # Get start and end time of the segment -- Probably this could have done with the indexes
-
-        #print(f"Segment {s}: Interpolating from {t_start} to {t_end} with \n {seg_df}")
-
-        t_uniform = out.loc[(out['t'] >= t_start) & (out['t'] <= t_end), 't'].values
-        x_interp = np.interp(t_uniform, seg_df['t'], seg_df['x'])
-        y_interp = np.interp(t_uniform, seg_df['t'], seg_df['y'])
-        imputed = ~np.isin(t_uniform, seg_df['t'].values)
-        
-        out.loc[(out['t'] >= t_start) & (out['t'] <= t_end), 'x'] = x_interp
-        out.loc[(out['t'] >= t_start) & (out['t'] <= t_end), 'y'] = y_interp
-        out.loc[(out['t'] >= t_start) & (out['t'] <= t_end), 'imputed'] = imputed
-        out.loc[(out['t'] >= t_start) & (out['t'] <= t_end), 'segment_id'] = s
-
-        #print(f"Segment {s}: Interpolated {len(t_uniform)} points from {t_start} to {t_end} \n {out.loc[(out['t'] >= t_start) & (out['t'] <= t_end)]}")
-
-    seg_change = out['segment_id'].diff().fillna(0) != 0 # Detect segment changes
-    boundary_idx = np.where(seg_change & (~out['segment_id'].isna()))[0]
-    #print(f"Detected {len(boundary_idx)} gap boundaries at indexes {boundary_idx}")
-    if len(boundary_idx) > 0:
-        boundary_idx = boundary_idx[1:] if len(boundary_idx) > 1 else []
-    for bi in boundary_idx:
-        out.loc[bi, 'gap_boundary'] = True
-
-    #print(f"Current out {out}")
-    nan_mask = out['x'].isna()
-    xf = out['x'].copy(); yf = out['y'].copy()
-    xf = xf.ffill(); yf = yf.ffill()
-    xb = out['x'].copy(); yb = out['y'].copy()
-    xb = xb.bfill(); yb = yb.bfill()
-    
-    filled_x = xf.where(~nan_mask, xb)
-    filled_y = yf.where(~nan_mask, yb)
-
-    out.loc[nan_mask, 'x'] = filled_x[nan_mask]
-    out.loc[nan_mask, 'y'] = filled_y[nan_mask]
-    #out.loc[nan_mask, 'gap_fill'] = policy
-
-    """if len(boundary_idx) > 0:
-        pad_steps = max(1, int(np.round(plateau_pad_ms / dt_ms)))
-        # Fuerza plateau (repetición) en una pequeña ventana alrededor de cada boundary
-        for bi in boundary_idx:
-            l0 = max(0, bi - pad_steps)
-            l1 = min(len(out)-1, bi + pad_steps)
-            # fijar a la posición en el límite para crear meseta de v≈0
-            out.loc[l0:l1, 'x'] = out.loc[bi, 'x']
-            out.loc[l0:l1, 'y'] = out.loc[bi, 'y']
-            #out.loc[l0:l1, 'gap_fill'] = 'zero_plateau'"""
-    out[['x','y']] = out[['x','y']].ffill().bfill()
-    return out
+    return pd.DataFrame(_resample_arrays(t, x, y, dt_ms=dt_ms, gap_ms=gap_ms))
 
+@timed
 def compute_kinematics(df: pd.DataFrame, dt_ms: int = 5, smooth_window: int=5) -> pd.DataFrame:
     """
     Adds speed (px/ms) and acceleration (px/ms^2) columns.
@@ -169,6 +250,120 @@ def compute_kinematics(df: pd.DataFrame, dt_ms: int = 5, smooth_window: int=5) -
 
 
 
+def _scan_segments_loop(is_type, zero_like, accel_sign, min_len, flip_end):
+    """
+    Sample-by-sample state machine over contiguous arrays (compiled with numba when
+    available). A submovement starts on a sample labelled with the current type and
+    runs until speed ~0 or the acceleration sign has flipped flip_end times.
+    Returns (starts, ends) with exclusive ends.
+    """
+    n = len(is_type)
+    starts = np.empty(n, dtype=np.int64)
+    ends = np.empty(n, dtype=np.int64)
+    n_segs = 0
+    i = 0
+    while i < n:
+        if not is_type[i]:
+            i += 1
+            continue
+        start = i
+        acc_flips = 0
+        last_sign = accel_sign[i]
+        i += 1
+        while i < n and not zero_like[i]:
+            cur = accel_sign[i]
+            if not np.isnan(last_sign) and not np.isnan(cur) and cur != last_sign:
+                acc_flips += 1
+                if acc_flips >= flip_end:
+                    break
+            if not np.isnan(cur):
+                last_sign = cur
+            i += 1
+        end = i
+        if end - start >= min_len:
+            starts[n_segs] = start
+            ends[n_segs] = end
+            n_segs += 1
+            i -= 1
+        i += 1
+    return starts[:n_segs], ends[:n_segs]
+
+def _scan_segments_numpy(is_type, zero_like, accel_sign, min_len, flip_end):
+    """
+    Same result as _scan_segments_loop without a per-sample Python loop.
+
+    Sign flips are located once for the whole trial (a flip is a valid sign that
+    differs from the previous valid one); for each candidate start the end is the
+    first zero-speed sample or the flip_end-th flip after it, both found with
+    searchsorted, so the loop only visits candidate starts.
+    """
+    n = len(is_type)
+    pos = np.arange(n)
+    valid = ~np.isnan(accel_sign)
+    prev_valid = np.maximum.accumulate(np.where(valid, pos, -1))
+    prev_before = np.concatenate(([-1], prev_valid[:-1]))
+    flip = valid & (prev_before >= 0) & (accel_sign != accel_sign[np.maximum(prev_before, 0)])
+
+    candidates = np.flatnonzero(is_type)
+    zeros = np.flatnonzero(zero_like)
+    flips = np.flatnonzero(flip)
+    k = max(int(flip_end), 1)
+
+    starts, ends = [], []
+    i = 0
+    while True:
+        c = np.searchsorted(candidates, i)
+        if c >= len(candidates):
+            break
+        start = candidates[c]
+        z = np.searchsorted(zeros, start, side='right')
+        end = zeros[z] if z < len(zeros) else n
+        f = np.searchsorted(flips, start, side='right')
+        # A flip whose previous valid sign lies before the start is not seen by the scan
+        if f < len(flips) and prev_before[flips[f]] < start:
+            f += 1
+        if f + k - 1 < len(flips):
+            end = min(end, flips[f + k - 1])
+        if end - start >= min_len:
+            starts.append(start)
+            ends.append(end)
+            i = end
+        else:
+            i = end + 1
+    return np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+
+if njit is not None:
+    _scan_segments = njit(cache=True)(_scan_segments_loop)
+else:
+    _scan_segments = _scan_segments_numpy
+
+def _range_argmax(values: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """
+    Index of the max of values[start:end+1] for every (start, end) pair, first one on ties.
+    Ranges may overlap. One stable sort of the samples plus one np.maximum.reduceat.
+    """
+    n = len(values)
+    # rank of each sample when ordered by value, earlier samples ranking higher among equals,
+    # so the max rank inside a range is its first maximum
+    order = np.lexsort((-np.arange(n), values))
+    rank = np.empty(n + 1, dtype=np.int64)
+    rank[order] = np.arange(n)
+    rank[n] = -1  # sentinel so end+1 == n is a valid reduceat index
+    bounds = np.column_stack((starts, ends + 1)).ravel()
+    return order[np.maximum.reduceat(rank, bounds)[::2]]
+
+
+def _nearest_index(t: np.ndarray, value: float) -> int:
+    """Index of the sample of the (increasing) time grid t closest to value, first one on ties."""
+    j = int(np.searchsorted(t, value))
+    if j == 0:
+        return 0
+    if j == len(t):
+        return j - 1
+    return j - 1 if abs(t[j-1] - value) <= abs(t[j] - value) else j
+
+
+@timed
 def detect_submovements(dfk: pd.DataFrame, thr: Thresholds, dt_ms: int) -> List[Dict]:
     """
     Heuristic segmentation:
@@ -183,34 +378,21 @@ def detect_submovements(dfk: pd.DataFrame, thr: Thresholds, dt_ms: int) -> List[
 
     # Inject zero-speed markers where large gaps were present in the original (if available)
     # We assume dfk has uniform resampling. To emulate 'gaps', check consecutive original times if provided.
-    zero_like = dfk['v'] <= thr.epsilon_speed
+    t = dfk['t'].to_numpy(dtype=float)
+    v = dfk['v'].to_numpy(dtype=float)
+    zero_like = v <= thr.epsilon_speed
     # Build acceleration sign sequence
-    accel_sign = np.sign(dfk['a'].to_numpy())
+    accel_sign = np.sign(dfk['a'].to_numpy(dtype=float))
     accel_sign[accel_sign == 0] = np.nan  # treat zeros as missing for sign-flip counting
 
     # Speed-based candidate masks
-    slow_mask = dfk['v'] >= thr.slow_speed_min
-    fast_mask = dfk['v'] >= thr.fast_speed_min
+    slow_mask = v >= thr.slow_speed_min
+    fast_mask = v >= thr.fast_speed_min
 
     # Enforce min durations by run-length filtering
     min_len_slow = int(np.ceil(thr.slow_min_duration_ms / dt_ms))
     min_len_fast = int(np.ceil(thr.fast_min_duration_ms / dt_ms))
 
-    
-    
-    def keep_min_len(mask, min_len, used_mask : np.array):
-        mask = mask.copy().to_numpy(dtype=bool)
-        runs = _label_runs(pd.Series(mask), used_mask)
-        for s,e in runs:
-            #print(f'Minimum length authorized {s} - {e} -- muinimum lengths :{min_len}')
-            if (e - s + 1) < min_len:
-                #print(f'Non authorized')
-                mask[s:e+1] = False
-        return pd.Series(mask, index=dfk.index)
-
-
-    #print(f"{dfk.loc[fast_mask, ['t', 'v']] }")
-
     # Initial segmentation by any-threshold pass (label preference: fast > slow > none)
     seg_type = np.array(["none"]*n, dtype=object) # overrides slow where both hold
 
@@ -225,87 +407,48 @@ def detect_submovements(dfk: pd.DataFrame, thr: Thresholds, dt_ms: int) -> List[
 
     # Now form segments ensuring end conditions (speed ~0 or accel sign changes twice)
     segments = []
-    
-    
-
-    used_mask = np.zeros(len(dfk), dtype=bool)
-
-
-    #slow_mask = keep_min_len(slow_mask, min_len_slow)
-    #fast_mask = keep_min_len(fast_mask, min_len_fast)
-
-    
-    #seg_type[slow_mask.to_numpy()] = "slow"
-    #seg_type[fast_mask.to_numpy()] = "rapid" 
-
     for mmov in movements:
         mtype = mmov['ttype']
         mmask = mmov['mask']    
         mmin_len = mmov['min_len']
-        nmask = keep_min_len(mmask, mmin_len, used_mask)
-        seg_type[nmask.to_numpy(dtype=bool)] = mtype
-        
-        #print(f'Type {mtype} with min length {mmin_len}')
-        i = 0
-        while i < n:
-            #if seg_type[i] == "none":
-            if seg_type[i] != mtype:
-                i += 1
-                continue
-            ttype = seg_type[i]
-            start = i
-            acc_flips = 0
-            last_sign = np.sign(dfk['a'].iloc[i]) or np.nan
-
-            i += 1
-            #while i < n and seg_type[i] == ttype:
-            while i < n and zero_like.iloc[i] == False:
-                # end conditions
-                if dfk['v'].iloc[i] <= thr.epsilon_speed:
-                    break
-                # acceleration sign flip logic
-                cur = np.sign(dfk['a'].iloc[i]) or np.nan
-                if not np.isnan(last_sign) and not np.isnan(cur) and np.sign(cur) != np.sign(last_sign):
-                    acc_flips += 1
-                    if acc_flips >= thr.accel_sign_flip_end:
-                        break
-                if not np.isnan(cur):
-                    last_sign = cur
-                i += 1
-            end = i
-            #if end - start >= 1 :
-            if end - start >= mmin_len :
-                v_peak = float(dfk['v'].iloc[start:end].max())
-                t_start = float(dfk['t'].iloc[start])
-                t_end = float(dfk['t'].iloc[end-1])
-                nSeg = {
-                    "start_idx": int(start),
-                    "end_idx": int(end-1),
-                    "t_start": t_start,
-                    "t_end": t_end,
-                    "duration_ms": t_end - t_start,
-                    "type": ttype,
-                    "v_peak_px_per_ms": v_peak,
-                }
-                segments.append(nSeg)
-                i -= 1
-                #print(f'Adding a segment {nSeg}')
-                #used_mask[start:end] = True
-                #nmask = keep_min_len(mmask, mmin_len, used_mask)
-                #seg_type[nmask.to_numpy(dtype=bool)] = mtype
-            i += 1
+        nmask = keep_min_len(mmask, mmin_len)
+        seg_type[nmask] = mtype
+
+        starts, ends = _scan_segments(seg_type == mtype, zero_like, accel_sign,
+                                      mmin_len, thr.accel_sign_flip_end)
+        for start, end in zip(starts, ends):
+            v_peak = float(v[start:end].max())
+            t_start = float(t[start])
+            t_end = float(t[end-1])
+            nSeg = {
+                "start_idx": int(start),
+                "end_idx": int(end-1),
+                "t_start": t_start,
+                "t_end": t_end,
+                "duration_ms": t_end - t_start,
+                "type": mtype,
+                "v_peak_px_per_ms": v_peak,
+            }
+            segments.append(nSeg)
 
 
     segments = sorted(segments, key=lambda s: s['start_idx'])
-    #print(f"Detected segments: {segments}")
     
     # Merge heuristic on adjacent segments:
     # if velocity at midpoint >= ratio * linear extrapolation of the two peak velocities.
     # We'll approximate 'linear extrapolation between peaks' as linear interp at mid-time between the two
     # peak times using (t_peak1,v_peak1) and (t_peak2,v_peak2).
     merged = []
-    #merged = segments.copy()  # Start with the initial segments
-    #return segments
+    if len(segments) < 2:
+        return segments
+
+    seg_starts = np.array([s['start_idx'] for s in segments], dtype=np.int64)
+    seg_ends = np.array([s['end_idx'] for s in segments], dtype=np.int64)
+    # peak sample of every segment (first one on ties, like idxmax) and the peak of
+    # every candidate merge a..b, each from a single reduceat over the whole trial
+    peak_idx = _range_argmax(v, seg_starts, seg_ends)
+    merged_peak = v[_range_argmax(v, seg_starts[:-1], seg_ends[1:])]
+
     k = 0
     while k < len(segments) :
         if k == len(segments) - 1:
@@ -315,12 +458,10 @@ def detect_submovements(dfk: pd.DataFrame, thr: Thresholds, dt_ms: int) -> List[
         
 
         if (b['t_start'] - a['t_end']) <= thr.merge_max_gap_ms:
-            # find peaks within each segment
-            segA = dfk.iloc[a['start_idx']:a['end_idx']+1]
-            segB = dfk.iloc[b['start_idx']:b['end_idx']+1]
-            iA = segA['v'].idxmax(); iB = segB['v'].idxmax()
-            tA, vA = dfk.loc[iA, 't'], dfk.loc[iA, 'v']
-            tB, vB = dfk.loc[iB, 't'], dfk.loc[iB, 'v']
+            # peaks within each segment
+            iA = peak_idx[k]; iB = peak_idx[k+1]
+            tA, vA = t[iA], v[iA]
+            tB, vB = t[iB], v[iB]
             # midpoint in time between peaks
             tmid = (tA + tB) / 2.0
             # linear extrapolation (actually interpolation) at tmid
@@ -329,14 +470,13 @@ def detect_submovements(dfk: pd.DataFrame, thr: Thresholds, dt_ms: int) -> List[
             else:
                 v_lin_mid = max(vA, vB)
             # measured speed near tmid
-            vmid = float(dfk.iloc[(dfk['t']-tmid).abs().argmin()]['v'])
-            #if vmid >= thr.merge_midpoint_ratio * v_lin_mid or (a['t_end'] < b['t_start']  and (a['type'] != b['type'])):
+            vmid = float(v[_nearest_index(t, tmid)])
             if vmid >= thr.merge_midpoint_ratio * v_lin_mid :
                 # merge: extend a to b
                 a['end_idx'] = b['end_idx']
                 a['t_end'] = b['t_end']
                 a['duration_ms'] = a['t_end'] - a['t_start']
-                a['v_peak_px_per_ms'] = float(dfk['v'].iloc[a['start_idx']:a['end_idx']+1].max())
+                a['v_peak_px_per_ms'] = float(merged_peak[k])
                 a['type'] = a['type'] if a['type']==b['type'] else f"{a['type']}+{b['type']}"
                 k += 2
                 merged.append(a)
@@ -345,25 +485,62 @@ def detect_submovements(dfk: pd.DataFrame, thr: Thresholds, dt_ms: int) -> List[
 
     return merged
 
+def run_length_encode(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Runs of equal consecutive values.
+    Returns (starts, ends, lengths, run values), ends inclusive.
+    """
+    values = np.asarray(values)
+    n = len(values)
+    if n == 0:
+        empty = np.array([], dtype=np.int64)
+        return empty, empty, empty, values[:0]
+    starts = np.concatenate(([0], np.flatnonzero(values[1:] != values[:-1]) + 1))
+    ends = np.concatenate((starts[1:] - 1, [n - 1]))
+    return starts, ends, ends - starts + 1, values[starts]
+
+def true_runs(mask: np.ndarray, used_mask: Optional[np.ndarray] = None,
+              min_len: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (starts, ends, lengths) of the True runs of mask, ends inclusive.
+    Samples in used_mask break runs; runs shorter than min_len are dropped.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    if used_mask is not None:
+        mask = mask & ~np.asarray(used_mask, dtype=bool)
+    starts, ends, lengths, vals = run_length_encode(mask)
+    keep = vals & (lengths >= min_len)
+    return starts[keep], ends[keep], lengths[keep]
+
+def keep_min_len(mask: np.ndarray, min_len: int, used_mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Copy of mask with the runs shorter than min_len switched off.
+    Runs are taken outside used_mask; samples inside it are left untouched.
+    """
+    mask = np.array(mask, dtype=bool)
+    starts, ends, lengths = true_runs(mask, used_mask)
+    short = lengths < min_len
+    # +1 at each short run start, -1 after its end: the running sum covers the short runs
+    cover = np.zeros(len(mask) + 1, dtype=np.int64)
+    np.add.at(cover, starts[short], 1)
+    np.add.at(cover, ends[short] + 1, -1)
+    mask[np.cumsum(cover[:-1]) > 0] = False
+    return mask
+
 def _label_runs(bool_series: pd.Series, used_mask : np.array ) -> List[Tuple[int,int]]:
     """
     Returns list of (start_idx, end_idx) inclusive of contiguous True runs.
     """
-    runs = []
-    in_run = False
-    start = 0
-    for i, val in enumerate(bool_series.to_numpy(dtype=bool)):
-        
-        
-        if val and not in_run and not used_mask[i]:
-            in_run = True
-            start = i
-        elif in_run and (used_mask[i] or not val):
-            runs.append((start, i-1))
-            in_run = False
-    if in_run:
-        runs.append((start, len(bool_series)-1))
-    return runs
+    starts, ends, _ = true_runs(bool_series.to_numpy(dtype=bool), used_mask)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+def _kinematics_and_segments(uni: pd.DataFrame, resample_cfg: ResampleCfg,
+                             thresholds: Thresholds) -> Dict[str, pd.DataFrame]:
+    kin = compute_kinematics(uni, dt_ms=resample_cfg.dt_ms, smooth_window=resample_cfg.smooth_window)
+
+    segs = detect_submovements(kin, thresholds, dt_ms=resample_cfg.dt_ms)
+    segs_df = pd.DataFrame(segs)
+    return {"uniform": kin, "segments": segs_df}
 
 def analyze_trial_positions(df_trial: pd.DataFrame,
                             resample_cfg: ResampleCfg = ResampleCfg(),
@@ -377,16 +554,27 @@ def analyze_trial_positions(df_trial: pd.DataFrame,
     uni = resample_uniform(df_trial[['t','x','y']].sort_values('t'), dt_ms=resample_cfg.dt_ms, gap_ms=resample_cfg.gap_ms)
 
     fs = 1000 / resample_cfg.dt_ms  # Sampling frequency (Hz)
-    fc = 10  # Cut-off frequency (Hz)
 
-    uni['x'] = butter_lowpass_filter(uni['x'].values, cutoff=fc, fs=fs)
-    uni['y'] = butter_lowpass_filter(uni['y'].values, cutoff=fc, fs=fs)
+    uni[['x', 'y']] = butter_lowpass_filter(uni[['x', 'y']].to_numpy(), cutoff=FILTER_CUTOFF_HZ, fs=fs)
 
-    kin = compute_kinematics(uni, dt_ms=resample_cfg.dt_ms, smooth_window=resample_cfg.smooth_window)
+    return _kinematics_and_segments(uni, resample_cfg, thresholds)
 
-    #print(f"Velocities from t > 390 and t < 500: {kin[(kin['t'] > 390) & (kin['t'] < 500)]['v']}")
-
-    segs = detect_submovements(kin, thresholds, dt_ms=resample_cfg.dt_ms)
-    segs_df = pd.DataFrame(segs)
-    return {"uniform": kin, "segments": segs_df}
+def analyze_trials_batch(df_trials: List[pd.DataFrame],
+                         resample_cfg: ResampleCfg = ResampleCfg(),
+                         thresholds: Thresholds = Thresholds()) -> List[Dict[str, pd.DataFrame]]:
+    """
+    analyze_trial_positions for a list of trials, with the low-pass filter run over
+    all of them at once (butter_lowpass_filter_batch). Same output, in input order.
+    """
+    unis = [resample_uniform(df_trial[['t','x','y']].sort_values('t'), dt_ms=resample_cfg.dt_ms, gap_ms=resample_cfg.gap_ms)
+            for df_trial in df_trials]
 
+    fs = 1000 / resample_cfg.dt_ms  # Sampling frequency (Hz)
+    filtered = butter_lowpass_filter_batch([uni[['x', 'y']].to_numpy() for uni in unis],
+                                           cutoff=FILTER_CUTOFF_HZ, fs=fs)
+
+    results = []
+    for uni, xy in zip(unis, filtered):
+        uni[['x', 'y']] = xy
+        results.append(_kinematics_and_segments(uni, resample_cfg, thresholds))
+    return results
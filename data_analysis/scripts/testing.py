@@ -1,3 +1,4 @@
+import argparse
 import pandas as pd
 import utils_paths as up
 import numpy as np
@@ -5,32 +6,32 @@ import json
 import os
 
 def print_unsuccessful_trials(trials_path=up.TRIALS_FILE, output_path= up.TEST_QA_FILE ):
+    """
+    Write the failed trials that reached the target more often than they left it
+    to a JSON file for manual review.
+
+    Reads the processed trials table of 1_flatten_data.py (trials_latest.parquet):
+    the reaching / out events of each trial are its Reaching_times and Out_times
+    lists and the click is described by the last indication down / up.
+    """
     # Cargar el archivo
     df = pd.read_parquet(trials_path)
 
     # Filtrar por success == False
     df_fail = df[df['success'] == False]
 
-    def count_if_possible(x):
-        try:
-            return len(x)
-        except:
-            return 0
-
-    # Filtrar por longitud de outtimes >= reachingtimes
-    filtered_fail = df_fail[df_fail.apply(
-        lambda row: count_if_possible(row['reachingTimes']) > count_if_possible(row['outTimes']),
-        axis=1
-    )]
+    # Filtrar por numero de reaching times > out times
+    filtered_fail = df_fail[df_fail['Number_reaching_time'] > df_fail['Number_out_time']]
 
     # Seleccionar campos clave para revisión
     fields_to_show = [
-        'participantId', 'trialIndex', 'success', 'buffer', 'bufferReachingTimes','bufferOutTimes', 
-        'reachingTimes', 'outTimes','confirmationTime', 'feedbackMode', 'indication', 'inTarget', 'inTargetBuffer',
-        'clickDownTime', 'clickUpTime' #, 'cursorPositions'
+        'participantId', 'trialDocId', 'success', 'buffer', 'Buffer_reaching_times', 'Buffer_out_times',
+        'Reaching_times', 'Out_times', 'feedbackMode', 'indication', 'W', 'A',
+        'Indication_down_t', 'Indication_up_t', 'Indication_down_in_target', 'Indication_up_in_target'
     ]
 
-    failed_trials_info = filtered_fail[fields_to_show].to_dict(orient='records')
+    failed_trials_info = filtered_fail[fields_to_show].astype(object)
+    failed_trials_info = failed_trials_info.where(failed_trials_info.notna(), None).to_dict(orient='records')
     failed_trials_info = convert_ndarray_to_list(failed_trials_info)
 
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -51,4 +52,12 @@ def convert_ndarray_to_list(obj):
     else:
         return obj
 
-print_unsuccessful_trials()
\ No newline at end of file
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write the failed trials that did reach the target to a QA file")
+    parser.add_argument("--trials", default=up.TRIALS_FILE, help="Trials parquet (default: trials_latest.parquet)")
+    parser.add_argument("--out", default=up.TEST_QA_FILE, help="Output JSON (default: test/test_qa.json)")
+    args = parser.parse_args(argv)
+    print_unsuccessful_trials(args.trials, args.out)
+
+if __name__ == "__main__":
+    main()
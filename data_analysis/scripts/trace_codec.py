@@ -0,0 +1,111 @@
+"""
+Decoder (and encoder) of the packed cursor traces written by trace_codec.js.
+
+A trial uploaded with pack_cursor_traces has a cursorTrace string instead of the
+cursorPositions array of {x, y, time} maps: base64 of a little-endian blob
+
+    header (24 bytes)  uint8 version, 3 reserved bytes, uint32 n,
+                       int32 x0, int32 y0, float64 t0 (integer microseconds)
+    int16 dx[n-1], int16 dy[n-1], int32 dt[n-1]   (px, px, microseconds)
+
+decode_traces turns a whole column of traces into concatenated t/x/y arrays: each
+trace is only base64-decoded and sliced, the deltas of all trials are summed by one
+cumulative sum that restarts at every trial. t comes back in ms like cursorPositions.
+"""
+
+import base64
+import numpy as np
+
+TRACE_FORMAT_VERSION = 1
+HEADER = np.dtype([("version", "u1"), ("reserved", "u1", 3), ("n", "<u4"),
+                   ("x0", "<i4"), ("y0", "<i4"), ("t0", "<f8")])
+
+
+def _parse(trace):
+    raw = base64.b64decode(trace)
+    header = np.frombuffer(raw, dtype=HEADER, count=1)[0]
+    if header["version"] != TRACE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported cursor trace version {header['version']}")
+    m = max(int(header["n"]) - 1, 0)
+    if len(raw) != HEADER.itemsize + 8 * m:
+        raise ValueError("Truncated cursor trace")
+    dx = np.frombuffer(raw, dtype="<i2", count=m, offset=HEADER.itemsize)
+    dy = np.frombuffer(raw, dtype="<i2", count=m, offset=HEADER.itemsize + 2 * m)
+    dt = np.frombuffer(raw, dtype="<i4", count=m, offset=HEADER.itemsize + 4 * m)
+    return header, dx, dy, dt
+
+
+def decode_traces(traces):
+    """
+    Decode a sequence of base64 traces.
+
+    Parameters:
+    -----------
+    traces : iterable of str
+
+    Returns:
+    --------
+    (ndarray, ndarray, ndarray, ndarray)
+        Samples per trace, and the t (ms), x, y of all samples (float64),
+        trace after trace
+    """
+    parsed = [_parse(trace) for trace in traces]
+    lengths = np.array([int(header["n"]) for header, *_ in parsed], dtype=np.int64)
+    if not lengths.sum():
+        empty = np.empty(0, dtype=np.float64)
+        return lengths, empty, empty, empty
+
+    # First sample of every trace holds its absolute value, the rest the deltas;
+    # a global cumsum minus the running total before each trace restarts at every trace
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[lengths > 0]
+    out = []
+    for first, field in (("t0", 3), ("x0", 1), ("y0", 2)):
+        steps = np.empty(lengths.sum(), dtype=np.int64)
+        steps[starts] = [header[first] for header, *_ in parsed if header["n"] > 0]
+        mask = np.ones(len(steps), dtype=bool)
+        mask[starts] = False
+        steps[mask] = np.concatenate([p[field] for p in parsed])
+        total = np.cumsum(steps)
+        before = np.repeat(total[starts] - steps[starts], lengths[lengths > 0])
+        out.append((total - before).astype(np.float64))
+    t_us, x, y = out
+    return lengths, t_us / 1000.0, x, y
+
+
+def decode_trace(trace):
+    """t (ms), x, y arrays of one trace."""
+    _, t, x, y = decode_traces([trace])
+    return t, x, y
+
+
+def trace_positions(trace):
+    """One trace as the cursorPositions list it replaces ([{time, x, y}, ...])."""
+    t, x, y = decode_trace(trace)
+    return [{"time": ti, "x": xi, "y": yi} for ti, xi, yi in zip(t.tolist(), x.tolist(), y.tolist())]
+
+
+def encode_trace(t, x, y):
+    """
+    Python counterpart of encodeCursorTrace: base64 trace of the samples, or None
+    if x/y are not integer pixels or a delta does not fit (same rules as the JS).
+    """
+    t_us = np.floor(np.asarray(t, dtype=np.float64) * 1000 + 0.5)  # Math.round: halves go up
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(t_us)
+    if n == 0 or not np.isfinite(t_us).all() or not (np.isfinite(x).all() and np.isfinite(y).all()):
+        return None
+    if (x != np.round(x)).any() or (y != np.round(y)).any():
+        return None
+    dx, dy, dt = np.diff(x), np.diff(y), np.diff(t_us)
+    i2, i4 = np.iinfo(np.int16), np.iinfo(np.int32)
+    if (np.abs([x[0], y[0]]) > i4.max).any() or (dx < i2.min).any() or (dx > i2.max).any() \
+            or (dy < i2.min).any() or (dy > i2.max).any() or (dt < i4.min).any() or (dt > i4.max).any():
+        return None
+
+    header = np.zeros(1, dtype=HEADER)
+    header["version"] = TRACE_FORMAT_VERSION
+    header["n"] = n
+    header["x0"], header["y0"], header["t0"] = x[0], y[0], t_us[0]
+    raw = header.tobytes() + dx.astype("<i2").tobytes() + dy.astype("<i2").tobytes() + dt.astype("<i4").tobytes()
+    return base64.b64encode(raw).decode("ascii")
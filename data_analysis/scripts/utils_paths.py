@@ -1,10 +1,12 @@
 
+import os
 from pathlib import Path
-import pandas as pd
 
-RAW_DATA = str(Path(__file__).parent.parent / "data" / "raw")
-PROCESSED_DATA = str(Path(__file__).parent.parent / "data" / "processed")   
-PROCESSED_CSV_DATA = str(Path(__file__).parent.parent / "data" / "processed" / "csv")   
+# FITTS_DATA_DIR points the scripts at another data directory (raw/ and processed/), e.g. in tests
+DATA_DIR = Path(os.environ.get("FITTS_DATA_DIR", Path(__file__).parent.parent / "data"))
+RAW_DATA = str(DATA_DIR / "raw")
+PROCESSED_DATA = str(DATA_DIR / "processed")
+PROCESSED_CSV_DATA = str(DATA_DIR / "processed" / "csv")
 
 TEST_FOLDER = str(Path(__file__).parent.parent / "test")  
 TEST_QA_FILE = str(Path(TEST_FOLDER) / "test_qa.json")
@@ -20,14 +22,101 @@ ERROR_RATES_FILE_CSV = str(Path(PROCESSED_CSV_DATA) / "error_rates_latest.csv")
 
 POSITIONS_FILE = str(Path(PROCESSED_DATA) / "positions_latest.parquet")
 POSITIONS_FILE_CSV = str(Path(PROCESSED_CSV_DATA) / "positions_latest.csv")
+# Star schema of the positions (positions_store.py): t/x/y per sample + one row per trial.
+# positions_latest.parquet is their join (skipped with 1_flatten_data.py --no-wide)
+SAMPLES_FILE = str(Path(PROCESSED_DATA) / "samples_latest.parquet")
+POSITION_TRIALS_FILE = str(Path(PROCESSED_DATA) / "position_trials_latest.parquet")
 
 SEGMENTS_FILE = str(Path(PROCESSED_DATA) / "submovements.parquet")
 SEGMENTS_FILE_CSV = str(Path(PROCESSED_CSV_DATA) / "submovements.csv")
+# float64 kinematics, only written with 2_movement_analysis.py --kinematics-format full|both
 KINEMATICS_FILE = str(Path(PROCESSED_DATA) / "kinematics.parquet")
 KINEMATICS_FILE_CSV = str(Path(PROCESSED_CSV_DATA) / "kinematics.csv")
+# float32/dictionary-encoded kinematics with implicit time, see kinematics_store.py
+KINEMATICS_COMPACT_FILE = str(Path(PROCESSED_DATA) / "kinematics_compact.parquet")
+# Hive-partitioned copy of the segments (participantId=<id>/[feedbackMode=<mode>/]part-0.parquet),
+# read with read_partitioned so a selection only opens its partitions (3_1_analysis.py --participant)
+SEGMENTS_DATASET = str(Path(PROCESSED_DATA) / "submovements")
+PARTITION_COLS = ["participantId"]
+CONDITION_PARTITION_COLS = ["participantId", "feedbackMode"]
+
+SUBMOVEMENT_CACHE_DIR = str(Path(PROCESSED_DATA) / "cache" / "submovements")
+STATS_CACHE_DIR = str(Path(PROCESSED_DATA) / "cache" / "statistical_analysis")
+DUCKDB_TEMP_DIR = str(Path(PROCESSED_DATA) / "cache" / "duckdb")  # spill space of catalog.py
 
 ANALYSIS_FILE_1 = str(Path(PROCESSED_DATA) / "analysis_results.csv")
 
+PIPELINE_STATE_FILE = str(Path(PROCESSED_DATA) / "_pipeline_state.json")
+PROFILE_DIR = str(Path(PROCESSED_DATA) / "profiling")
+
+def write_partitioned(df, path, partition_cols=PARTITION_COLS):
+    """
+    Replace the dataset at path with df, split in one directory per value of
+    partition_cols (Hive layout). The partition columns are only stored in the
+    directory names.
+
+    Each partition is written with pq.write_table. pq.write_to_dataset goes through
+    the Arrow dataset writer, whose threads made the scripts abort at interpreter
+    exit ("terminate called without an active exception", exit 134) in about one
+    run out of five.
+    """
+    import shutil
+    from urllib.parse import quote
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    partition_cols = list(partition_cols)
+    shutil.rmtree(path, ignore_errors=True)
+    for key, part in df.groupby(partition_cols, sort=True, dropna=False):
+        key = key if isinstance(key, tuple) else (key,)
+        # Same directory names as pyarrow's Hive partitioning (URI-encoded, nulls as the default partition)
+        names = [f"{col}={'__HIVE_DEFAULT_PARTITION__' if pd.isna(value) else quote(str(value), safe='')}"
+                 for col, value in zip(partition_cols, key)]
+        directory = Path(path).joinpath(*names)
+        directory.mkdir(parents=True, exist_ok=True)
+        table = pa.Table.from_pandas(part.drop(columns=partition_cols), preserve_index=False)
+        pq.write_table(table, directory / "part-0.parquet")
+
+def partition_names(path):
+    """Names of the partition levels of a dataset, from the key=value directories of one of its files."""
+    first = next(Path(path).rglob("*.parquet"), None)
+    if first is None:
+        return []
+    return [part.split("=", 1)[0] for part in first.relative_to(path).parts[:-1] if "=" in part]
+
+def read_partitioned(path, columns=None, filters=None):
+    """
+    Read a dataset written by write_partitioned.
+
+    Parameters:
+    -----------
+    path : str
+        Dataset directory (e.g. SEGMENTS_DATASET)
+    columns : list, optional
+        Columns to read; the others are never loaded from disk
+    filters : list, optional
+        pandas/pyarrow style filters, e.g. [("participantId", "==", pid)] or
+        [("feedbackMode", "in", ["none", "green"])]. Filters on partition columns
+        skip whole directories, the rest are pushed down to the Parquet row groups.
+
+    Returns:
+    --------
+    DataFrame
+        Partition columns come back as plain strings, after the stored columns
+        unless `columns` sets the order
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+
+    # Partition values are ids/labels: read them as strings, never inferred as numbers
+    names = partition_names(path)
+    partitioning = ds.HivePartitioning.discover(schema=pa.schema([(name, pa.string()) for name in names]))
+    dataset = ds.dataset(path, format="parquet", partitioning=partitioning)
+    expression = pq.filters_to_expression(filters) if filters else None
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
 # Threshold for minimum acceptable success rate (participants below this are excluded)
 MIN_SUCCESS_RATE_THRESHOLD = 0.70  # 70% success rate
 
@@ -46,6 +135,8 @@ def get_excluded_participants_by_error_rate(threshold=MIN_SUCCESS_RATE_THRESHOLD
     list
         List of participant IDs to exclude
     """
+    import pandas as pd
+
     try:
         # Read error rates file
         df_errors = pd.read_csv(ERROR_RATES_FILE_CSV)
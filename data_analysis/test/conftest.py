@@ -0,0 +1,35 @@
+"""
+Shared setup of the tests. The scripts are flat modules in data_analysis/scripts,
+imported by name (utils_paths, trace_codec, ...) or, for the digit-prefixed ones,
+with fitts.load_script.
+"""
+
+import sys
+from pathlib import Path
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parents[1] / "scripts"
+sys.path.insert(0, str(SCRIPTS_DIR))
+
+from fitts import load_script  # noqa: E402
+
+
+@pytest.fixture
+def fetch(tmp_path, monkeypatch):
+    """0_fetchdata_firestore.py with its raw/delta/watermark paths in tmp_path."""
+    module = load_script("0_fetchdata_firestore.py")
+    monkeypatch.setattr(module, "OUT_DIR", tmp_path)
+    monkeypatch.setattr(module, "DELTA_DIR", tmp_path / "deltas")
+    monkeypatch.setattr(module, "WATERMARK_FILE", tmp_path / "_watermarks.json")
+    return module
+
+
+@pytest.fixture
+def processed_trials(fetch, tmp_path):
+    """trials_latest (1_flatten_data.summarize_trials) of a small fake Firestore snapshot."""
+    from fake_firestore import make_fake_client
+    import pandas as pd
+
+    fetch.export_collection(make_fake_client(6, trials_per_participant=20, seed=3), "fitts_trials", tmp_path / "raw.parquet")
+    summary, _ = load_script("1_flatten_data.py").summarize_trials(pd.read_parquet(tmp_path / "raw.parquet"))
+    return summary
@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import utils_paths as up
+from fake_firestore import make_fake_client
+from fitts import load_script
+
+analysis = load_script("3_1_analysis.py")
+
+
+def _reference(df_segments, trial_ids, t):
+    """The former per-event lookup: first segment of the trial with t_start <= t <= t_end."""
+    out = []
+    for trial_id, ti in zip(trial_ids, t):
+        segs = df_segments[df_segments['trialDocId'] == trial_id]
+        seg = segs[(segs['t_start'] <= ti) & (segs['t_end'] >= ti)]
+        out.append('pause' if len(seg) == 0 else seg.iloc[0]['type'])
+    return np.array(out, dtype=object)
+
+
+def test_nested_segment():
+    segments = pd.DataFrame({'trialDocId': ['a', 'a'], 't_start': [0.0, 10.0], 't_end': [100.0, 20.0],
+                             'type': ['slow', 'rapid']})
+    t = [50.0, 15.0, 100.0, 101.0, -1.0, np.nan]
+    assert list(analysis.classify_events(segments, ['a'] * len(t), t)) == \
+        ['slow', 'slow', 'slow', 'pause', 'pause', 'pause']
+
+
+def test_matches_the_per_event_lookup():
+    rng = np.random.default_rng(0)
+    rows = []
+    for trial in range(40):
+        starts = np.sort(rng.uniform(0, 1000, rng.integers(0, 8)))
+        for start in starts:  # overlapping, nested and adjacent segments, written in t_start order
+            rows.append((f"t{trial}", start, start + rng.choice([rng.uniform(0, 300), 0.0]),
+                         rng.choice(['rapid', 'slow', 'rapid_corrective'])))
+    segments = pd.DataFrame(rows, columns=['trialDocId', 't_start', 't_end', 'type'])
+    segments.loc[3, 't_end'] = np.nan
+
+    trial_ids = np.array([f"t{i}" for i in rng.integers(0, 42, 2000)])  # t40, t41 have no segments
+    t = rng.uniform(-50, 1300, 2000)
+    on_edge = rng.integers(0, len(segments), 400)  # exactly on a segment's start or end
+    trial_ids[:400] = segments['trialDocId'].to_numpy()[on_edge]
+    t[:200] = segments['t_start'].to_numpy()[on_edge[:200]]
+    t[200:400] = segments['t_end'].to_numpy()[on_edge[200:]]
+    t[400:410] = np.nan
+
+    expected = _reference(segments, trial_ids, t)
+    assert (analysis.classify_events(segments, trial_ids, t) == expected).all()
+
+
+def test_selection_reads_the_partitions(fetch, tmp_path, monkeypatch):
+    client = make_fake_client(4, trials_per_participant=10, seed=6)
+    fetch.export_collection(client, "fitts_trials", tmp_path / "raw.parquet")
+    trials, _ = load_script("1_flatten_data.py").summarize_trials(pd.read_parquet(tmp_path / "raw.parquet"))
+    rng = np.random.default_rng(1)
+    segments = pd.DataFrame([(trial_id, start, start + rng.uniform(50, 500), rng.choice(['rapid', 'slow']))
+                             for trial_id in trials['trialDocId'] for start in np.sort(rng.uniform(0, 1500, 3))],
+                            columns=['trialDocId', 't_start', 't_end', 'type'])
+    trials.to_parquet(tmp_path / "trials_latest.parquet", index=False)
+    segments.to_parquet(tmp_path / "submovements.parquet", index=False)
+    keys = trials.set_index('trialDocId')[up.CONDITION_PARTITION_COLS]
+    up.write_partitioned(segments.join(keys, on='trialDocId'), tmp_path / "submovements", up.CONDITION_PARTITION_COLS)
+    monkeypatch.setattr(analysis, "TRIALS_FILE", tmp_path / "trials_latest.parquet")
+    monkeypatch.setattr(analysis, "SEGMENTS_FILE", tmp_path / "submovements.parquet")
+    monkeypatch.setattr(analysis, "SEGMENTS_DATASET", str(tmp_path / "submovements"))
+
+    pid, mode = trials['participantId'].iloc[0], trials['feedbackMode'].iloc[0]
+    sel_trials, sel_segments = analysis.load_trials_and_segments([pid], [mode])
+    in_selection = (trials['participantId'] == pid) & (trials['feedbackMode'] == mode)
+    assert sel_trials['trialDocId'].tolist() == trials.loc[in_selection, 'trialDocId'].tolist()
+    expected = segments[segments['trialDocId'].isin(sel_trials['trialDocId'])]
+    key = ['trialDocId', 't_start']
+    pd.testing.assert_frame_equal(sel_segments.sort_values(key, ignore_index=True), expected.sort_values(key, ignore_index=True))
+
+    full = analysis.event_movement_types(*analysis.load_trials_and_segments())
+    selected = analysis.event_movement_types(sel_trials, sel_segments)
+    expected = full[(full['participantId'] == pid) & (full['feedbackMode'] == mode)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(selected, expected)
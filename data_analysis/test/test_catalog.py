@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+import catalog
+import submovements as sm
+from fake_firestore import make_fake_client
+from fitts import load_script
+from kinematics_store import KINEMATICS_COLUMNS, read_kinematics, write_kinematics
+from positions_store import read_positions, write_positions
+
+if catalog.duckdb is None:
+    pytest.skip("duckdb is not installed", allow_module_level=True)
+
+flatten = load_script("1_flatten_data.py")
+movement = load_script("2_movement_analysis.py")
+
+
+@pytest.fixture
+def processed(fetch, tmp_path, monkeypatch):
+    """The positions star schema and kinematics of a fake snapshot in tmp_path, registered in the catalog."""
+    fetch.export_collection(make_fake_client(3, trials_per_participant=6, seed=11), "fitts_trials", tmp_path / "raw.parquet")
+    table = pq.read_table(tmp_path / "raw.parquet")
+    samples, trials = flatten.flatten_samples_columnar(table.to_pandas(), flatten._column(table, "cursorPositions"),
+                                                       flatten._column(table, "cursorTrace"))
+    paths = {"samples_path": tmp_path / "samples.parquet", "trials_path": tmp_path / "position_trials.parquet"}
+    write_positions(samples, trials, **paths)
+    _, kinematic_rows = movement.analyze_trials(samples)
+    kinematics = pd.concat(kinematic_rows, ignore_index=True)
+    kinematics.to_parquet(tmp_path / "kinematics.parquet", index=False)
+    write_kinematics(kinematics, tmp_path / "kinematics_compact.parquet", dt_ms=sm.ResampleCfg.dt_ms)
+
+    tables = {"samples": (paths["samples_path"], catalog.TABLES["samples"][1]),
+              "position_trials": (paths["trials_path"], catalog.TABLES["position_trials"][1])}
+    monkeypatch.setattr(catalog, "TABLES", tables)
+    monkeypatch.setattr(catalog.up, "KINEMATICS_COMPACT_FILE", str(tmp_path / "kinematics_compact.parquet"))
+    monkeypatch.setattr(catalog.up, "KINEMATICS_FILE", str(tmp_path / "kinematics.parquet"))
+    return paths, kinematics
+
+
+def _sorted(df, key):
+    return df.sort_values(key, kind="stable", ignore_index=True)
+
+
+def _views(con):
+    return {name for (name,) in con.execute("SELECT view_name FROM duckdb_views() WHERE NOT internal").fetchall()}
+
+
+def test_positions_latest_matches_read_positions(processed, tmp_path):
+    paths, _ = processed
+    con = catalog.connect(temp_directory=tmp_path / "duckdb")
+    assert _views(con) == {"samples", "position_trials", "positions_latest", "kinematics"}
+    got = con.sql("SELECT * FROM positions_latest").df()
+    expected = read_positions(**paths)
+    pd.testing.assert_frame_equal(_sorted(got, ["trialDocId", "t"]), _sorted(expected, ["trialDocId", "t"]),
+                                  check_dtype=False, check_exact=True)
+
+
+def test_kinematics_view_matches_the_files(processed, tmp_path):
+    _, kinematics = processed
+    key = ["trialDocId", "t"]
+    con = catalog.connect(temp_directory=tmp_path / "duckdb")
+    got = _sorted(con.sql("SELECT * FROM kinematics").df(), key)
+    assert list(got.columns) == KINEMATICS_COLUMNS
+    # t rebuilt from t0/dt_ms, segment_id -1 back to NULL: exactly what read_kinematics returns
+    pd.testing.assert_frame_equal(got, _sorted(read_kinematics(tmp_path / "kinematics_compact.parquet"), key),
+                                  check_dtype=False, check_exact=True)
+    assert got["segment_id"].isna().sum() == kinematics["segment_id"].isna().sum()
+
+    # Without the compact file the view reads the float64 one
+    (tmp_path / "kinematics_compact.parquet").unlink()
+    con = catalog.connect(temp_directory=tmp_path / "duckdb")
+    full = _sorted(con.sql("SELECT * FROM kinematics").df(), key)
+    pd.testing.assert_frame_equal(full, _sorted(kinematics, key), check_dtype=False, check_exact=True)
+    np.testing.assert_allclose(got["x"], full["x"], rtol=1e-6)
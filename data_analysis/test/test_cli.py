@@ -0,0 +1,32 @@
+import json
+import sys
+import pytest
+import bench_startup
+import fitts
+
+
+@pytest.mark.parametrize("label, args, forbidden", bench_startup.TARGETS, ids=[t[0] for t in bench_startup.TARGETS])
+def test_startup_skips_lazy_modules(label, args, forbidden, processed_trials, tmp_path):
+    if label == "3_2 metrics, no plots":
+        # Same entry point on a small trials table instead of the processed data on disk
+        trials_csv = tmp_path / "trials_latest.csv"
+        processed_trials.to_csv(trials_csv, index=False)
+        args = ["-c", f"import utils_paths as up; up.TRIALS_FILE_CSV = {str(trials_csv)!r}; " + args[1]]
+    modules, _ = bench_startup.import_times(args)
+    assert [name for name in sorted(forbidden) if bench_startup.loaded(modules, name)] == []
+
+
+def test_qa_reads_the_processed_trials(processed_trials, tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "argv", list(sys.argv))  # fitts.main sets argv for the script
+    summary = processed_trials.copy()
+    summary.loc[summary.index[:3], "Number_out_time"] = 1  # left the target as often as they reached it
+    summary.to_parquet(tmp_path / "trials_latest.parquet", index=False)
+
+    fitts.main(["qa", "--trials", str(tmp_path / "trials_latest.parquet"), "--out", str(tmp_path / "qa.json")])
+    with open(tmp_path / "qa.json") as f:
+        failed = json.load(f, parse_constant=lambda name: pytest.fail(f"{name} in the QA file"))
+
+    expected = summary[~summary["success"] & (summary["Number_reaching_time"] > summary["Number_out_time"])]
+    assert len(expected) > 0
+    assert [t["trialDocId"] for t in failed] == expected["trialDocId"].tolist()
+    assert all(not t["success"] and len(t["Reaching_times"]) > 0 for t in failed)
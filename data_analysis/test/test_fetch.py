@@ -0,0 +1,179 @@
+import json
+from datetime import datetime, timedelta, timezone
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from fake_firestore import FakeClient, add_fake_participants, make_fake_client
+
+
+def _by_id(df):
+    return df.set_index("__doc_id").sort_index()
+
+
+def test_export_keeps_fields_of_later_pages(fetch, tmp_path):
+    client = make_fake_client(3, packed_fraction=0.5)
+    n_docs = fetch.export_collection(client, "fitts_trials", tmp_path / "trials.parquet", batch_size=10)
+
+    exported = _by_id(pq.read_table(tmp_path / "trials.parquet").to_pandas())
+    expected = _by_id(fetch.fetch_collection(client, "fitts_trials"))
+    assert n_docs == len(expected) == len(exported)
+    assert expected["cursorTrace"].notna().sum() > 0
+    assert exported["cursorTrace"].fillna("").equals(expected["cursorTrace"].fillna(""))
+    n_positions = lambda s: s.map(lambda v: 0 if v is None or isinstance(v, float) else len(v))
+    assert n_positions(exported["cursorPositions"]).equals(n_positions(expected["cursorPositions"]))
+
+
+def test_export_widens_empty_lists_and_new_struct_fields(fetch, tmp_path):
+    client = FakeClient()
+    client.add("fitts_trials", {"n": 1, "outTimes": [], "events": [{"x": 1}]}, doc_id="a")
+    client.add("fitts_trials", {"n": 2.5, "outTimes": [{"time": 1.5}], "events": [{"x": 2, "inTarget": True}]}, doc_id="b")
+    client.add("fitts_trials", {"n": 3, "outTimes": [], "extra": "z"}, doc_id="c")
+
+    fetch.export_collection(client, "fitts_trials", tmp_path / "trials.parquet", batch_size=1)
+    rows = pq.read_table(tmp_path / "trials.parquet").to_pylist()
+    assert rows == [
+        {"n": 1.0, "outTimes": [], "events": [{"x": 1, "inTarget": None}], "__doc_id": "a", "extra": None},
+        {"n": 2.5, "outTimes": [{"time": 1.5}], "events": [{"x": 2, "inTarget": True}], "__doc_id": "b", "extra": None},
+        {"n": 3.0, "outTimes": [], "events": None, "__doc_id": "c", "extra": "z"},
+    ]
+
+
+def test_export_conflicting_types_fail(fetch, tmp_path):
+    client = FakeClient()
+    client.add("fitts_trials", {"trialIndex": 1}, doc_id="a")
+    client.add("fitts_trials", {"trialIndex": "one"}, doc_id="b")
+    with pytest.raises(ValueError, match="trialIndex"):
+        fetch.export_collection(client, "fitts_trials", tmp_path / "trials.parquet", batch_size=1)
+
+
+def test_export_empty_collection(fetch, tmp_path):
+    assert fetch.export_collection(FakeClient(), "fitts_trials", tmp_path / "trials.parquet") == 0
+    assert pq.read_table(tmp_path / "trials.parquet").column_names == ["__doc_id"]
+
+
+# Incremental fetch and compact
+
+
+def _snapshot(fetch, prefix):
+    return pd.read_parquet(sorted(fetch.OUT_DIR.glob(f"{prefix}_*.parquet"))[-1])
+
+
+def test_incremental_fetch_writes_only_new_documents(fetch):
+    client = make_fake_client(2, trials_per_participant=5)
+    fetch.fetch_incremental(client, "20260101_000000")
+    assert len(_snapshot(fetch, "trials")) == 10
+    assert not list(fetch.DELTA_DIR.glob("*.parquet"))
+
+    fetch.fetch_incremental(client, "20260101_000001")  # nothing new
+    assert not list(fetch.DELTA_DIR.glob("*.parquet"))
+
+    new = add_fake_participants(client, 1, trials_per_participant=5, start=datetime(2026, 2, 1), seed=1)
+    fetch.fetch_incremental(client, "20260101_000002")
+    delta = pd.read_parquet(fetch.DELTA_DIR / "trials_delta_20260101_000002.parquet")
+    assert len(delta) == 5 and set(delta["participantId"]) == set(new)
+
+
+def test_late_upload_with_clock_behind_is_fetched(fetch):
+    client = make_fake_client(1, trials_per_participant=5)
+    fetch.fetch_incremental(client, "20260101_000000")
+
+    # Browser clock a day behind, uploaded after the watermark was taken
+    late = {"participantId": "p", "timestamp": "2025-12-31T00:00:00.000Z",
+            "uploadedAt": datetime(2026, 3, 1, tzinfo=timezone.utc)}
+    doc_id = client.add("fitts_trials", late)
+    fetch.fetch_incremental(client, "20260101_000001")
+    delta = pd.read_parquet(fetch.DELTA_DIR / "trials_delta_20260101_000001.parquet")
+    assert list(delta["__doc_id"]) == [doc_id]
+
+
+def test_watermark_ties_are_not_lost(fetch):
+    client = FakeClient()
+    at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    client.add("fitts_trials", {"uploadedAt": at}, doc_id="m")
+    fetch.fetch_incremental(client, "20260101_000000")
+    watermark = json.loads(fetch.WATERMARK_FILE.read_text())["fitts_trials"]
+    assert watermark["doc_ids"] == ["m"]
+
+    # Same server timestamp as the watermark, on both sides of its doc id
+    client.add("fitts_trials", {"uploadedAt": at}, doc_id="a")
+    client.add("fitts_trials", {"uploadedAt": at}, doc_id="z")
+    fetch.fetch_incremental(client, "20260101_000001")
+    delta = pd.read_parquet(fetch.DELTA_DIR / "trials_delta_20260101_000001.parquet")
+    assert sorted(delta["__doc_id"]) == ["a", "z"]
+    watermark = json.loads(fetch.WATERMARK_FILE.read_text())["fitts_trials"]
+    assert watermark["doc_ids"] == ["a", "m", "z"]
+
+    client.add("fitts_trials", {"uploadedAt": at + timedelta(milliseconds=1)}, doc_id="b")
+    fetch.fetch_incremental(client, "20260101_000002")
+    delta = pd.read_parquet(fetch.DELTA_DIR / "trials_delta_20260101_000002.parquet")
+    assert list(delta["__doc_id"]) == ["b"]
+
+
+def test_watermark_on_the_browser_timestamp_is_reseeded(fetch):
+    client = make_fake_client(1, trials_per_participant=3)
+    fetch.save_watermarks({"fitts_trials": {"field": "timestamp", "value": "2099-01-01T00:00:00.000Z", "doc_id": "x"}})
+    fetch.fetch_incremental(client, "20260101_000000")
+    assert len(_snapshot(fetch, "trials")) == 3
+    assert json.loads(fetch.WATERMARK_FILE.read_text())["fitts_trials"]["field"] == "uploadedAt"
+
+
+def test_compact_merges_deltas_into_a_snapshot(fetch):
+    client = make_fake_client(1, trials_per_participant=4)
+    fetch.fetch_incremental(client, "20260101_000000")
+    add_fake_participants(client, 1, trials_per_participant=3, start=datetime(2026, 2, 1), seed=1)
+    fetch.fetch_incremental(client, "20260101_000001")
+    add_fake_participants(client, 1, trials_per_participant=2, start=datetime(2026, 3, 1), seed=2)
+    fetch.fetch_incremental(client, "20260101_000002")
+
+    # A document fetched twice (e.g. re-uploaded): the copy of the latest delta wins
+    first = _snapshot(fetch, "trials").iloc[[0]].assign(trialIndex=99)
+    first.to_parquet(fetch.DELTA_DIR / "trials_delta_20260101_000003.parquet", index=False)
+
+    fetch.compact("20260101_000004")
+    assert not list(fetch.DELTA_DIR.glob("trials_delta_*.parquet"))
+    merged = _snapshot(fetch, "trials")
+    assert len(merged) == 9 and merged["__doc_id"].is_unique
+    assert merged.set_index("__doc_id").loc[first["__doc_id"].iloc[0], "trialIndex"] == 99
+    assert set(merged["__doc_id"]) == set(fetch.fetch_collection(client, "fitts_trials")["__doc_id"])
+
+
+# Parallel fetch
+
+
+def test_parallel_matches_serial(fetch):
+    client = make_fake_client(7, trials_per_participant=5, seed=4, failure_rate=0.2)
+    client.add("fitts_trials", {"participantId": None, "trialIndex": 0}, doc_id="null-pid")
+    client.add("fitts_trials", {"participantId": "not-registered", "trialIndex": 0}, doc_id="unknown-pid")
+    participants, trials, pre_trials = fetch.fetch_parallel(client, workers=4, pids_per_page=2, retries=10, backoff=0.0)
+
+    client.failure_rate = 0.0
+    expected = fetch.fetch_collection(client, "fitts_trials").sort_values("__doc_id", ignore_index=True)
+    assert {"null-pid", "unknown-pid"} <= set(trials["__doc_id"])
+    pd.testing.assert_frame_equal(trials, expected)
+    assert len(participants) == 7 and len(pre_trials) == 21
+
+
+def test_parallel_falls_back_on_trials_without_participant(fetch, capsys):
+    client = make_fake_client(3, trials_per_participant=5)
+    client.add("fitts_trials", {"trialIndex": 0}, doc_id="no-pid")
+    client.add("fitts_trials", {"participantId": None, "trialIndex": 1}, doc_id="null-pid")
+    _, trials, _ = fetch.fetch_parallel(client, workers=2, pids_per_page=1, backoff=0.0)
+    assert "16 of 17" in capsys.readouterr().out
+    pd.testing.assert_frame_equal(trials, fetch.fetch_collection(client, "fitts_trials").sort_values("__doc_id", ignore_index=True))
+
+
+@pytest.mark.parametrize("pids_per_page", [3, 10])
+def test_parallel_single_range_has_no_duplicates(fetch, pids_per_page):
+    client = make_fake_client(3, trials_per_participant=5)
+    client.add("fitts_trials", {"participantId": None, "trialIndex": 0}, doc_id="null-pid")
+    client.add("fitts_trials", {"trialIndex": 1}, doc_id="no-pid")
+    _, trials, _ = fetch.fetch_parallel(client, workers=2, pids_per_page=pids_per_page, backoff=0.0)
+    assert trials["__doc_id"].is_unique and len(trials) == 17
+    pd.testing.assert_frame_equal(trials, fetch.fetch_collection(client, "fitts_trials").sort_values("__doc_id", ignore_index=True))
+
+
+def test_backoff_flag(fetch, monkeypatch):
+    seen = {}
+    monkeypatch.setattr(fetch, "fetch_parallel", lambda client, **kwargs: seen.update(kwargs) or (pd.DataFrame(),) * 3)
+    fetch.main(["--fake", "1", "--workers", "2", "--retries", "5", "--backoff", "0.1"])
+    assert seen["retries"] == 5 and seen["backoff"] == 0.1
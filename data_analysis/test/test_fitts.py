@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+import bench_fitts
+
+fitts = bench_fitts.fitts
+
+
+@pytest.fixture
+def trials(processed_trials):
+    """Fake trials with the MT/dx columns, plus a zero-length movement and two missing endpoints."""
+    return bench_fitts.prepare_trials(processed_trials)
+
+
+def test_endpoint_projections_match_the_per_row_version(trials):
+    got = fitts.calculate_endpoint_projections(trials)
+    pd.testing.assert_frame_equal(got, bench_fitts.endpoint_projections_reference(trials), check_exact=True)
+
+    assert got.iloc[-3].isna().all()  # zero-length movement
+    assert np.isnan(got['dx_indication_down'].iloc[-2]) and np.isnan(got['dx_reaching'].iloc[-1])
+    assert got.iloc[:-3].notna().all().all()
+
+
+
+@pytest.mark.parametrize("by_participant", [False, True], ids=["condition", "participant"])
+@pytest.mark.filterwarnings("ignore:invalid value encountered in log2")  # random fake endpoints: some Ae < 0
+def test_condition_metrics_match_the_per_group_version(trials, by_participant):
+    grouping_vars = fitts.CONDITION_VARS + (['participantId'] if by_participant else [])
+    got = fitts.aggregate_condition_metrics(trials, grouping_vars)
+    expected = bench_fitts.condition_metrics_reference(trials, grouping_vars)
+    # grouped mean/std sum in a different order than Series.mean/std: equal up to rounding
+    pd.testing.assert_frame_equal(got, expected, check_exact=False, rtol=1e-12, atol=1e-9)
+    assert set(got['time_type']) == set(fitts.TIME_TYPES)
+    assert (got['n_trials'] == 1).any() == got['MT_std'].isna().any()  # single-trial groups have no std
+
+
+@pytest.mark.filterwarnings("ignore:invalid value encountered in log2")
+def test_bootstrap_is_deterministic_across_workers(trials):
+    serial = fitts.bootstrap_condition_metrics(trials, n_boot=200, seed=7)
+    pd.testing.assert_frame_equal(fitts.bootstrap_condition_metrics(trials, n_boot=200, seed=7), serial,
+                                  check_exact=True)
+    pd.testing.assert_frame_equal(fitts.bootstrap_condition_metrics(trials, n_boot=200, seed=7, workers=3, chunksize=2),
+                                  serial, check_exact=True)
+    assert not serial.equals(fitts.bootstrap_condition_metrics(trials, n_boot=200, seed=8))
+
+    # Same rows as the point estimates, low <= high
+    keys = fitts.CONDITION_VARS + ['time_type']
+    point = fitts.aggregate_condition_metrics(trials)
+    pd.testing.assert_frame_equal(serial[keys], point[keys])
+    for metric in fitts.BOOTSTRAP_METRICS:
+        both = serial[[f'{metric}_ci_low', f'{metric}_ci_high']].dropna()
+        assert len(both) > 0 and (both[f'{metric}_ci_low'] <= both[f'{metric}_ci_high']).all()
+
+
+@pytest.mark.filterwarnings("ignore:invalid value encountered in log2")
+def test_unchanged_plots_are_not_rendered_again(trials, tmp_path, monkeypatch):
+    pytest.importorskip("matplotlib")
+    monkeypatch.setattr(fitts.up, "PROCESSED_DATA", str(tmp_path))
+    conditions = fitts.aggregate_condition_metrics(trials)
+    plot_dir = tmp_path / "fitts_plots" / "preview"
+
+    first = fitts.render_fitts_plots(conditions, preview=True)
+    assert len(first) > 3 and sorted(first) == sorted(p.name for p in plot_dir.glob("*.png"))
+    mtimes = {p.name: p.stat().st_mtime_ns for p in plot_dir.glob("*.png")}
+    assert fitts.render_fitts_plots(conditions, preview=True) == []
+    assert {p.name: p.stat().st_mtime_ns for p in plot_dir.glob("*.png")} == mtimes
+
+    # New MT for one condition and time type: its plot and that time type's overview
+    changed = conditions.copy()
+    row = changed.index[(changed['time_type'] == 'reaching') & changed['MT_mean'].notna()][0]
+    changed.loc[row, 'MT_mean'] += 0.1
+    feedback, buffer, indication = changed.loc[row, ['feedbackMode', 'buffer', 'indication']]
+    assert sorted(fitts.render_fitts_plots(changed, preview=True, workers=2)) == sorted(
+        [f"fitts_law_{feedback}_buffer{buffer}_{indication}.png", "fitts_law_all_conditions_reaching.png"])
+
+    (plot_dir / first[0]).unlink()
+    assert fitts.render_fitts_plots(changed, preview=True) == [first[0]]
+    assert sorted(fitts.render_fitts_plots(changed, preview=True, force=True)) == sorted(first)
+
+@pytest.fixture
+def success_trials(processed_trials, tmp_path, monkeypatch):
+    """load_success_trials on the fake trials, with the nominal ID that --stats adds."""
+    pytest.importorskip("statsmodels.formula.api")
+    processed_trials.to_csv(tmp_path / "trials_latest.csv", index=False)
+    monkeypatch.setattr(fitts.up, "TRIALS_FILE_CSV", str(tmp_path / "trials_latest.csv"))
+    monkeypatch.setattr(fitts.up, "STATS_CACHE_DIR", str(tmp_path / "stats_cache"))
+    df = fitts.load_success_trials(verbose=False)
+    df['ID_nominal'] = np.log2(df['A'] / df['W'] + 1)
+    return df
+
+
+@pytest.mark.filterwarnings("ignore:The design matrix is rank-deficient")  # few fake trials per cell
+def test_second_stats_run_reads_every_test_from_the_cache(success_trials, tmp_path, capsys):
+    n_tests = 3 * len(fitts.STAT_TESTS)
+    fitts.perform_statistical_analysis(success_trials, save_results=False)
+    assert f"{n_tests} tests: 0 from cache, {n_tests} computed" in capsys.readouterr().out
+    fitts.perform_statistical_analysis(success_trials, save_results=False, workers=2)
+    assert f"{n_tests} tests: {n_tests} from cache, 0 computed" in capsys.readouterr().out
+
+
+@pytest.mark.filterwarnings("ignore:The design matrix is rank-deficient")  # few fake trials per cell
+def test_stats_cache_is_trimmed(success_trials, tmp_path, capsys):
+    cache_dir = tmp_path / "stats_cache"
+    fitts.perform_statistical_analysis(success_trials, save_results=False, only=['anova'])
+    sizes = sorted(p.stat().st_size for p in cache_dir.glob("*.pkl"))
+    assert len(sizes) == 3
+
+    # Room for the three ANOVAs only: the post-hoc results stored on top push the cache over its cap
+    fitts.perform_statistical_analysis(success_trials, save_results=False, only=['anova', 'feedback'],
+                                       cache_max_mb=sum(sizes) / 1024 / 1024)
+    out = capsys.readouterr().out
+    assert "6 tests: 3 from cache, 3 computed" in out and "old results evicted" in out
+    assert sum(p.stat().st_size for p in cache_dir.glob("*.pkl")) <= sum(sizes)
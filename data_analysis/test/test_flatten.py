@@ -0,0 +1,127 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fake_firestore import make_fake_client
+from fitts import load_script
+from trace_codec import trace_positions
+import utils_paths as up
+
+flatten = load_script("1_flatten_data.py")
+
+
+def _raw_table(fetch, tmp_path, client):
+    """The raw trials snapshot of a fake client, as 0_fetchdata_firestore.py writes it."""
+    fetch.export_collection(client, "fitts_trials", tmp_path / "trials.parquet", batch_size=7)
+    return pq.read_table(tmp_path / "trials.parquet")
+
+
+def _engines(table):
+    """Positions of the reference loop and of the columnar engine for a raw trials table."""
+    df_trials = table.to_pandas()
+    expected = flatten.flatten_positions_loop(df_trials)
+    got = flatten.flatten_positions_columnar(df_trials, flatten._column(table, "cursorPositions"),
+                                             flatten._column(table, "cursorTrace"))
+    return got, expected
+
+
+def test_columnar_matches_loop(fetch, tmp_path):
+    table = _raw_table(fetch, tmp_path, make_fake_client(3, trials_per_participant=6, seed=1))
+    got, expected = _engines(table)
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(got, expected, check_exact=True)
+
+
+def test_columnar_matches_loop_with_missing_positions():
+    point = lambda t, x, y: {"time": t, "x": x, "y": y}
+    rows = [
+        {"__doc_id": "a", "participantId": "p1", "W": 40, "A": 200, "ID": 2.58, "buffer": 0,
+         "indication": "click", "feedbackMode": "none", "targetPosition": {"x": 10.0, "y": 5.0},
+         "indicationsDown": [{"x": 9.5, "y": 5.0, "time": 3.0}], "indicationsUp": [],
+         "cursorPositions": [point(0.0, 0.0, 0.0), point(1.5, 3.25, 1.0), point(3.0, 9.5, 5.0)]},
+        {"__doc_id": "b", "participantId": "p1", "W": 40, "A": 200, "ID": 2.58, "buffer": 0,
+         "indication": "click", "feedbackMode": "none", "targetPosition": {"x": 10.0, "y": 5.0},
+         "indicationsDown": [], "indicationsUp": [], "cursorPositions": []},
+        {"__doc_id": "c", "participantId": "p2", "W": 20, "A": 400, "ID": 4.39, "buffer": 10,
+         "indication": "key", "feedbackMode": "visual", "targetPosition": {"x": -4.0, "y": 2.0},
+         "indicationsDown": [], "indicationsUp": [{"x": -4.0, "y": 2.5, "time": 2.0}], "cursorPositions": None},
+        {"__doc_id": "d", "participantId": "p2", "W": 20, "A": 400, "ID": 4.39, "buffer": 10,
+         "indication": "key", "feedbackMode": "visual", "targetPosition": {"x": -4.0, "y": 2.0},
+         "indicationsDown": [], "indicationsUp": [], "cursorPositions": [point(0.25, -1.0, 0.5)]},
+    ]
+    got, expected = _engines(pa.Table.from_pylist(rows))
+    assert expected["trialDocId"].tolist() == ["a", "a", "a", "d"]
+    pd.testing.assert_frame_equal(got, expected, check_exact=True)
+
+
+def test_mixed_packed_snapshot(fetch, tmp_path, monkeypatch, capsys):
+    client = make_fake_client(3, trials_per_participant=8, seed=2, packed_fraction=0.5)
+    fetch.export_collection(client, "fitts_trials", tmp_path / "trials_20260101_000000.parquet", batch_size=5)
+    fetch.export_collection(client, "fitts_pre_trials", tmp_path / "pre_trials_20260101_000000.parquet")
+    table = pq.read_table(tmp_path / "trials_20260101_000000.parquet")
+    packed = table.column("cursorTrace").is_valid().to_numpy(zero_copy_only=False)
+    assert 0 < packed.sum() < len(packed)
+
+    # Same snapshot through the script, as `1_flatten_data.py --check-parity`
+    monkeypatch.setattr(flatten, "RAW", tmp_path)
+    flatten.main(["--check-parity"])
+    assert "Parity OK" in capsys.readouterr().out
+
+    got, _ = _engines(table)
+    df_trials = table.to_pandas()
+    for _, r in df_trials.iterrows():
+        samples = got[got["trialDocId"] == r["__doc_id"]]
+        expected = trace_positions(r["cursorTrace"]) if isinstance(r["cursorTrace"], str) else list(r["cursorPositions"])
+        assert samples["source"].unique().tolist() == ["cursorTrace" if isinstance(r["cursorTrace"], str) else "cursorPositions"]
+        assert samples["t"].tolist() == [p["time"] for p in expected]
+        assert samples["x"].tolist() == [p["x"] for p in expected]
+        assert samples["y"].tolist() == [p["y"] for p in expected]
+
+    summary, _ = flatten.summarize_trials(df_trials)
+    first = got.groupby("trialDocId", sort=False)[["x", "y"]].first()
+    assert summary.set_index("trialDocId")["Start_position_x"].equals(first["x"].rename("Start_position_x"))
+
+
+def test_scripts_exit_cleanly(fetch, tmp_path):
+    """The scripts as run_pipeline.py starts them: a crash at interpreter exit fails the stage."""
+    raw = tmp_path / "data" / "raw"
+    raw.mkdir(parents=True)
+    client = make_fake_client(4, trials_per_participant=10, seed=5)
+    fetch.export_collection(client, "fitts_trials", raw / "trials_20260101_000000.parquet")
+    fetch.export_collection(client, "fitts_pre_trials", raw / "pre_trials_20260101_000000.parquet")
+
+    env = dict(os.environ, FITTS_DATA_DIR=str(tmp_path / "data"))
+    for script in ["1_flatten_data.py", "1_flatten_data.py", "2_movement_analysis.py", "2_movement_analysis.py"]:
+        result = subprocess.run([sys.executable, script], cwd=Path(up.__file__).parent, env=env,
+                                capture_output=True, text=True)
+        assert result.returncode == 0, f"{script}: {result.stderr[-2000:]}"
+
+    # The partitioned segments (write_partitioned) hold the same rows as submovements.parquet
+    processed = tmp_path / "data" / "processed"
+    segments = pd.read_parquet(processed / "submovements.parquet")
+    assert len(segments) > 0
+    partitioned = up.read_partitioned(str(processed / "submovements"))
+    assert partitioned["participantId"].nunique() == 4
+    key = ["trialDocId", "t_start", "t_end"]
+    pd.testing.assert_frame_equal(partitioned[segments.columns].sort_values(key, ignore_index=True),
+                                  segments.sort_values(key, ignore_index=True))
+
+
+def test_partitioned_round_trip(tmp_path):
+    df = pd.DataFrame({"participantId": ["b", "a/1", "b", None, "a/1"], "feedbackMode": ["none", "green", "green", "none", "green"],
+                       "t": [0.0, 1.0, 2.0, 3.0, 4.0]})
+    up.write_partitioned(df, tmp_path / "ds", up.CONDITION_PARTITION_COLS)
+    assert sorted(p.relative_to(tmp_path / "ds").as_posix() for p in (tmp_path / "ds").rglob("*.parquet")) == [
+        "participantId=__HIVE_DEFAULT_PARTITION__/feedbackMode=none/part-0.parquet",
+        "participantId=a%2F1/feedbackMode=green/part-0.parquet",
+        "participantId=b/feedbackMode=green/part-0.parquet",
+        "participantId=b/feedbackMode=none/part-0.parquet",
+    ]
+    got = up.read_partitioned(tmp_path / "ds", columns=["t", "participantId", "feedbackMode"])
+    pd.testing.assert_frame_equal(got.sort_values("t", ignore_index=True), df[["t", "participantId", "feedbackMode"]])
+
+    one = up.read_partitioned(tmp_path / "ds", filters=[("participantId", "==", "b"), ("feedbackMode", "==", "green")])
+    assert one["t"].tolist() == [2.0]
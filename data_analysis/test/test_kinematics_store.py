@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+import submovements as sm
+from kinematics_store import KINEMATICS_COLUMNS, SIGNAL_COLUMNS, read_kinematics, read_metadata, write_kinematics
+from fitts import load_script
+
+movement = load_script("2_movement_analysis.py")
+
+
+@pytest.fixture(scope="module")
+def kinematics():
+    """Kinematics frame of 2_movement_analysis.py for a few random trials, each with a sampling gap."""
+    rng = np.random.default_rng(2)
+    trials = []
+    for k in range(8):
+        n = int(rng.integers(60, 200))
+        t = np.cumsum(rng.uniform(2, 20, n)) + rng.uniform(0, 50)
+        t[n // 2:] += rng.uniform(60, 300)  # longer than ResampleCfg.gap_ms
+        trials.append(pd.DataFrame({"trialDocId": f"trial{k:02d}", "t": t, "x": np.cumsum(rng.normal(3, 2, n)),
+                                    "y": np.cumsum(rng.normal(1, 2, n))}))
+    _, kinematic_rows = movement.analyze_trials(pd.concat(trials, ignore_index=True))
+    df = pd.concat(kinematic_rows, ignore_index=True)
+    df.loc[df.index[::97], "gap_boundary"] = True  # rare in real data, set a few to cover the flag bit
+    return df
+
+
+def test_round_trip(kinematics, tmp_path):
+    df = kinematics
+    assert list(df.columns) == KINEMATICS_COLUMNS
+    assert df["segment_id"].isna().any() and df["imputed"].any() and df["gap_boundary"].any()
+    write_kinematics(df, tmp_path / "kinematics.parquet", dt_ms=sm.ResampleCfg.dt_ms)
+
+    got = read_kinematics(tmp_path / "kinematics.parquet")
+    exact = [col for col in KINEMATICS_COLUMNS if col not in SIGNAL_COLUMNS]
+    pd.testing.assert_frame_equal(got[exact], df[exact], check_exact=True)
+    pd.testing.assert_frame_equal(got[SIGNAL_COLUMNS], df[SIGNAL_COLUMNS].astype(np.float32).astype(np.float64),
+                                  check_exact=True)
+
+    compact = read_kinematics(tmp_path / "kinematics.parquet", compact=True)
+    assert compact["trialDocId"].dtype == "category" and compact["x"].dtype == np.float32
+    assert compact["segment_id"].isna().sum() == df["segment_id"].isna().sum()
+
+
+def test_stored_columns(kinematics, tmp_path):
+    df = kinematics
+    write_kinematics(df, tmp_path / "kinematics.parquet", dt_ms=sm.ResampleCfg.dt_ms)
+    table = pq.read_table(tmp_path / "kinematics.parquet")
+    assert "t" not in table.column_names
+
+    segment_id = table.column("segment_id").to_numpy()
+    np.testing.assert_array_equal(segment_id == -1, df["segment_id"].isna())
+    flags = table.column("flags").to_numpy()
+    np.testing.assert_array_equal((flags & 1) != 0, df["imputed"])
+    np.testing.assert_array_equal((flags & 2) != 0, df["gap_boundary"])
+
+    # t comes back from the per-trial t0 and dt_ms of the metadata
+    metadata = read_metadata(tmp_path / "kinematics.parquet")
+    first = df.groupby("trialDocId", sort=False)["t"].first()
+    assert metadata["dt_ms"] == sm.ResampleCfg.dt_ms
+    assert metadata["trialDocId"] == first.index.tolist() and metadata["t0"] == first.tolist()
+
+
+def test_read_some_trials_and_columns(kinematics, tmp_path):
+    df = kinematics
+    write_kinematics(df, tmp_path / "kinematics.parquet", dt_ms=sm.ResampleCfg.dt_ms)
+    some = ["trial05", "trial02"]
+    got = read_kinematics(tmp_path / "kinematics.parquet", trial_ids=some, columns=["t", "gap_boundary", "trialDocId"])
+    expected = df.loc[df["trialDocId"].isin(some), ["t", "gap_boundary", "trialDocId"]].reset_index(drop=True)
+    pd.testing.assert_frame_equal(got, expected, check_exact=True)
+
+    with pytest.raises(ValueError, match="Unknown kinematics columns"):
+        read_kinematics(tmp_path / "kinematics.parquet", columns=["t", "speed"])
+
+
+def test_rejects_what_it_cannot_rebuild(kinematics, tmp_path):
+    shifted = kinematics.copy()
+    shifted.loc[5, "t"] += 0.5
+    with pytest.raises(ValueError, match="uniform"):
+        write_kinematics(shifted, tmp_path / "kinematics.parquet", dt_ms=sm.ResampleCfg.dt_ms)
+
+    first = kinematics[kinematics["trialDocId"] == "trial00"]
+    split = pd.concat([first.iloc[:10], kinematics[kinematics["trialDocId"] == "trial01"], first.iloc[10:]])
+    with pytest.raises(ValueError, match="contiguous"):
+        write_kinematics(split, tmp_path / "kinematics.parquet", dt_ms=sm.ResampleCfg.dt_ms)
+    assert not (tmp_path / "kinematics.parquet").exists()
@@ -0,0 +1,30 @@
+import pytest
+import run_pipeline
+
+
+@pytest.fixture
+def calls(tmp_path, monkeypatch):
+    """Stages run_pipeline.main starts, as (script, args), without running them."""
+    started = []
+    monkeypatch.setattr(run_pipeline, "STATE_FILE", tmp_path / "state.json")
+    monkeypatch.setattr(run_pipeline, "run_stage", lambda stage, profile=None: started.append((stage.script, stage.args)) or 0)
+    for stage in run_pipeline.STAGES:
+        monkeypatch.setattr(stage, "args", list(stage.args))
+        monkeypatch.setattr(stage, "inputs", [])  # nothing to fingerprint after the fake run
+    return started
+
+
+def test_fetch_args_are_split_like_a_shell(calls):
+    run_pipeline.main(["--fetch", "--only", "fetch", "--fetch-args", "--fake 3 --fake-latency '0.5'"])
+    assert calls == [("0_fetchdata_firestore.py", ["--fake", "3", "--fake-latency", "0.5"])]
+
+
+def test_incremental_fetch_is_compacted(calls):
+    run_pipeline.main(["--fetch", "--only", "fetch", "--fetch-args", "--incremental --fake 3"])
+    assert calls == [("0_fetchdata_firestore.py", ["--incremental", "--fake", "3"]),
+                     ("0_fetchdata_firestore.py", ["compact"])]
+
+
+def test_workers_go_to_the_movement_stage(calls):
+    run_pipeline.main(["--only", "movement", "--force", "movement", "--workers", "4"])
+    assert calls == [("2_movement_analysis.py", ["--workers", "4"])]
@@ -0,0 +1,53 @@
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from fake_firestore import make_fake_client
+from fitts import load_script
+from positions_store import POSITION_COLUMNS, read_positions, split_positions, write_positions
+
+flatten = load_script("1_flatten_data.py")
+
+
+@pytest.fixture
+def stored(fetch, tmp_path):
+    """
+    A fake snapshot (some trials packed) flattened both ways: the samples/trials tables
+    of the columnar engine, and the denormalized table of the reference loop as
+    positions_latest.parquet used to hold it.
+    """
+    client = make_fake_client(3, trials_per_participant=8, seed=9, packed_fraction=0.3)
+    fetch.export_collection(client, "fitts_trials", tmp_path / "raw.parquet")
+    table = pq.read_table(tmp_path / "raw.parquet")
+    df_trials = table.to_pandas()
+    samples, trials = flatten.flatten_samples_columnar(df_trials, flatten._column(table, "cursorPositions"),
+                                                       flatten._column(table, "cursorTrace"))
+    paths = {"samples_path": tmp_path / "samples.parquet", "trials_path": tmp_path / "position_trials.parquet"}
+    write_positions(samples, trials, **paths)
+    flatten.flatten_positions_loop(df_trials).to_parquet(tmp_path / "positions_latest.parquet", index=False)
+    return paths, pd.read_parquet(tmp_path / "positions_latest.parquet")
+
+
+def test_read_positions_equals_the_wide_table(stored):
+    paths, wide = stored
+    assert set(wide["source"]) == {"cursorPositions", "cursorTrace"}
+    pd.testing.assert_frame_equal(read_positions(**paths), wide, check_exact=True)
+
+    # Column subsets: Distance_to_target is recomputed from columns that are not returned
+    columns = ["t", "Distance_to_target", "feedbackMode"]
+    pd.testing.assert_frame_equal(read_positions(columns, **paths), wide[columns], check_exact=True)
+
+    some = wide["trialDocId"].drop_duplicates().iloc[::3].tolist()
+    expected = wide[wide["trialDocId"].isin(some)].reset_index(drop=True)
+    pd.testing.assert_frame_equal(read_positions(trial_ids=some, **paths), expected, check_exact=True)
+
+    with pytest.raises(ValueError, match="Unknown positions columns"):
+        read_positions(["t", "speed"], **paths)
+
+
+def test_split_of_the_wide_table(stored):
+    """The loop engine's wide table splits into the same tables the columnar engine writes."""
+    paths, wide = stored
+    samples, trials = split_positions(wide)
+    pd.testing.assert_frame_equal(samples, pd.read_parquet(paths["samples_path"]), check_exact=True)
+    pd.testing.assert_frame_equal(trials, pd.read_parquet(paths["trials_path"]), check_exact=True)
+    assert list(read_positions(**paths).columns) == POSITION_COLUMNS
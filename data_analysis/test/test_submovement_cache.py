@@ -0,0 +1,103 @@
+import os
+from dataclasses import replace
+import numpy as np
+import pandas as pd
+import pytest
+import submovements as sm
+from submovement_cache import SubmovementCache, trial_key
+from fitts import load_script
+
+movement = load_script("2_movement_analysis.py")
+
+
+def _trial(n=80, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"t": np.cumsum(rng.uniform(2, 20, n)), "x": np.cumsum(rng.normal(3, 2, n)),
+                         "y": np.cumsum(rng.normal(1, 2, n))})
+
+
+def _positions(n_trials=6):
+    return pd.concat([_trial(seed=k).assign(trialDocId=f"trial{k}") for k in range(n_trials)], ignore_index=True)
+
+
+def test_hit_and_miss(tmp_path):
+    cache = SubmovementCache(tmp_path)
+    trial = _trial()
+    key = trial_key(trial, sm.ResampleCfg(), sm.Thresholds())
+    assert cache.get(key) is None
+
+    result = sm.analyze_trial_positions(trial)
+    cache.put(key, result)
+    got = cache.get(key)
+    pd.testing.assert_frame_equal(got["uniform"], result["uniform"])
+    pd.testing.assert_frame_equal(got["segments"], result["segments"])
+
+    (tmp_path / f"{'0' * 64}.pkl").write_bytes(b"")  # an interrupted write reads as a miss
+    assert cache.get("0" * 64) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_key_changes_with_the_settings_and_the_samples():
+    trial = _trial()
+    key = trial_key(trial, sm.ResampleCfg(), sm.Thresholds())
+    assert trial_key(trial.copy(), sm.ResampleCfg(), sm.Thresholds()) == key
+
+    moved = trial.copy()
+    moved.loc[40, "x"] += 1e-9
+    assert trial_key(moved, sm.ResampleCfg(), sm.Thresholds()) != key
+    assert trial_key(trial.iloc[:-1], sm.ResampleCfg(), sm.Thresholds()) != key
+    assert trial_key(trial, sm.ResampleCfg(dt_ms=5), sm.Thresholds()) != key
+    assert trial_key(trial, sm.ResampleCfg(), replace(sm.Thresholds(), merge_midpoint_ratio=0.8)) != key
+
+
+def test_analyze_trials_reads_the_cache(tmp_path, monkeypatch):
+    positions = _positions()
+    expected = movement.analyze_trials(positions)
+
+    cache = SubmovementCache(tmp_path)
+    movement.analyze_trials(positions, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 6)
+
+    cache = SubmovementCache(tmp_path)
+    moved = positions.copy()
+    moved.loc[moved["trialDocId"] == "trial2", "x"] += 1.0  # new samples: a new key for that trial only
+    movement.analyze_trials(moved, cache=cache)
+    assert (cache.hits, cache.misses) == (5, 1)
+
+    cache = SubmovementCache(tmp_path)
+    got = movement.analyze_trials(positions, cache=cache)
+    assert (cache.hits, cache.misses) == (6, 0)
+    for got_frames, expected_frames in zip(got, expected):
+        pd.testing.assert_frame_equal(pd.concat(got_frames, ignore_index=True),
+                                      pd.concat(expected_frames, ignore_index=True), check_exact=True)
+
+    # Different thresholds miss every entry
+    monkeypatch.setattr(movement, "Thresholds", lambda: sm.Thresholds(slow_speed_min=0.06))
+    cache = SubmovementCache(tmp_path)
+    movement.analyze_trials(positions, cache=cache)
+    assert (cache.hits, cache.misses) == (0, 6)
+
+
+def test_trim_evicts_the_least_recently_used(tmp_path):
+    cache = SubmovementCache(tmp_path)
+    payload = np.zeros(100_000, dtype=np.uint8)  # ~100 kB per entry
+    for k in range(5):
+        cache.put(f"key{k}", payload)
+        os.utime(tmp_path / f"key{k}.pkl", (1000 + k, 1000 + k))  # key0 oldest ... key4 newest
+    assert cache.get("key0") is not None  # a hit makes key0 the most recently used
+
+    size = (tmp_path / "key0.pkl").stat().st_size
+    cache.max_bytes = 3 * size
+    assert cache.trim() == 2
+    assert sorted(p.stem for p in tmp_path.glob("*.pkl")) == ["key0", "key3", "key4"]
+    assert cache.trim() == 0
+    assert cache.evicted == 2
+
+
+@pytest.mark.parametrize("max_mb, kept", [(0, 0), (1, 6)])
+def test_analyze_trials_trims_to_max_mb(tmp_path, max_mb, kept):
+    cache = SubmovementCache(tmp_path, max_mb=max_mb)
+    movement.analyze_trials(_positions(), cache=cache)
+    assert len(list(tmp_path.glob("*.pkl"))) == kept
+    assert cache.evicted == 6 - kept
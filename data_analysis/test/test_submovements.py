@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+import pytest
+import bench_submovements as bench
+import submovements as sm
+import submovements_reference as ref
+from fake_firestore import make_fake_client
+from fitts import load_script
+
+movement = load_script("2_movement_analysis.py")
+flatten = load_script("1_flatten_data.py")
+
+
+@pytest.fixture(scope="module")
+def positions():
+    """Cursor samples (trialDocId, t, x, y) of a small fake snapshot, with sampling gaps cut into some trials."""
+    snaps = make_fake_client(4, trials_per_participant=8, seed=4).collection("fitts_trials").stream()
+    df_trials = pd.DataFrame([dict(snap.to_dict(), __doc_id=snap.id) for snap in snaps])
+    df = flatten.flatten_positions_loop(df_trials)[["trialDocId", "t", "x", "y"]]
+    rng = np.random.default_rng(4)
+    gaps = np.zeros(len(df), dtype=bool)
+    for start in rng.choice(len(df), 40, replace=False):  # gaps longer than ResampleCfg.gap_ms
+        gaps[start:start + rng.integers(4, 12)] = True
+    return df[~gaps].reset_index(drop=True)
+
+
+@pytest.fixture(scope="module")
+def trials(positions):
+    """One (t, x, y) frame per trial, as 2_movement_analysis.py hands them to the analysis."""
+    return [movement._prepare_trial(grp).reset_index(drop=True) for _, grp in positions.groupby("trialDocId")]
+
+
+def test_workers_give_the_serial_result(positions):
+    serial_segs, serial_kins = movement.analyze_trials(positions, workers=1)
+    assert len(serial_segs) > 0
+    for batch_filter in (False, True):
+        segs, kins = movement.analyze_trials(positions, workers=4, chunksize=3, batch_filter=batch_filter)
+        pd.testing.assert_frame_equal(pd.concat(segs, ignore_index=True), pd.concat(serial_segs, ignore_index=True),
+                                      check_exact=True)
+        pd.testing.assert_frame_equal(pd.concat(kins, ignore_index=True), pd.concat(serial_kins, ignore_index=True),
+                                      check_exact=True)
+
+
+def test_resample_matches_the_reference(trials):
+    cfg = sm.ResampleCfg()
+    gaps = 0
+    for trial in trials + [trial.iloc[:1] for trial in trials[:2]]:  # and single-sample trials
+        expected = ref.resample_uniform(trial, dt_ms=cfg.dt_ms, gap_ms=cfg.gap_ms)
+        got = sm.resample_uniform(trial, dt_ms=cfg.dt_ms, gap_ms=cfg.gap_ms)
+        pd.testing.assert_frame_equal(got, expected, check_exact=True)
+        gaps += expected["segment_id"].max() > 0
+    assert gaps > 0
+
+
+def test_detect_submovements_matches_the_reference(trials):
+    found = 0
+    for trial in trials:
+        args, kwargs = bench._kinematics_args(trial)
+        expected = ref.detect_submovements(*args, **kwargs)
+        assert sm.detect_submovements(*args, **kwargs) == expected
+        assert bench._detect_submovements_numpy(*args, **kwargs) == expected
+        found += len(expected)
+    assert found > 0
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_numpy_scan_matches_the_loop(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 300))
+    is_type = rng.random(n) < rng.uniform(0.2, 0.9)
+    zero_like = rng.random(n) < rng.uniform(0, 0.2)
+    accel_sign = rng.choice([-1.0, 1.0, np.nan], n, p=[0.45, 0.45, 0.1])
+    min_len, flip_end = int(rng.integers(1, 8)), int(rng.integers(1, 4))
+    got = sm._scan_segments_numpy(is_type, zero_like, accel_sign, min_len, flip_end)
+    expected = sm._scan_segments_loop(is_type, zero_like, accel_sign, min_len, flip_end)
+    np.testing.assert_array_equal(got[0], expected[0])
+    np.testing.assert_array_equal(got[1], expected[1])
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_runs_match_the_reference(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 200))
+    mask = rng.random(n) < rng.uniform(0.3, 0.9)
+    used_mask = rng.random(n) < 0.05
+    min_len = int(rng.integers(1, 6))
+
+    expected_runs = ref._label_runs(pd.Series(mask), used_mask)
+    assert sm._label_runs(pd.Series(mask), used_mask) == expected_runs
+    starts, ends, lengths = sm.true_runs(mask, used_mask, min_len=min_len)
+    assert list(zip(starts.tolist(), ends.tolist())) == [(s, e) for s, e in expected_runs if e - s + 1 >= min_len]
+    np.testing.assert_array_equal(lengths, ends - starts + 1)
+
+    # the former nested keep_min_len of detect_submovements, on top of the reference _label_runs
+    expected = mask.copy()
+    for s, e in expected_runs:
+        if (e - s + 1) < min_len:
+            expected[s:e+1] = False
+    np.testing.assert_array_equal(sm.keep_min_len(mask, min_len, used_mask), expected)
+    np.testing.assert_array_equal(sm.keep_min_len(mask, min_len),
+                                  sm.keep_min_len(mask, min_len, np.zeros(n, dtype=bool)))
+
+
+def test_run_length_encode_empty():
+    starts, ends, lengths, values = sm.run_length_encode(np.array([], dtype=bool))
+    assert len(starts) == len(ends) == len(lengths) == len(values) == 0
+    assert [len(a) for a in sm.true_runs(np.zeros(5, dtype=bool))] == [0, 0, 0]
+
+
+def test_filters_match_filtfilt(trials):
+    cfg = sm.ResampleCfg()
+    fs = 1000 / cfg.dt_ms
+    xys = [sm.resample_uniform(trial, dt_ms=cfg.dt_ms, gap_ms=cfg.gap_ms)[['x', 'y']].to_numpy() for trial in trials]
+    xys.append(np.random.default_rng(0).normal(size=(16, 2)))  # shortest length filtfilt accepts (padlen 15)
+    expected = [np.column_stack([ref.butter_lowpass_filter(xy[:, c], cutoff=sm.FILTER_CUTOFF_HZ, fs=fs) for c in (0, 1)])
+                for xy in xys]
+
+    for xy, e in zip(xys, expected):
+        np.testing.assert_array_equal(sm.butter_lowpass_filter(xy, cutoff=sm.FILTER_CUTOFF_HZ, fs=fs), e)
+    # 1-D and 2-D signals of different lengths, spread over several chunks
+    signals = xys + [xy[:, 0] for xy in xys]
+    got = sm.butter_lowpass_filter_batch(signals, cutoff=sm.FILTER_CUTOFF_HZ, fs=fs, chunk_size=7)
+    for g, e in zip(got, expected + [e[:, 0] for e in expected]):
+        assert g.shape == e.shape
+        np.testing.assert_allclose(g, e, rtol=0, atol=1e-9)
+
+    with pytest.raises(ValueError, match="padlen"):
+        sm.butter_lowpass_filter_batch([np.zeros(15)], cutoff=sm.FILTER_CUTOFF_HZ, fs=fs)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_range_argmax_matches_idxmax(seed):
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(1, 200))
+    values = rng.integers(0, 6, n).astype(float)  # many ties
+    starts = rng.integers(0, n, 50)
+    ends = np.minimum(starts + rng.integers(0, 30, 50), n - 1)  # overlapping, some up to the last sample
+    expected = [pd.Series(values[s:e+1], index=np.arange(s, e + 1)).idxmax() for s, e in zip(starts, ends)]
+    assert sm._range_argmax(values, starts, ends).tolist() == expected
+
+    t = np.arange(n) * 4.0
+    for value in rng.uniform(-10, 4 * n + 10, 20).tolist() + [2.0, 4.0 * (n - 1) + 2]:  # midpoints tie
+        assert sm._nearest_index(t, value) == int(np.abs(t - value).argmin())
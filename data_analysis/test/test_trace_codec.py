@@ -0,0 +1,101 @@
+import base64
+import json
+import shutil
+import subprocess
+from pathlib import Path
+import numpy as np
+import pytest
+from trace_codec import HEADER, TRACE_FORMAT_VERSION, decode_trace, decode_traces, encode_trace, trace_positions
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+
+def _samples(n, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.cumsum(rng.uniform(2, 20, n)) + 1234.567
+    x = np.cumsum(rng.integers(-40, 40, n)) + 400
+    y = np.cumsum(rng.integers(-40, 40, n)) + 300
+    return np.round(t, 3), x.astype(float), y.astype(float)
+
+
+def _empty_trace():
+    header = np.zeros(1, dtype=HEADER)
+    header["version"] = TRACE_FORMAT_VERSION
+    return base64.b64encode(header.tobytes()).decode("ascii")
+
+
+@pytest.mark.parametrize("n", [1, 2, 300])
+def test_round_trip(n):
+    t, x, y = _samples(n)
+    got_t, got_x, got_y = decode_trace(encode_trace(t, x, y))
+    np.testing.assert_array_equal(got_x, x)
+    np.testing.assert_array_equal(got_y, y)
+    np.testing.assert_allclose(got_t, t, rtol=0, atol=5e-4)
+    assert trace_positions(encode_trace(t, x, y))[0] == {"time": got_t[0], "x": x[0], "y": y[0]}
+
+
+def test_decode_restarts_at_every_trace():
+    traces = [_samples(5, seed=1), _samples(1, seed=2), _samples(8, seed=3)]
+    encoded = [encode_trace(*s) for s in traces]
+    lengths, t, x, y = decode_traces(encoded[:2] + [_empty_trace()] + encoded[2:])
+    assert lengths.tolist() == [5, 1, 0, 8]
+    np.testing.assert_array_equal(x, np.concatenate([s[1] for s in traces]))
+    np.testing.assert_array_equal(y, np.concatenate([s[2] for s in traces]))
+    np.testing.assert_allclose(t, np.concatenate([s[0] for s in traces]), rtol=0, atol=5e-4)
+
+
+def test_empty():
+    assert encode_trace([], [], []) is None
+    lengths, t, x, y = decode_traces([_empty_trace()])
+    assert lengths.tolist() == [0] and len(t) == len(x) == len(y) == 0
+    assert trace_positions(_empty_trace()) == []
+    assert decode_traces([])[0].tolist() == []
+
+
+def test_unsupported_version():
+    raw = bytearray(base64.b64decode(encode_trace(*_samples(3))))
+    raw[0] = TRACE_FORMAT_VERSION + 1
+    with pytest.raises(ValueError, match="version"):
+        decode_trace(base64.b64encode(bytes(raw)).decode("ascii"))
+
+
+def test_truncated():
+    raw = base64.b64decode(encode_trace(*_samples(3)))
+    for cut in (raw[:-4], raw[:HEADER.itemsize]):
+        with pytest.raises(ValueError, match="Truncated"):
+            decode_trace(base64.b64encode(cut).decode("ascii"))
+
+
+@pytest.mark.parametrize("x, y, t", [
+    ([0, 32767], [0, 0], [0, 1]),
+    ([0, -32768], [0, 0], [0, 1]),
+    ([0, 0], [0, -32768], [0, 1]),
+])
+def test_deltas_at_the_limits(x, y, t):
+    got_t, got_x, got_y = decode_trace(encode_trace(t, x, y))
+    assert got_x.tolist() == x and got_y.tolist() == y
+
+
+@pytest.mark.parametrize("x, y, t", [
+    ([0, 32768], [0, 0], [0, 1]),  # dx > int16
+    ([0, -32769], [0, 0], [0, 1]),  # dx < int16
+    ([0, 0], [0, 40000], [0, 1]),  # dy > int16
+    ([0, 1], [0, 1], [0, 2.2e6]),  # dt > int32 microseconds
+    ([2.0 ** 31, 0], [0, 0], [0, 1]),  # x0 > int32
+    ([0.5, 1], [0, 1], [0, 1]),  # not integer pixels
+    ([0, 1], [0, np.nan], [0, 1]),
+])
+def test_out_of_range_is_not_packed(x, y, t):
+    assert encode_trace(t, x, y) is None
+
+
+@pytest.mark.skipif(shutil.which("node") is None, reason="node is not installed")
+def test_same_traces_as_javascript():
+    samples = [_samples(n, seed=n) for n in (1, 2, 50)]
+    positions = [[{"time": ti, "x": xi, "y": yi} for ti, xi, yi in zip(*map(np.ndarray.tolist, s))] for s in samples]
+    script = ("const {encodeCursorTrace} = require('./trace_codec.js');"
+              "const input = JSON.parse(require('fs').readFileSync(0, 'utf8'));"
+              "console.log(JSON.stringify(input.map(encodeCursorTrace)));")
+    result = subprocess.run(["node", "-e", script], cwd=REPO_ROOT, input=json.dumps(positions),
+                            capture_output=True, text=True, check=True)
+    assert json.loads(result.stdout) == [encode_trace(*s) for s in samples]
@@ -9,7 +9,8 @@ async function saveTrialToFirestore(trial, participantId) {
     await db.collection("fitts_trials").add({
       participantId,
       timestamp: new Date().toISOString(),
-      ...trial
+      uploadedAt: firebase.firestore.FieldValue.serverTimestamp(),
+      ...(pack_cursor_traces ? packCursorPositions(trial) : trial)
     });
     console.log("Trial guardado en Firestore");
   } catch (error) {
@@ -39,7 +40,8 @@ async function savePreTrialToFirestore(trial, participantId) {
     await db.collection("fitts_pre_trials").add({
       participantId,
       timestamp: new Date().toISOString(),
-      ...trial
+      uploadedAt: firebase.firestore.FieldValue.serverTimestamp(),
+      ...(pack_cursor_traces ? packCursorPositions(trial) : trial)
     });
     console.log("Trial guardado en Firestore");
   } catch (error) {
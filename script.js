@@ -70,6 +70,7 @@ const latinSquare8 = [
 
 
 let record_results = true; // True if results should be recorded
+let pack_cursor_traces = false; // True to upload cursorPositions as a packed cursorTrace (trace_codec.js)
 
 //Experiment variables
 
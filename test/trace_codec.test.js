@@ -0,0 +1,76 @@
+// node --test: round trip and limits of trace_codec.js
+// (data_analysis/test/test_trace_codec.py checks the Python decoder against it)
+const test = require("node:test");
+const assert = require("node:assert/strict");
+const { TRACE_FORMAT_VERSION, encodeCursorTrace, decodeCursorTrace, packCursorPositions } = require("../trace_codec.js");
+
+function positions(n) {
+  const out = [];
+  let x = 400, y = 300, time = 1234.567;
+  for (let i = 0; i < n; i++) {
+    out.push({ x, y, time });
+    x += ((i * 37) % 81) - 40;
+    y += ((i * 53) % 81) - 40;
+    time = Math.round((time + 2 + (i % 18)) * 1000) / 1000;
+  }
+  return out;
+}
+
+function emptyTrace() {
+  const bytes = new Uint8Array(24);
+  bytes[0] = TRACE_FORMAT_VERSION;
+  return Buffer.from(bytes).toString("base64");
+}
+
+test("round trip", () => {
+  for (const n of [1, 2, 300]) {
+    assert.deepEqual(decodeCursorTrace(encodeCursorTrace(positions(n))), positions(n));
+  }
+});
+
+test("empty traces", () => {
+  assert.equal(encodeCursorTrace([]), null);
+  assert.deepEqual(decodeCursorTrace(emptyTrace()), []);
+});
+
+test("unsupported version", () => {
+  const bytes = Buffer.from(encodeCursorTrace(positions(3)), "base64");
+  bytes[0] = TRACE_FORMAT_VERSION + 1;
+  assert.throws(() => decodeCursorTrace(bytes.toString("base64")), /version/);
+});
+
+test("truncated trace", () => {
+  const bytes = Buffer.from(encodeCursorTrace(positions(3)), "base64");
+  for (const cut of [bytes.subarray(0, bytes.length - 4), bytes.subarray(0, 24)]) {
+    assert.throws(() => decodeCursorTrace(cut.toString("base64")), /Truncated/);
+  }
+});
+
+test("deltas at the limits", () => {
+  for (const dx of [32767, -32768]) {
+    const trial = [{ x: 0, y: 0, time: 0 }, { x: dx, y: 0, time: 1 }];
+    assert.deepEqual(decodeCursorTrace(encodeCursorTrace(trial)), trial);
+  }
+});
+
+test("out of range is not packed", () => {
+  const cases = [
+    [{ x: 0, y: 0, time: 0 }, { x: 32768, y: 0, time: 1 }],
+    [{ x: 0, y: 0, time: 0 }, { x: -32769, y: 0, time: 1 }],
+    [{ x: 0, y: 0, time: 0 }, { x: 0, y: 40000, time: 1 }],
+    [{ x: 0, y: 0, time: 0 }, { x: 1, y: 1, time: 2.2e6 }],
+    [{ x: 2 ** 31, y: 0, time: 0 }],
+    [{ x: 0.5, y: 0, time: 0 }, { x: 1, y: 1, time: 1 }],
+    [{ x: 0, y: 0, time: 0 }, { x: 1, y: NaN, time: 1 }],
+  ];
+  for (const trial of cases) {
+    assert.equal(encodeCursorTrace(trial), null);
+    assert.deepEqual(packCursorPositions({ trialIndex: 1, cursorPositions: trial }).cursorPositions, trial);
+  }
+});
+
+test("packCursorPositions replaces cursorPositions", () => {
+  const packed = packCursorPositions({ trialIndex: 1, cursorPositions: positions(5) });
+  assert.equal(packed.cursorPositions, undefined);
+  assert.deepEqual(decodeCursorTrace(packed.cursorTrace), positions(5));
+});
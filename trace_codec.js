@@ -0,0 +1,108 @@
+// Packed cursor traces (cursorTrace field), an alternative to uploading
+// cursorPositions as a Firestore array of {x, y, time} maps.
+//
+// A trace is one base64 string of a little-endian binary blob (format v1):
+//   header (24 bytes): uint8 version, 3 reserved bytes, uint32 n,
+//                      int32 x0, int32 y0, float64 t0 (integer microseconds)
+//   Int16 dx[n-1], Int16 dy[n-1]  position deltas (px)
+//   Int32 dt[n-1]                 time deltas (microseconds)
+// Positions are kept exactly, times are rounded to the microsecond
+// (performance.now() is coarser than that anyway). A trial whose positions
+// are not integer pixels, or whose deltas don't fit, is not packed:
+// encodeCursorTrace returns null and the trial keeps cursorPositions.
+// data_analysis/scripts/trace_codec.py decodes it.
+
+const TRACE_FORMAT_VERSION = 1;
+const TRACE_HEADER_BYTES = 24;
+
+function bytesToBase64(bytes) {
+  if (typeof Buffer !== "undefined") {
+    return Buffer.from(bytes.buffer, bytes.byteOffset, bytes.byteLength).toString("base64");
+  }
+  let binary = "";
+  for (let i = 0; i < bytes.length; i += 0x8000) {
+    binary += String.fromCharCode.apply(null, bytes.subarray(i, i + 0x8000));
+  }
+  return btoa(binary);
+}
+
+function base64ToBytes(text) {
+  if (typeof Buffer !== "undefined") {
+    return new Uint8Array(Buffer.from(text, "base64"));
+  }
+  const binary = atob(text);
+  const bytes = new Uint8Array(binary.length);
+  for (let i = 0; i < binary.length; i++) bytes[i] = binary.charCodeAt(i);
+  return bytes;
+}
+
+function fitsInt(value, bits) {
+  const limit = 2 ** (bits - 1);
+  return Number.isInteger(value) && value >= -limit && value < limit;
+}
+
+// cursorPositions ([{x, y, time}, ...]) -> base64 trace, or null if it can't be packed exactly
+function encodeCursorTrace(positions) {
+  const n = positions.length;
+  if (n === 0) return null;
+  const us = positions.map(p => Math.round(p.time * 1000));
+  if (!us.every(Number.isFinite) || !fitsInt(positions[0].x, 32) || !fitsInt(positions[0].y, 32)) return null;
+
+  const buffer = new ArrayBuffer(TRACE_HEADER_BYTES + (n - 1) * 8);
+  const view = new DataView(buffer);
+  view.setUint8(0, TRACE_FORMAT_VERSION);
+  view.setUint32(4, n, true);
+  view.setInt32(8, positions[0].x, true);
+  view.setInt32(12, positions[0].y, true);
+  view.setFloat64(16, us[0], true);
+
+  const dxOffset = TRACE_HEADER_BYTES;
+  const dyOffset = dxOffset + (n - 1) * 2;
+  const dtOffset = dyOffset + (n - 1) * 2;
+  for (let i = 1; i < n; i++) {
+    const dx = positions[i].x - positions[i - 1].x;
+    const dy = positions[i].y - positions[i - 1].y;
+    const dt = us[i] - us[i - 1];
+    if (!fitsInt(dx, 16) || !fitsInt(dy, 16) || !fitsInt(dt, 32)) return null;
+    view.setInt16(dxOffset + (i - 1) * 2, dx, true);
+    view.setInt16(dyOffset + (i - 1) * 2, dy, true);
+    view.setInt32(dtOffset + (i - 1) * 4, dt, true);
+  }
+  return bytesToBase64(new Uint8Array(buffer));
+}
+
+// base64 trace -> [{x, y, time}, ...] (time in ms, as in cursorPositions)
+function decodeCursorTrace(text) {
+  const bytes = base64ToBytes(text);
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  const version = view.getUint8(0);
+  if (version !== TRACE_FORMAT_VERSION) throw new Error(`Unsupported cursor trace version ${version}`);
+  const n = view.getUint32(4, true);
+  if (bytes.byteLength !== TRACE_HEADER_BYTES + Math.max(n - 1, 0) * 8) throw new Error("Truncated cursor trace");
+
+  const dyOffset = TRACE_HEADER_BYTES + (n - 1) * 2;
+  const dtOffset = dyOffset + (n - 1) * 2;
+  let x = view.getInt32(8, true);
+  let y = view.getInt32(12, true);
+  let us = view.getFloat64(16, true);
+  const positions = n > 0 ? [{ x, y, time: us / 1000 }] : [];
+  for (let i = 1; i < n; i++) {
+    x += view.getInt16(TRACE_HEADER_BYTES + (i - 1) * 2, true);
+    y += view.getInt16(dyOffset + (i - 1) * 2, true);
+    us += view.getInt32(dtOffset + (i - 1) * 4, true);
+    positions.push({ x, y, time: us / 1000 });
+  }
+  return positions;
+}
+
+// Trial as uploaded: cursorPositions replaced by cursorTrace when it packs exactly
+function packCursorPositions(trial) {
+  const trace = encodeCursorTrace(trial.cursorPositions || []);
+  if (trace === null) return trial;
+  const { cursorPositions, ...rest } = trial;
+  return { ...rest, cursorTrace: trace };
+}
+
+if (typeof module !== "undefined" && module.exports) {
+  module.exports = { TRACE_FORMAT_VERSION, encodeCursorTrace, decodeCursorTrace, packCursorPositions };
+}